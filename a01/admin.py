@@ -2,7 +2,7 @@ from django.contrib import admin
 
 # Register your models here.
 
-from .models import Student, Class, Teacher, CourseType, Course, Contract
+from .models import Student, Class, Teacher, CourseType, Course, Contract, Room, CourseSession
 
 admin.site.register(Student)
 admin.site.register(Class)
@@ -10,3 +10,5 @@ admin.site.register(Teacher)
 admin.site.register(CourseType)
 admin.site.register(Course)
 admin.site.register(Contract)
+admin.site.register(Room)
+admin.site.register(CourseSession)
@@ -0,0 +1,514 @@
+"""
+JSON API of app a01.
+
+    GET    api/<resource>/            list, keyset paginated
+    GET    api/<resource>/<pk>/       one object
+    POST   api/<resource>/            create, validated by the HTML form
+    PATCH  api/<resource>/<pk>/       partial update, validated by the HTML form
+    GET    api/students/<pk>/profile/ student with classes, contracts,
+                                      payments and levels
+
+List and detail accept:
+
+    fields=id,fname                   sparse fieldset of the resource
+    include=student,course            embed related objects
+    fields[student]=fname,phone       sparse fieldset of an included object
+    cursor=...                        page after / before, from next / previous
+    limit=100                         page size, at most 200
+
+Filters are the GET params of the resource's HTML list filter. Session
+authentication and CSRF (X-CSRFToken header) apply as for the HTML views.
+
+POST api/contracts/ takes an Idempotency-Key header (or "request_key"): a
+retry with the same key answers 200 with the first contract instead of
+creating another one.
+"""
+
+import json
+
+from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import PermissionDenied
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.forms.models import model_to_dict
+from django.http import JsonResponse
+from django.views.generic import View
+
+from a01.forms import ContractFilter
+from a01.forms import ContractForm
+from a01.forms import CourseFilter
+from a01.forms import CourseForm
+from a01.forms import SalaryFilter
+from a01.forms import StudentFilter
+from a01.forms import StudentForm
+from a01.forms import TeacherSalaryDateForm
+from a01.forms import TransactionFilter
+from a01.forms import TransactionForm
+from a01.models import Class
+from a01.models import Contract
+from a01.models import Course
+from a01.models import CourseType
+from a01.models import Student
+from a01.models import StudentLevel
+from a01.models import Teacher
+from a01.models import TeacherSalary
+from a01.models import Transaction
+from a01.models import Worker
+from a01.pagination import KeysetPaginationMixin
+from a01.pagination import KeysetPaginator
+from a01.payroll import run_payroll
+from a01.services import create_contract
+from a01.services import student_profile
+
+
+class ApiError(Exception):
+    """Request can not be served, rendered as {"errors": ...}."""
+
+    def __init__(self, errors, status=400):
+        """Keep errors dict and HTTP status."""
+        super(ApiError, self).__init__(errors)
+        self.errors = errors
+        self.status = status
+
+
+class Resource(object):
+    """Fields of a model exposed by the API, shared by views and includes."""
+
+    model = None
+    fields = ()
+    default_fields = None
+
+    @classmethod
+    def select(cls, names):
+        """Requested fields that exist, id always first."""
+        if not names:
+            names = cls.default_fields or cls.fields
+        unknown = [each for each in names if each not in cls.fields]
+        if unknown:
+            raise ApiError({'fields': ['Unknown field: %s.' % ', '.join(unknown)]})
+        return ['id'] + [each for each in names if each != 'id']
+
+    @classmethod
+    def columns(cls, names):
+        """Database columns needed by fields, properties need none."""
+        columns = []
+        for name in names:
+            try:
+                field = cls.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete:
+                columns.append(name)
+        return columns
+
+    @staticmethod
+    def dump(obj, names):
+        """Dict of fields of obj."""
+        return dict((name, getattr(obj, name)) for name in names)
+
+
+class CourseTypeResource(Resource):
+    """Course types."""
+
+    model = CourseType
+    fields = ('id', 'level', 'price', 'length', 'hourly_price', 'info', 'flag', 'updated_at')
+
+
+class CourseResource(Resource):
+    """Courses."""
+
+    model = Course
+    fields = (
+        'id', 'ctype_id', 'start_date', 'info', 'flag',
+        'enrollment_count', 'active_contract_count', 'updated_at',
+    )
+
+
+class StudentResource(Resource):
+    """Students."""
+
+    model = Student
+    fields = ('id', 'fname', 'lname', 'register', 'phone', 'birthday', 'flag', 'updated_at')
+
+
+class ContractResource(Resource):
+    """Contracts."""
+
+    model = Contract
+    fields = (
+        'id', 'contract_number', 'date', 'student_id', 'course_id', 'minus_length',
+        'total_payment', 'req_payment', 'off_percent', 'balance', 'description',
+        'flag', 'updated_at',
+    )
+
+
+class TransactionResource(Resource):
+    """Transactions."""
+
+    model = Transaction
+    fields = (
+        'id', 'amount', 'txn_type', 'txn_method', 'txn_date', 'info',
+        'contract_id', 'verified', 'flag', 'updated_at',
+    )
+
+
+class ClassResource(Resource):
+    """Classes a student attends."""
+
+    model = Class
+    fields = ('id', 'course_id', 'student_id', 'updated_at')
+
+
+class StudentLevelResource(Resource):
+    """English level history of students."""
+
+    model = StudentLevel
+    fields = ('id', 'student_id', 'course_id', 'level', 'date', 'updated_at')
+
+
+class TeacherResource(Resource):
+    """Teachers."""
+
+    model = Teacher
+    fields = ('id', 'fname', 'lname', 'phone', 'hourly_wage', 'flag')
+
+
+class WorkerResource(Resource):
+    """Workers."""
+
+    model = Worker
+    fields = ('id', 'fname', 'lname', 'phone', 'monthly_wage', 'flag')
+
+
+class SalaryResource(Resource):
+    """Salaries of teachers and workers."""
+
+    model = TeacherSalary
+    fields = (
+        'id', 'teacher_id', 'worker_id', 'year', 'month', 'mshift',
+        'worked_hour', 'salary', 'txn_id', 'updated_at',
+    )
+
+
+class ApiView(PermissionRequiredMixin, KeysetPaginationMixin, View):
+    """
+    List, detail, create and update of one Resource as compact JSON.
+
+    includes maps name to (relation, Resource, many). Single relations are
+    joined with select_related, many relations are fetched by one batched
+    prefetch query per include, whatever the page size.
+    """
+
+    resource = None
+    includes = {}
+    filterset_class = None
+    form_class = None
+    max_per_page = 200
+    http_method_names = ['get', 'post', 'patch']
+    raise_exception = True
+    use_replica = True
+    # Reads take about 5 queries; creating a contract takes 11.
+    query_budget = 12
+
+    def dispatch(self, request, *args, **kwargs):
+        """Render ApiError and PermissionDenied as JSON."""
+        try:
+            return super(ApiView, self).dispatch(request, *args, **kwargs)
+        except PermissionDenied:
+            return self.render({'errors': {'__all__': ['Permission denied.']}}, status=403)
+        except ApiError as e:
+            return self.render({'errors': e.errors}, status=e.status)
+
+    def render(self, data, status=200):
+        """Compact JSON response."""
+        return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, json_dumps_params={'separators': (',', ':')})
+
+    def get(self, request, pk=None):
+        """Object or page of objects."""
+        fields, includes = self.parse_shape()
+        queryset = self.shape_queryset(self.get_queryset(), fields, includes)
+
+        if pk is not None:
+            return self.render({'data': self.dump(self.get_object(queryset, pk), fields, includes)})
+
+        if self.filterset_class is not None:
+            queryset = self.filterset_class(request.GET, queryset=queryset).qs
+
+        try:
+            per_page = min(int(request.GET.get('limit', self.paginate_by)), self.max_per_page)
+        except ValueError:
+            raise ApiError({'limit': ['Enter a whole number.']})
+        paginator = KeysetPaginator(queryset, self.get_keyset_ordering(queryset), max(per_page, 1))
+        page = paginator.page(request.GET.get(self.cursor_param))
+
+        return self.render({
+            'data': [self.dump(obj, fields, includes) for obj in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+    def post(self, request, pk=None):
+        """Create object from JSON body."""
+        if pk is not None or self.form_class is None:
+            raise ApiError({'__all__': ['Method not allowed.']}, status=405)
+        form = self.get_form(self.read_body())
+        obj, created = self.save(form)
+        fields, includes = self.parse_shape()
+        return self.render({'data': self.dump(obj, fields, includes)}, status=201 if created else 200)
+
+    def patch(self, request, pk=None):
+        """Update fields of object given in JSON body."""
+        if pk is None or self.form_class is None or not hasattr(self.form_class, '_meta'):
+            raise ApiError({'__all__': ['Method not allowed.']}, status=405)
+        obj = self.get_object(self.get_queryset(), pk)
+        data = model_to_dict(obj, fields=self.form_class._meta.fields)
+        data.update(self.read_body())
+        form = self.get_form(data, instance=obj)
+        obj, created = self.save(form)
+        fields, includes = self.parse_shape()
+        return self.render({'data': self.dump(obj, fields, includes)})
+
+    def get_queryset(self):
+        """All objects of resource."""
+        return self.resource.model.objects.all()
+
+    def get_object(self, queryset, pk):
+        """Object by pk or 404 error."""
+        obj = queryset.filter(pk=pk).first()
+        if obj is None:
+            raise ApiError({'__all__': ['Not found.']}, status=404)
+        return obj
+
+    def get_form(self, data, instance=None):
+        """Bound and validated form."""
+        kwargs = {'data': data}
+        if instance is not None:
+            kwargs['instance'] = instance
+        form = self.form_class(**kwargs)
+        if not form.is_valid():
+            raise ApiError(form.errors)
+        return form
+
+    def save(self, form):
+        """Save valid form, return (object, created)."""
+        return form.save(), True
+
+    def read_body(self):
+        """JSON object of request body."""
+        try:
+            data = json.loads(self.request.body.decode('utf-8') or '{}')
+        except ValueError:
+            raise ApiError({'__all__': ['Body is not valid JSON.']})
+        if not isinstance(data, dict):
+            raise ApiError({'__all__': ['Body must be a JSON object.']})
+        return data
+
+    def parse_shape(self):
+        """Requested (fields, {include: fields}) from GET params."""
+        GET = self.request.GET
+        fields = self.resource.select([each for each in GET.get('fields', '').split(',') if each])
+
+        includes = {}
+        for name in [each for each in GET.get('include', '').split(',') if each]:
+            if name not in self.includes:
+                raise ApiError({'include': ['Unknown include: %s.' % name]})
+            relation, resource, many = self.includes[name]
+            names = [each for each in GET.get('fields[%s]' % name, '').split(',') if each]
+            includes[name] = resource.select(names)
+        return fields, includes
+
+    def shape_queryset(self, queryset, fields, includes):
+        """Load only requested columns, join or prefetch includes."""
+        columns = self.resource.columns(fields)
+        columns += self.resource.columns([each.lstrip('-') for each in self.keyset_ordering])
+
+        for name, names in includes.items():
+            relation, resource, many = self.includes[name]
+            if many:
+                remote = self.remote_field(relation)
+                related = resource.model.objects.only(*(resource.columns(names) + [remote])).order_by('id')
+                queryset = queryset.prefetch_related(Prefetch(relation, queryset=related))
+            else:
+                queryset = queryset.select_related(relation)
+                columns.append(relation)
+                columns += ['%s__%s' % (relation, each) for each in resource.columns(names)]
+
+        return queryset.only(*columns)
+
+    def remote_field(self, relation):
+        """Column of related model pointing back to resource, for prefetch."""
+        for each in self.resource.model._meta.related_objects:
+            if each.get_accessor_name() == relation:
+                return each.field.attname
+        raise ValueError('%s has no reverse relation %s' % (self.resource.model, relation))
+
+    def dump(self, obj, fields, includes):
+        """Dict of obj with embedded includes."""
+        data = self.resource.dump(obj, fields)
+        for name, names in includes.items():
+            relation, resource, many = self.includes[name]
+            if many:
+                data[name] = [resource.dump(each, names) for each in getattr(obj, relation).all()]
+            else:
+                related = getattr(obj, relation)
+                data[name] = resource.dump(related, names) if related is not None else None
+        return data
+
+
+class StudentApiView(ApiView):
+    """Students."""
+
+    resource = StudentResource
+    includes = {
+        'contracts': ('contract_set', ContractResource, True),
+    }
+    filterset_class = StudentFilter
+    form_class = StudentForm
+    permission_required = 'a01.s_composer'
+
+
+class CourseApiView(ApiView):
+    """Courses with their enrollment counters."""
+
+    resource = CourseResource
+    includes = {
+        'ctype': ('ctype', CourseTypeResource, False),
+    }
+    filterset_class = CourseFilter
+    form_class = CourseForm
+    keyset_ordering = ('-start_date', '-id')
+    permission_required = 'a01.main'
+
+
+class ContractApiView(ApiView):
+    """Contracts, created with student, first payment and class."""
+
+    resource = ContractResource
+    includes = {
+        'student': ('student', StudentResource, False),
+        'course': ('course', CourseResource, False),
+        'transactions': ('ctxns', TransactionResource, True),
+    }
+    filterset_class = ContractFilter
+    form_class = ContractForm
+    keyset_ordering = ('-date', '-id')
+    http_method_names = ['get', 'post']
+    permission_required = 'a01.main'
+
+    def get_form(self, data, instance=None):
+        """Idempotency-Key header fills request_key of the form."""
+        key = self.request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if key and not data.get('request_key'):
+            data = dict(data, request_key=key)
+        return super(ContractApiView, self).get_form(data, instance)
+
+    def save(self, form):
+        """Same as ContractAddView, a replayed key returns the first contract."""
+        try:
+            return create_contract(form.cleaned_data)
+        except ValidationError as e:
+            raise ApiError({'__all__': e.messages})
+
+
+class TransactionApiView(ApiView):
+    """Transactions."""
+
+    resource = TransactionResource
+    includes = {
+        'contract': ('contract', ContractResource, False),
+    }
+    filterset_class = TransactionFilter
+    form_class = TransactionForm
+    keyset_ordering = ('-txn_date', '-id')
+    permission_required = 'a01.accounting'
+
+
+class SalaryApiView(ApiView):
+    """
+    Salaries; POST runs payroll of a period.
+
+    {"year": 2020, "month": "JANUARY", "mshift": "FIRST",
+     "teacher_hours": {"<teacher pk>": hours}, "worker_wages": {"<worker pk>": wage}}
+    """
+
+    resource = SalaryResource
+    includes = {
+        'teacher': ('teacher', TeacherResource, False),
+        'worker': ('worker', WorkerResource, False),
+    }
+    filterset_class = SalaryFilter
+    form_class = TeacherSalaryDateForm
+    keyset_ordering = ('-year', '-id')
+    http_method_names = ['get', 'post']
+    permission_required = 'a01.accounting'
+
+    def post(self, request, pk=None):
+        """Pay listed teachers and workers, return created salaries."""
+        if pk is not None:
+            raise ApiError({'__all__': ['Method not allowed.']}, status=405)
+        body = self.read_body()
+        form = self.get_form(body)
+        data = form.cleaned_data
+        teacher_hours = self.read_amounts(body, 'teacher_hours', Teacher)
+        worker_wages = self.read_amounts(body, 'worker_wages', Worker)
+
+        salaries = run_payroll(data['year'], data['month'], data['mshift'], teacher_hours=teacher_hours, worker_wages=worker_wages)
+        fields, includes = self.parse_shape()
+        return self.render({'data': [self.dump(each, fields, includes) for each in salaries]}, status=201)
+
+    def read_amounts(self, body, name, model):
+        """{pk: positive whole number} of body[name], pks of active model objects."""
+        try:
+            amounts = dict((int(k), int(v)) for k, v in (body.get(name) or {}).items())
+        except (AttributeError, TypeError, ValueError):
+            raise ApiError({name: ['Map pk to whole number.']})
+        if any(amount <= 0 for amount in amounts.values()):
+            raise ApiError({name: ['Enter numbers greater than zero.']})
+        unknown = set(amounts) - set(model.objects.filter(flag=True, pk__in=amounts).values_list('pk', flat=True))
+        if unknown:
+            raise ApiError({name: ['Unknown pk %s.' % ', '.join(str(pk) for pk in sorted(unknown))]})
+        return amounts
+
+
+class StudentProfileApiView(ApiView):
+    """
+    Student with classes, contracts with their payments, and levels.
+
+    Same data as the HTML student page in a fixed number of queries;
+    fields and include params do not apply.
+    """
+
+    resource = StudentResource
+    http_method_names = ['get']
+    permission_required = 'a01.s_composer'
+    query_budget = 8
+
+    def get(self, request, pk=None):
+        """Profile of student pk."""
+        student = student_profile(self.get_queryset(), pk)
+        if student is None:
+            raise ApiError({'__all__': ['Not found.']}, status=404)
+
+        data = StudentResource.dump(student, StudentResource.fields)
+        data['classes'] = [
+            dict(ClassResource.dump(each, ClassResource.fields), course=self.dump_course(each.course))
+            for each in student.sclasses.all()
+        ]
+        data['contracts'] = [
+            dict(
+                ContractResource.dump(each, ContractResource.fields),
+                course=self.dump_course(each.course),
+                transactions=[TransactionResource.dump(txn, TransactionResource.fields) for txn in each.payments],
+            )
+            for each in student.contract_set.all()
+        ]
+        data['levels'] = [StudentLevelResource.dump(each, StudentLevelResource.fields) for each in student.levels.all()]
+        data['totals'] = student.totals
+        return self.render({'data': data})
+
+    @staticmethod
+    def dump_course(course):
+        """Course with its course type embedded."""
+        return dict(CourseResource.dump(course, CourseResource.fields), ctype=CourseTypeResource.dump(course.ctype, CourseTypeResource.fields))
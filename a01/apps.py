@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class A01Config(AppConfig):
     name = 'a01'
+
+    def ready(self):
+        """Connect signal handlers, register lookups and checks."""
+        import a01.checks  # noqa
+        import a01.lookups  # noqa
+        import a01.signals  # noqa
@@ -0,0 +1,189 @@
+"""
+Latency and query count benchmark of every view of a01/urls.py.
+
+Each url is requested through django.test.Client by a logged in user, url
+arguments are taken from existing rows (see manage.py generate_data).
+Results are compared with a JSON baseline written by an earlier run.
+"""
+
+import json
+import math
+import time
+
+from django.db import connections
+from django.db.models import Max
+from django.db.models import Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from a01 import urls
+from a01.models import Contract
+from a01.models import Course
+from a01.models import CourseSession
+from a01.models import CourseType
+from a01.models import Job
+from a01.models import Room
+from a01.models import Student
+from a01.models import StudentLevel
+from a01.models import Teacher
+from a01.models import TeacherSalary
+from a01.models import Transaction
+from a01.models import Worker
+
+
+# Model whose pk fills url arguments, by url name or its first matching prefix.
+URL_MODELS = {
+    'detail': Student,
+    'student_contract': Student,
+    'student_level_add': Student,
+    'student_level_edit': Student,
+}
+PREFIX_MODELS = (
+    ('student_level', StudentLevel),
+    ('student', Student),
+    ('course_type', CourseType),
+    ('course_session', CourseSession),
+    ('course', Course),
+    ('contract', Contract),
+    ('teacher', Teacher),
+    ('transaction', Transaction),
+    ('worker', Worker),
+    ('job', Job),
+    ('room', Room),
+    ('api_student', Student),
+    ('api_course', Course),
+    ('api_contract', Contract),
+    ('api_transaction', Transaction),
+    ('api_salar', TeacherSalary),
+)
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """Nearest rank percentile of values."""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = max(int(math.ceil(p / 100.0 * len(values))), 1)
+    return values[rank - 1]
+
+
+def url_model(name):
+    """Model of url arguments of url called name."""
+    if name in URL_MODELS:
+        return URL_MODELS[name]
+    for prefix, model in PREFIX_MODELS:
+        if name.startswith(prefix):
+            return model
+    return None
+
+
+def sample_pk(model):
+    """Pk of a row from the middle of the table, active one if model has flag."""
+    queryset = model.objects.all()
+    if any(field.name == 'flag' for field in model._meta.fields):
+        queryset = queryset.filter(flag=True)
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return None
+    middle = (bounds['low'] + bounds['high']) // 2
+    return queryset.filter(pk__gte=middle).order_by('pk').values_list('pk', flat=True).first()
+
+
+def view_urls(include=None):
+    """(name, path) of every named a01 url, None path when no row fills its arguments."""
+    pks = {}
+    for pattern in urls.urlpatterns:
+        name = pattern.name
+        if not name or (include and not any(each in name for each in include)):
+            continue
+        arguments = list(pattern.regex.groupindex)
+        if not arguments:
+            yield name, reverse(name)
+            continue
+        model = url_model(name)
+        if model not in pks and model is not None:
+            pks[model] = sample_pk(model)
+        pk = pks.get(model)
+        yield name, reverse(name, kwargs=dict((each, pk) for each in arguments)) if pk else None
+
+
+def measure(client, path, repeat):
+    """Status, latencies in ms and query count of GET path."""
+    timings = []
+    queries = None
+    status = None
+    for i in range(repeat):
+        contexts = [CaptureQueriesContext(connection) for connection in connections.all()]
+        for each in contexts:
+            each.__enter__()
+        started = time.perf_counter()
+        try:
+            response = client.get(path)
+            status = response.status_code
+            if getattr(response, 'streaming', False):
+                for chunk in response.streaming_content:
+                    pass
+        except Exception as e:
+            status = type(e).__name__
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            for each in contexts:
+                each.__exit__(None, None, None)
+        timings.append(elapsed)
+        queries = sum(len(each) for each in contexts)
+    return status, timings, queries
+
+
+def run(user, repeat=20, warmup=1, include=None, host='localhost'):
+    """Benchmark results keyed by url name."""
+    client = Client(HTTP_HOST=host)
+    client.force_login(user)
+
+    results = {}
+    for name, path in view_urls(include):
+        if path is None:
+            results[name] = {'skipped': 'no row for url arguments'}
+            continue
+        measure(client, path, warmup)
+        status, timings, queries = measure(client, path, repeat)
+        result = {'path': path, 'status': status, 'queries': queries}
+        for p in PERCENTILES:
+            result['p%d' % p] = round(percentile(timings, p), 2)
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, min_delta=5.0):
+    """
+    Regressions of results against baseline as (name, message) pairs.
+
+    Latency regresses when p95 grows by more than tolerance and min_delta
+    ms, query count on any increase, status on any change.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or 'skipped' in base or 'skipped' in result:
+            continue
+        if result['status'] != base['status']:
+            regressions.append((name, 'status %s -> %s' % (base['status'], result['status'])))
+        if result['queries'] > base['queries']:
+            regressions.append((name, 'queries %d -> %d' % (base['queries'], result['queries'])))
+        if result['p95'] > base['p95'] * (1 + tolerance) and result['p95'] - base['p95'] > min_delta:
+            regressions.append((name, 'p95 %.1fms -> %.1fms' % (base['p95'], result['p95'])))
+    return regressions
+
+
+def load_baseline(path):
+    """Results stored by save_baseline."""
+    with open(path) as fileobj:
+        return json.load(fileobj)['views']
+
+
+def save_baseline(path, results, meta=None):
+    """Store results as JSON baseline."""
+    with open(path, 'w') as fileobj:
+        json.dump({'meta': meta or {}, 'views': results}, fileobj, indent=2, sort_keys=True)
@@ -0,0 +1,153 @@
+"""
+Cached lookups of app a01, invalidated by signals in a01.signals.
+
+Caches are filled from the primary database, a lagging replica would put
+rows back that were invalidated a moment ago.
+"""
+
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from a01.models import Course
+from a01.models import CourseType
+
+
+def cache_is_shared():
+    """Do all processes see the same default cache, i.e. see each other's invalidations."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return not backend.endswith(('.LocMemCache', '.DummyCache'))
+
+
+COURSES_KEY = 'a01:active_courses'
+COURSE_TYPES_KEY = 'a01:active_course_types'
+
+
+def active_courses():
+    """{str(pk): Course} of active courses, with ctype already joined."""
+    courses = cache.get(COURSES_KEY)
+    if courses is None:
+        queryset = Course.objects.using(DEFAULT_DB_ALIAS).filter(flag=True).select_related('ctype').order_by('id')
+        courses = OrderedDict((str(each.pk), each) for each in queryset)
+        cache.set(COURSES_KEY, courses, None)
+    return courses
+
+
+def active_course_types():
+    """{str(pk): CourseType} of active course types."""
+    course_types = cache.get(COURSE_TYPES_KEY)
+    if course_types is None:
+        queryset = CourseType.objects.using(DEFAULT_DB_ALIAS).filter(flag=True).order_by('id')
+        course_types = OrderedDict((str(each.pk), each) for each in queryset)
+        cache.set(COURSE_TYPES_KEY, course_types, None)
+    return course_types
+
+
+def invalidate_course_choices():
+    """Drop cached courses and course types."""
+    cache.delete_many([COURSES_KEY, COURSE_TYPES_KEY])
+
+
+PROFIT_LOSS_KEY = 'a01:profit_loss:%s'
+
+# Closed months are dropped on change by a01.signals, the timeout only
+# bounds staleness after raw SQL edits that bypass signals.
+PROFIT_LOSS_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def profit_loss_key(month):
+    """Cache key of P&L of month containing date."""
+    return PROFIT_LOSS_KEY % month.strftime('%Y-%m')
+
+
+def invalidate_profit_loss(dates):
+    """
+    Drop cached P&L of months containing any of dates.
+
+    Dropped again after commit, a report computed by another request while
+    the transaction was open would otherwise cache the old figures.
+    """
+    keys = list(set(profit_loss_key(each) for each in dates if each is not None))
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+VERSION_KEY = 'a01:version:%s'
+MODIFIED_KEY = 'a01:modified:%s'
+ROW_KEY = 'a01:row:%s:%s:%s:%s'
+ROW_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _initial_version():
+    """
+    Version of model whose counter is not in cache, e.g. after eviction.
+
+    Milliseconds since epoch keep it above any number handed out before,
+    so fragments cached under old versions are never picked up again.
+    """
+    return int(time.time() * 1000)
+
+
+def model_versions(labels):
+    """{label_lower: version} of models."""
+    keys = dict((VERSION_KEY % label, label) for label in labels)
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, label in keys.items():
+        if key not in found:
+            cache.add(key, _initial_version(), None)
+            found[key] = cache.get(key)
+        versions[label] = found[key]
+    return versions
+
+
+def bump_model_versions(*models):
+    """
+    Make fragments rendered from rows of models stale.
+
+    Bumped again after commit, a fragment rendered by another request from
+    the not yet committed rows would otherwise be cached as current.
+    """
+    labels = [model._meta.label_lower for model in models]
+
+    def bump():
+        for label in labels:
+            try:
+                cache.incr(VERSION_KEY % label)
+            except ValueError:
+                cache.set(VERSION_KEY % label, _initial_version(), None)
+        cache.set_many(dict((MODIFIED_KEY % label, timezone.now()) for label in labels), None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def models_modified(labels):
+    """
+    Latest change of any of models, None when they have no rows.
+
+    Comes from time of last version bump; models not bumped since cache
+    was cleared fall back to MAX(updated_at), remembered until next bump.
+    """
+    keys = dict((MODIFIED_KEY % label, label) for label in labels)
+    found = cache.get_many(list(keys))
+    for key, label in keys.items():
+        if key not in found:
+            model = apps.get_model(label)
+            found[key] = model.objects.using(DEFAULT_DB_ALIAS).aggregate(modified=Max('updated_at'))['modified']
+            cache.add(key, found[key], None)
+    modified = [each for each in found.values() if each is not None]
+    return max(modified) if modified else None
+
+
+def row_fragment_key(name, obj, versions):
+    """Cache key of fragment name rendered for obj at model versions."""
+    return ROW_KEY % (name, obj._meta.label_lower, obj.pk, '.'.join(str(each) for each in versions))
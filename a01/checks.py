@@ -0,0 +1,19 @@
+"""System checks of app a01."""
+
+from django.conf import settings
+from django.core import checks
+
+from a01.caches import cache_is_shared
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn about a per process cache outside development."""
+    if settings.DEBUG or cache_is_shared():
+        return []
+    return [checks.Warning(
+        'Default cache is local to each process.',
+        hint='Processes keep serving stale course lists, reports and pages changed in another one; '
+             'set CACHE_LOCATION to memcached servers.',
+        id='a01.W001',
+    )]
@@ -1,4 +1,42 @@
-"""This file contains all unchangeable values."""
+"""
+This file contains all unchangeable values.
+
+Each choices list is a Choices class registered in REGISTRY. Its labels
+and value sets are built once at import, so rendering a label or
+classifying a value is a dict or set lookup, not a loop over the tuple.
+"""
+
+import datetime
+
+from django.db.models import Case
+from django.db.models import CharField
+from django.db.models import Value
+from django.db.models import When
+
+
+REGISTRY = {}
+
+
+def register(cls):
+    """Build label map and value set of choices class, add it to REGISTRY."""
+    cls.labels = dict(cls.choices)
+    cls.values = frozenset(cls.labels)
+    REGISTRY[cls.__name__] = cls
+    return cls
+
+
+class Choices(object):
+    """Enum like choices, subclasses list (value, label) pairs in choices."""
+
+    choices = ()
+    labels = {}
+    values = frozenset()
+
+    @classmethod
+    def label(cls, value, default=''):
+        """Label of value, default for unknown ones."""
+        return cls.labels.get(value, default)
+
 
 NOR_INCOME = 'INCOME'
 NOR_EXPENSE = 'EXPENSE'
@@ -6,18 +44,63 @@ CONTRACT_INCOME = 'CINCOME'
 CLASS_CHANGE_INCOME = 'CHANINCOME'
 SALARY_EXPENSE = 'SEXPENSE'
 
-FORM_CHOICES = (
-    (NOR_INCOME, 'Орлого'),
-    (NOR_EXPENSE, 'Зарлага'),
-)
+INCOME = 'income'
+EXPENSE = 'expense'
+
+
+@register
+class Direction(Choices):
+    """Income or expense, the side of a transaction type."""
+
+    choices = (
+        (INCOME, 'Орлого'),
+        (EXPENSE, 'Зарлага'),
+    )
+
+
+@register
+class TxnType(Choices):
+    """Types of Transaction, each either an income or an expense."""
+
+    choices = (
+        (SALARY_EXPENSE, 'Цалингын зарлага'),
+        (CONTRACT_INCOME, 'Гэрээний орлого'),
+        (CLASS_CHANGE_INCOME, 'Ангий солилтын орлого'),
+        (NOR_INCOME, 'Орлого'),
+        (NOR_EXPENSE, 'Зарлага'),
+    )
+    # Types entered by hand on TransactionForm, the rest are made by the app.
+    form_choices = (
+        (NOR_INCOME, 'Орлого'),
+        (NOR_EXPENSE, 'Зарлага'),
+    )
+    income = frozenset((CONTRACT_INCOME, CLASS_CHANGE_INCOME, NOR_INCOME))
+    expense = frozenset((SALARY_EXPENSE, NOR_EXPENSE))
+
+    @classmethod
+    def direction(cls, value):
+        """INCOME, EXPENSE or None of txn_type value."""
+        if value in cls.income:
+            return INCOME
+        if value in cls.expense:
+            return EXPENSE
+        return None
+
+    @classmethod
+    def types_of(cls, direction):
+        """Sorted txn_type values of direction, e.g. for __in lookups."""
+        return sorted(cls.income if direction == INCOME else cls.expense)
+
+    @classmethod
+    def direction_case(cls, field='txn_type'):
+        """The same classification as SQL CASE expression, NULL for unknown types."""
+        return Case(
+            When(then=Value(INCOME), **{field + '__in': cls.types_of(INCOME)}),
+            When(then=Value(EXPENSE), **{field + '__in': cls.types_of(EXPENSE)}),
+            default=Value(None),
+            output_field=CharField(),
+        )
 
-TXN_TYPES = (
-    (SALARY_EXPENSE, 'Цалингын зарлага'),
-    (CONTRACT_INCOME, 'Гэрээний орлого'),
-    (CLASS_CHANGE_INCOME, 'Ангий солилтын орлого'),
-    (NOR_INCOME, 'Орлого'),
-    (NOR_EXPENSE, 'Зарлага'),
-)
 
 JANUARY = "JANUARY"
 FEBRUARY = "FEBRUARY"
@@ -32,28 +115,68 @@ OCTOBER = "OCTOBER"
 NOVEMBER = "NOVEMBER"
 DECEMBER = "DECEMBER"
 
-MONTHS = (
-    (JANUARY, '1-р сар'),
-    (FEBRUARY, '2-р сар'),
-    (MARCH, '3-р сар'),
-    (APRIL, '4-р сар'),
-    (MAY, '5-р сар'),
-    (JUNE, '6-р сар'),
-    (JULY, '7-р сар'),
-    (AUGUST, '8-р сар'),
-    (SEPTEMBER, '9-р сар'),
-    (OCTOBER, '10-р сар'),
-    (NOVEMBER, '11-р сар'),
-    (DECEMBER, '12-р сар'),
-)
+
+@register
+class Month(Choices):
+    """Months of payroll period."""
+
+    choices = (
+        (JANUARY, '1-р сар'),
+        (FEBRUARY, '2-р сар'),
+        (MARCH, '3-р сар'),
+        (APRIL, '4-р сар'),
+        (MAY, '5-р сар'),
+        (JUNE, '6-р сар'),
+        (JULY, '7-р сар'),
+        (AUGUST, '8-р сар'),
+        (SEPTEMBER, '9-р сар'),
+        (OCTOBER, '10-р сар'),
+        (NOVEMBER, '11-р сар'),
+        (DECEMBER, '12-р сар'),
+    )
 
 FIRST_SHIFT = 'FIRST'
 SECOND_SHIFT = 'SECOND'
 
-SHIFTS = (
-    (FIRST_SHIFT, '1-р ээлж'),
-    (SECOND_SHIFT, '2-р ээлж'),
-)
+
+@register
+class Shift(Choices):
+    """Work shifts."""
+
+    choices = (
+        (FIRST_SHIFT, '1-р ээлж'),
+        (SECOND_SHIFT, '2-р ээлж'),
+    )
+    second_start = datetime.time(14, 0)
+
+    @classmethod
+    def of_time(cls, value):
+        """Shift of lesson starting at time value."""
+        return FIRST_SHIFT if value < cls.second_start else SECOND_SHIFT
+
+
+MONDAY = 1
+TUESDAY = 2
+WEDNESDAY = 3
+THURSDAY = 4
+FRIDAY = 5
+SATURDAY = 6
+SUNDAY = 7
+
+
+@register
+class Weekday(Choices):
+    """Days of week of timetable sessions, ISO numbering."""
+
+    choices = (
+        (MONDAY, 'Даваа'),
+        (TUESDAY, 'Мягмар'),
+        (WEDNESDAY, 'Лхагва'),
+        (THURSDAY, 'Пүрэв'),
+        (FRIDAY, 'Баасан'),
+        (SATURDAY, 'Бямба'),
+        (SUNDAY, 'Ням'),
+    )
 
 
 BEGINNER = "BEGINNER"
@@ -63,27 +186,58 @@ AMID = "AMID"
 ADVANCED = "ADVANCED"
 
 
-LEVEL_CHOICES = (
-    (BEGINNER, "Анхан"),
-    (BMID, "Дундын өмнөх"),
-    (MID, "Дунд"),
-    (AMID, "Ахисан дунд"),
-    (ADVANCED, "Гүнзгий"),
-)
+@register
+class Level(Choices):
+    """English levels of students."""
+
+    choices = (
+        (BEGINNER, "Анхан"),
+        (BMID, "Дундын өмнөх"),
+        (MID, "Дунд"),
+        (AMID, "Ахисан дунд"),
+        (ADVANCED, "Гүнзгий"),
+    )
 
 BY_BANK = "BY_BANK"
 BY_CASH = "BY_CASH"
 
-TXN_METHODS = (
-    (BY_BANK, "Дансаар"),
-    (BY_CASH, "Бэлнээр"),
-)
+
+@register
+class TxnMethod(Choices):
+    """Ways a transaction was paid."""
+
+    choices = (
+        (BY_BANK, "Дансаар"),
+        (BY_CASH, "Бэлнээр"),
+    )
 
 
 FREE = "FREE"
 NON_FREE = "NON_FREE"
 
-CLASS_CHANGE_CHOICES = (
-    (FREE, "Төлбөргүй"),
-    (NON_FREE, "Төлбөртэй"),
-)
+
+@register
+class ClassChange(Choices):
+    """Whether moving a contract to another class is paid."""
+
+    choices = (
+        (FREE, "Төлбөргүй"),
+        (NON_FREE, "Төлбөртэй"),
+    )
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+
+
+@register
+class JobStatus(Choices):
+    """States of background Job."""
+
+    choices = (
+        (JOB_QUEUED, "Хүлээгдэж буй"),
+        (JOB_RUNNING, "Ажиллаж буй"),
+        (JOB_DONE, "Дууссан"),
+        (JOB_FAILED, "Амжилтгүй"),
+    )
@@ -0,0 +1,72 @@
+"""
+Conditional GET of a01 views from data versions, see a01.caches.
+
+Functions here are passed to django.views.decorators.http.condition, so an
+unchanged page is answered with 304 before any queryset or template work.
+Pages read from a replica that has not replayed their last change yet
+get no validators: versions are bumped on commit to default, so the old
+rows would be tagged as the new data. Neither do pages with pending
+messages, a 304 would never show them.
+"""
+
+import hashlib
+
+from django.contrib.messages import get_messages
+
+from absolute.db_routers import reading_replica
+from absolute.db_routers import replica_current
+
+from a01.caches import model_versions
+from a01.caches import models_modified
+
+
+def cacheable(request, labels):
+    """May response to request showing models labels carry validators."""
+    if len(get_messages(request)):
+        return False
+    return not reading_replica() or replica_current(models_modified(labels))
+
+
+def data_etag(*labels):
+    """
+    ETag function of page showing rows of models labels.
+
+    Hash of model versions, user, CSRF token and full URL: pages differ per
+    user (name in header), per filter, cursor and other GET params, and
+    their forms carry the token, rotated on every login.
+    """
+    labels = [each.lower() for each in labels]
+
+    def etag(request, *args, **kwargs):
+        """ETag of current data."""
+        if not cacheable(request, labels):
+            return None
+        versions = model_versions(labels)
+        raw = '%s|%s|%s|%s' % (
+            request.user.pk,
+            request.META.get('CSRF_COOKIE', ''),
+            request.get_full_path(),
+            ','.join('%s=%s' % (each, versions[each]) for each in labels),
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+    return etag
+
+
+def data_last_modified(*labels):
+    """Last-Modified function of page showing rows of models labels."""
+    labels = [each.lower() for each in labels]
+
+    def last_modified(request, *args, **kwargs):
+        """Latest change of any of models."""
+        if not cacheable(request, labels):
+            return None
+        return models_modified(labels)
+    return last_modified
+
+
+def data_conditions(*labels):
+    """Keyword arguments of condition() for page showing models labels."""
+    return {
+        'etag_func': data_etag(*labels),
+        'last_modified_func': data_last_modified(*labels),
+    }
@@ -0,0 +1,118 @@
+"""Streaming CSV export of a01 tables."""
+
+import csv
+
+from django.db import router
+from django.http import HttpResponseRedirect
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.views.generic import View
+
+from a01.choices import Month
+from a01.choices import Shift
+from a01.choices import TxnMethod
+from a01.choices import TxnType
+from a01.jobs import enqueue
+
+
+TRANSACTION_COLUMNS = (
+    ('id', 'ID', None),
+    ('txn_date', 'Огноо', None),
+    ('txn_type', 'Төрөл', TxnType.labels),
+    ('txn_method', 'Гүйлгээ хийгдсэн арга', TxnMethod.labels),
+    ('amount', 'Дүн', None),
+    ('verified', 'Баталгаажсан эсэх', None),
+    ('flag', 'Идэвхитэй эсэх', None),
+    ('contract__contract_number', 'Гэрээний дугаар', None),
+    ('info', 'Тайлбар', None),
+)
+
+CONTRACT_COLUMNS = (
+    ('id', 'ID', None),
+    ('contract_number', 'Гэрээний дугаар', None),
+    ('date', 'Гэрээний огноо', None),
+    ('student__lname', 'Овог', None),
+    ('student__fname', 'Нэр', None),
+    ('student__phone', 'Утасны дугаар', None),
+    ('course__ctype__level', 'Хичээл', None),
+    ('course__start_date', 'Эхэлсэн цаг өдөр', None),
+    ('req_payment', 'Төлбөл зохих төлбөр', None),
+    ('total_payment', 'Нийт төлбөр', None),
+    ('balance', 'Үлдэгдэл төлбөр', None),
+    ('off_percent', 'Хямдралын хувь', None),
+    ('flag', 'Идэвхитэй эсэх', None),
+)
+
+SALARY_COLUMNS = (
+    ('id', 'ID', None),
+    ('year', 'Он', None),
+    ('month', 'Сар', Month.labels),
+    ('mshift', 'Ээлж', Shift.labels),
+    ('teacher__lname', 'Багшийн овог', None),
+    ('teacher__fname', 'Багшийн нэр', None),
+    ('worker__lname', 'Ажилтны овог', None),
+    ('worker__fname', 'Ажилтны нэр', None),
+    ('worked_hour', 'Ажилсан цаг', None),
+    ('salary', 'Цалин', None),
+)
+
+
+class Echo(object):
+    """File-like object whose write returns the written line."""
+
+    def write(self, value):
+        """Return value instead of buffering it."""
+        return value
+
+
+def csv_lines(queryset, columns):
+    """
+    Yield CSV lines of queryset.
+
+    Rows come from values_list through a server side cursor (iterator), so
+    model instances are never built and memory use does not grow with size.
+    """
+    writer = csv.writer(Echo())
+    labels = [choices for name, title, choices in columns]
+
+    # BOM lets Excel open the Cyrillic headers as UTF-8.
+    yield '\ufeff' + writer.writerow([title for name, title, choices in columns])
+
+    rows = queryset.values_list(*[name for name, title, choices in columns]).iterator()
+    for row in rows:
+        yield writer.writerow([
+            choices.get(value, value) if choices else value
+            for value, choices in zip(row, labels)
+        ])
+
+
+class CsvExportView(View):
+    """Stream filtered queryset as CSV file."""
+
+    filterset_class = None
+    columns = ()
+    ordering = ('id',)
+    filename = 'export.csv'
+    export_name = None
+    use_replica = True
+
+    def get_queryset(self):
+        """Queryset before filtering."""
+        return self.filterset_class._meta.model.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        """Return streaming CSV of rows matching GET filters."""
+        f = self.filterset_class(request.GET, queryset=self.get_queryset())
+        # Rows are read while streaming, after ReplicaRoutingMiddleware is
+        # done, so the database is chosen now.
+        queryset = f.qs.order_by(*self.ordering)
+        queryset = queryset.using(router.db_for_read(queryset.model))
+
+        response = StreamingHttpResponse(csv_lines(queryset, self.columns), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="%s"' % self.filename
+        return response
+
+    def post(self, request, *args, **kwargs):
+        """Write the same CSV in background job (a01.tasks), for big exports."""
+        job = enqueue('export_csv', {'export': self.export_name, 'query': request.GET.urlencode()}, user=request.user)
+        return HttpResponseRedirect(reverse('job_detail', kwargs={'id': job.pk}))
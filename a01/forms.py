@@ -1,10 +1,19 @@
 """All adding and editing forms for app a01."""
 
+import codecs
 import datetime
+import uuid
+import zipfile
+from collections import OrderedDict
 from django import forms
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import FloatField
+from django.db.models import Q
+from django.db.models.functions import Cast
 from a01.models import CourseType
 from a01.models import Class
 from a01.models import Course
+from a01.models import CourseSession
 from a01.models import Teacher
 from a01.models import Contract
 from a01.models import Student
@@ -12,22 +21,138 @@ from a01.models import TeacherSalary
 from a01.models import Transaction
 from a01.models import StudentLevel
 from a01.models import Worker
+from a01.models import Room
+from a01.caches import active_courses
+from a01.caches import active_course_types
 from django.forms import formset_factory
 from django.forms.formsets import BaseFormSet
+from django.utils.functional import cached_property
 import django_filters
 
-from a01.choices import MONTHS
-from a01.choices import FORM_CHOICES
-from a01.choices import LEVEL_CHOICES
-from a01.choices import TXN_METHODS
-from a01.choices import SHIFTS
-from a01.choices import CLASS_CHANGE_CHOICES
+from a01.choices import ClassChange
+from a01.choices import Direction
+from a01.choices import Level
+from a01.choices import Month
+from a01.choices import Shift
+from a01.choices import TxnMethod
+from a01.choices import TxnType
+from a01.choices import Weekday
 from a01.choices import NON_FREE
+from a01.services import ALREADY_IN_CLASS
+from a01.timetable import overlapping
+
+
+class CachedModelChoiceField(forms.ChoiceField):
+    """
+    ModelChoiceField over objects held in memory.
+
+    ``objects`` is {str(pk): obj}, or a callable returning it such as
+    a01.caches.active_courses. It is loaded from ``queryset`` on first use
+    unless given, e.g. by SharedChoiceFormSet, so rendering and validating
+    a bound field run at most one query instead of one each.
+    """
+
+    def __init__(self, queryset=None, objects=None, empty_label="---------", *args, **kwargs):
+        """Choices are built lazily from objects."""
+        self.queryset = queryset
+        self.empty_label = empty_label
+        self._objects = objects
+        super(CachedModelChoiceField, self).__init__(choices=self._choice_list, *args, **kwargs)
+
+    def __deepcopy__(self, memo):
+        """Bind lazy choices to the copy, not to the declared field."""
+        result = super(CachedModelChoiceField, self).__deepcopy__(memo)
+        result.choices = result._choice_list
+        return result
+
+    @property
+    def objects(self):
+        """Map of str(pk) to object."""
+        if self._objects is None:
+            self._objects = OrderedDict((str(obj.pk), obj) for obj in self.queryset.all())
+        elif callable(self._objects):
+            self._objects = self._objects()
+        return self._objects
+
+    @objects.setter
+    def objects(self, value):
+        self._objects = value
+
+    def _choice_list(self):
+        """Select options."""
+        return [('', self.empty_label)] + [(pk, str(obj)) for pk, obj in self.objects.items()]
+
+    def prepare_value(self, value):
+        """Render object as its pk."""
+        if hasattr(value, '_meta'):
+            return value.pk
+        return super(CachedModelChoiceField, self).prepare_value(value)
+
+    def to_python(self, value):
+        """Return object for submitted pk from the in-memory map."""
+        if value in self.empty_values:
+            return None
+        obj = self.objects.get(str(self.prepare_value(value)))
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
+
+    def validate(self, value):
+        """Membership is checked by to_python already."""
+        forms.Field.validate(self, value)
+
+
+class CachedModelChoiceFilter(django_filters.Filter):
+    """Filter by object picked from CachedModelChoiceField."""
+
+    field_class = CachedModelChoiceField
+
+
+class SharedChoiceFormSet(BaseFormSet):
+    """
+    Formset whose forms share one evaluated list of choices.
+
+    Choices of ``choice_field`` are loaded once per formset and handed to
+    every form through form kwarg ``shared_choices``.
+    """
+
+    choice_field = None
+
+    @cached_property
+    def shared_choices(self):
+        """Objects of choice_field, evaluated once."""
+        field = self.form.base_fields[self.choice_field]
+        return OrderedDict((str(obj.pk), obj) for obj in field.queryset.all())
+
+    def get_form_kwargs(self, index):
+        """Pass shared choices to each form."""
+        kwargs = super(SharedChoiceFormSet, self).get_form_kwargs(index)
+        kwargs['shared_choices'] = self.shared_choices
+        return kwargs
+
+
+class SharedChoiceFormMixin(object):
+    """Form side of SharedChoiceFormSet."""
+
+    def __init__(self, *args, **kwargs):
+        """Take shared choices given by formset."""
+        shared_choices = kwargs.pop('shared_choices', None)
+        super(SharedChoiceFormMixin, self).__init__(*args, **kwargs)
+        if shared_choices is not None:
+            for field in self.fields.values():
+                if isinstance(field, CachedModelChoiceField):
+                    field.objects = shared_choices
 
 
-class CustomBaseFormSet(BaseFormSet):
+class CustomBaseFormSet(SharedChoiceFormSet):
     """Using validation."""
 
+    choice_field = 'teacher'
+
     def clean(self):
         """
         Add validation to check that no two links have the same anchor or URL.
@@ -54,9 +179,11 @@ class CustomBaseFormSet(BaseFormSet):
                     )
 
 
-class WorkerCustomBaseFormSet(BaseFormSet):
+class WorkerCustomBaseFormSet(SharedChoiceFormSet):
     """Using validation."""
 
+    choice_field = 'worker'
+
     def clean(self):
         """
         Add validation to check that no two links have the same anchor or URL.
@@ -121,10 +248,10 @@ class CourseTypeForm(forms.ModelForm):
         self.fields['hourly_price'].widget.attrs['readonly'] = True
 
 
-class TeacherCourseForm(forms.Form):
+class TeacherCourseForm(SharedChoiceFormMixin, forms.Form):
     """Form set."""
 
-    teacher = forms.ModelChoiceField(label='Багш', queryset=Teacher.objects.filter(flag=True))
+    teacher = CachedModelChoiceField(label='Багш', queryset=Teacher.objects.filter(flag=True))
     lesson = forms.CharField(label="Сэдэв")
 
     def __init__(self, *args, **kwargs):
@@ -137,6 +264,29 @@ class TeacherCourseForm(forms.Form):
 TeacherCourseFormSet = formset_factory(TeacherCourseForm, formset=CustomBaseFormSet)
 
 
+def new_request_key():
+    """Idempotency key of a freshly rendered form."""
+    return uuid.uuid4().hex
+
+
+class RequestKeyField(forms.CharField):
+    """
+    Hidden idempotency key of a create form, see a01.services.create_contract.
+
+    A new key is rendered with every empty form and posted back unchanged,
+    so a resubmitted or retried POST carries the key of the first one.
+    """
+
+    widget = forms.HiddenInput
+
+    def __init__(self, **kwargs):
+        """Optional, so old clients without the key still work."""
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('max_length', 64)
+        kwargs.setdefault('initial', new_request_key)
+        super(RequestKeyField, self).__init__(**kwargs)
+
+
 class ContractForm(forms.Form):
     """Form to register all information necessary for Contract."""
 
@@ -146,13 +296,14 @@ class ContractForm(forms.Form):
     phone = forms.CharField(label="Утас")
     birthday = forms.DateTimeField(label="Төрсөн өдөр", required=False)
     con_date = forms.DateTimeField(label="Гэрээний огноо", initial=datetime.date.today().strftime('%m/%d/%Y'))
-    course = forms.ModelChoiceField(label='Анги', queryset=Course.objects.filter(flag=True))
+    course = CachedModelChoiceField(label='Анги', objects=active_courses)
     payment = forms.IntegerField(label="Төлж буй төлбөр")
     minus_length = forms.IntegerField(label="Хасагдсан цаг", initial=0)
     off_percent = forms.IntegerField(label="Хямдрал", required=False, initial=0)
     description = forms.CharField(label="Тайлбар", required=False)
-    txn_method = forms.ChoiceField(choices=TXN_METHODS, label="Төрөл")
+    txn_method = forms.ChoiceField(choices=TxnMethod.choices, label="Төрөл")
     contract_number = forms.CharField(label="Гэрээний дугаар")
+    request_key = RequestKeyField()
 
     def __init__(self, *args, **kwargs):
         """Redefined __init__ in order to customize form."""
@@ -164,12 +315,69 @@ class ContractForm(forms.Form):
         self.fields['con_date'].widget.attrs['class'] = 'form-control datetimepicker'
 
 
+class ContractImportForm(ContractForm):
+    """One row of contract import, validated with the rules of ContractForm."""
+
+    course = forms.CharField(label='Анги')
+
+    def __init__(self, courses, *args, **kwargs):
+        """Courses is {str(pk): Course} loaded once for the whole import."""
+        super(ContractImportForm, self).__init__(*args, **kwargs)
+        self.courses = courses
+
+    def clean_course(self):
+        """Look course up in preloaded courses instead of querying per row."""
+        course = self.courses.get(self.cleaned_data['course'].strip())
+        if course is None:
+            raise forms.ValidationError('Анги олдсонгүй.', code='invalid_choice')
+        return course
+
+
+CSV_ENCODING_ERROR = 'Файл UTF-8 биш байна, Excel-ээс "CSV UTF-8" төрлөөр хадгална уу.'
+XLSX_ERROR = 'Excel файл уншигдсангүй, эвдэрсэн эсвэл .xlsx биш байна.'
+
+
+class ContractUploadForm(forms.Form):
+    """Upload of CSV or XLSX file with contracts."""
+
+    file = forms.FileField(label="Файл (.csv, .xlsx)")
+
+    def __init__(self, *args, **kwargs):
+        """Redefined __init__ in order to customize form."""
+        super(ContractUploadForm, self).__init__(*args, **kwargs)
+        self.fields['file'].widget.attrs['class'] = 'form-control'
+
+    def clean_file(self):
+        """Only csv and xlsx are supported."""
+        upload = self.cleaned_data['file']
+        name = upload.name.lower()
+        if not name.endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('Зөвхөн .csv эсвэл .xlsx файл оруулна уу.')
+
+        # Catch the usual wrong files now instead of in the background job.
+        if name.endswith('.xlsx'):
+            valid = zipfile.is_zipfile(upload)
+            error = XLSX_ERROR
+        else:
+            try:
+                # Not final, a character cut at the end of the block is fine.
+                codecs.getincrementaldecoder('utf-8')().decode(upload.read(64 * 1024))
+                valid = True
+            except UnicodeDecodeError:
+                valid = False
+            error = CSV_ENCODING_ERROR
+        upload.seek(0)
+        if not valid:
+            raise forms.ValidationError(error)
+        return upload
+
+
 class ContractPaymentForm(forms.Form):
     """Form used for additional payment."""
 
     payment = forms.IntegerField(label="Төлж буй төлбөр")
     txn_date = forms.DateTimeField(label="Гүйлгээний огноо")
-    txn_method = forms.ChoiceField(choices=TXN_METHODS, label="Төрөл")
+    txn_method = forms.ChoiceField(choices=TxnMethod.choices, label="Төрөл")
     description = forms.CharField(label="Тайлбар", required=False)
 
     def __init__(self, *args, **kwargs):
@@ -184,9 +392,9 @@ class ContractPaymentForm(forms.Form):
 class ContractClassChangeForm(forms.Form):
     """Form used for changing courses payment."""
 
-    course = forms.ModelChoiceField(label='Анги', queryset=Course.objects.filter(flag=True))
-    txn_method = forms.ChoiceField(choices=TXN_METHODS, label="Төрөл")
-    class_change = forms.ChoiceField(choices=CLASS_CHANGE_CHOICES, label="Төлбөртэй эсэх", initial=NON_FREE)
+    course = CachedModelChoiceField(label='Анги', objects=active_courses)
+    txn_method = forms.ChoiceField(choices=TxnMethod.choices, label="Төрөл")
+    class_change = forms.ChoiceField(choices=ClassChange.choices, label="Төлбөртэй эсэх", initial=NON_FREE)
     description = forms.CharField(label="Тайлбар", required=False)
 
     def clean(self):
@@ -241,8 +449,8 @@ class TeacherSalaryDateForm(forms.Form):
     """Filter form."""
 
     year = forms.IntegerField(label="Он")
-    month = forms.ChoiceField(label="Сар", choices=MONTHS)
-    mshift = forms.ChoiceField(label="Ээлж", choices=SHIFTS)
+    month = forms.ChoiceField(label="Сар", choices=Month.choices)
+    mshift = forms.ChoiceField(label="Ээлж", choices=Shift.choices)
 
     def __init__(self, *args, **kwargs):
         """Redefined __init__ in order to customize form."""
@@ -252,10 +460,10 @@ class TeacherSalaryDateForm(forms.Form):
         self.fields['mshift'].widget.attrs['class'] = 'form-control'
 
 
-class TeacherSalaryForm(forms.Form):
+class TeacherSalaryForm(SharedChoiceFormMixin, forms.Form):
     """Form set."""
 
-    teacher = forms.ModelChoiceField(label='Багш', queryset=Teacher.objects.filter(flag=True))
+    teacher = CachedModelChoiceField(label='Багш', queryset=Teacher.objects.filter(flag=True))
     hour = forms.IntegerField(label="Ажилсан цаг")
 
     def __init__(self, *args, **kwargs):
@@ -268,10 +476,10 @@ class TeacherSalaryForm(forms.Form):
 TeacherSalaryFormSet = formset_factory(TeacherSalaryForm, formset=CustomBaseFormSet)
 
 
-class WorkerSalaryForm(forms.Form):
+class WorkerSalaryForm(SharedChoiceFormMixin, forms.Form):
     """Form set."""
 
-    worker = forms.ModelChoiceField(label='Ажилтан', queryset=Worker.objects.filter(flag=True))
+    worker = CachedModelChoiceField(label='Ажилтан', queryset=Worker.objects.filter(flag=True))
     wage = forms.IntegerField(label="Ажилсан цаг")
 
     def __init__(self, *args, **kwargs):
@@ -284,10 +492,35 @@ class WorkerSalaryForm(forms.Form):
 WorkerSalaryFormSet = formset_factory(WorkerSalaryForm, formset=WorkerCustomBaseFormSet)
 
 
+class TrigramSearchMixin(object):
+    """
+    FilterSet method for fuzzy name search.
+
+    Matches misspelled names with pg_trgm similarity (%) and substrings with
+    icontains, both served by GIN trigram indexes (migration 0002), and
+    ranks result by similarity.
+    """
+
+    def trigram_search(self, queryset, name, value):
+        """Filter and rank queryset by similarity of field name to value."""
+        value = value.strip()
+        if not value:
+            return queryset
+
+        similar = Q(**{name + '__trigram_similar': value})
+        contains = Q(**{name + '__icontains': value})
+        queryset = queryset.filter(similar | contains)
+        # similarity() is real (float4); as float8 the value in the keyset
+        # cursor compares equal to the row it came from, so rows tied on the
+        # last score of a page are not skipped.
+        similarity = Cast(TrigramSimilarity(name, value), FloatField())
+        return queryset.annotate(similarity=similarity).order_by('-similarity', '-id')
+
+
 class CourseFilter(django_filters.FilterSet):
     """Filter for course."""
 
-    ctype = django_filters.ModelChoiceFilter(queryset=CourseType.objects.filter(flag=True))
+    ctype = CachedModelChoiceFilter(objects=active_course_types)
     flag = django_filters.BooleanFilter()
 
     class Meta:
@@ -302,11 +535,11 @@ class CourseFilter(django_filters.FilterSet):
         }
 
 
-class ContractFilter(django_filters.FilterSet):
+class ContractFilter(TrigramSearchMixin, django_filters.FilterSet):
     """Filter for course."""
 
-    student__fname = django_filters.CharFilter(lookup_expr='icontains', label="Сурагчийн нэр")
-    course = django_filters.ModelChoiceFilter(queryset=Course.objects.filter(flag=True))
+    student__fname = django_filters.CharFilter(method='trigram_search', label="Сурагчийн нэр")
+    course = CachedModelChoiceFilter(objects=active_courses)
     flag = django_filters.BooleanFilter()
 
     class Meta:
@@ -322,12 +555,13 @@ class ContractFilter(django_filters.FilterSet):
         }
 
 
-class StudentFilter(django_filters.FilterSet):
+class StudentFilter(TrigramSearchMixin, django_filters.FilterSet):
     """Filter for course."""
 
-    fname = django_filters.CharFilter(lookup_expr='icontains', label="Нэр")
+    fname = django_filters.CharFilter(method='trigram_search', label="Нэр")
     register = django_filters.CharFilter(lookup_expr='icontains', label="Регистерийн дугаар")
     phone = django_filters.CharFilter(lookup_expr='icontains', label="Утас")
+    flag = django_filters.BooleanFilter()
 
     class Meta:
         """Meta."""
@@ -337,14 +571,15 @@ class StudentFilter(django_filters.FilterSet):
         fields = [
             'fname',
             'register',
-            'phone'
+            'phone',
+            'flag',
         ]
 
 
-class SalaryFilter(django_filters.FilterSet):
+class SalaryFilter(TrigramSearchMixin, django_filters.FilterSet):
     """Filter for course."""
 
-    teacher__fname = django_filters.CharFilter(lookup_expr='icontains', label="Багшийн нэр")
+    teacher__fname = django_filters.CharFilter(method='trigram_search', label="Багшийн нэр")
 
     class Meta:
         """Meta."""
@@ -356,6 +591,9 @@ class SalaryFilter(django_filters.FilterSet):
 class TransactionFilter(django_filters.FilterSet):
     """Filter for course."""
 
+    flag = django_filters.BooleanFilter()
+    direction = django_filters.ChoiceFilter(choices=Direction.choices, method='filter_direction', label="Орлого / зарлага")
+
     class Meta:
         """Meta."""
 
@@ -364,13 +602,18 @@ class TransactionFilter(django_filters.FilterSet):
         fields = {
             'txn_date': ['lt', 'gt'],
             'txn_type': ['exact'],
+            'flag': ['exact'],
         }
 
+    def filter_direction(self, queryset, name, value):
+        """Incomes or expenses, by txn_type values of TxnType."""
+        return queryset.filter(txn_type__in=TxnType.types_of(value))
+
 
 class TransactionForm(forms.ModelForm):
     """Form for Transaction."""
 
-    txn_type = forms.ChoiceField(choices=FORM_CHOICES, label="Төрөл")
+    txn_type = forms.ChoiceField(choices=TxnType.form_choices, label="Төрөл")
 
     class Meta:
         """Meta."""
@@ -391,14 +634,15 @@ class TransactionForm(forms.ModelForm):
 class ContractfromStudentForm(forms.Form):
     """Form to register all information necessary for Contract."""
 
-    course = forms.ModelChoiceField(label='Анги', queryset=Course.objects.filter(flag=True))
+    course = CachedModelChoiceField(label='Анги', objects=active_courses)
     payment = forms.IntegerField(label="Төлж буй төлбөр")
     con_date = forms.DateTimeField(label="Гэрээний огноо", initial=datetime.date.today().strftime('%m/%d/%Y'))
-    txn_method = forms.ChoiceField(choices=TXN_METHODS, label="Төрөл")
+    txn_method = forms.ChoiceField(choices=TxnMethod.choices, label="Төрөл")
     contract_number = forms.CharField(label="Гэрээний дугаар")
     minus_length = forms.IntegerField(label="Хасагдсан цаг", initial=0)
     off_percent = forms.IntegerField(label="Хямдрал", required=False, initial=0)
     description = forms.CharField(label="Тайлбар", required=False)
+    request_key = RequestKeyField()
 
     def clean(self):
         """Cleaning data."""
@@ -411,7 +655,11 @@ class ContractfromStudentForm(forms.Form):
         cls = Class.objects.filter(course=course, student=student)
 
         if cls:
-            raise forms.ValidationError("Энэ сурагч энэ ангид гэрээ хийгдсэн байна.")
+            # Retried POST of a contract already made: create_contract returns it.
+            key = cleaned_data.get('request_key')
+            if key and Contract.objects.filter(request_key=key, student=student).exists():
+                return cleaned_data
+            raise forms.ValidationError(ALREADY_IN_CLASS)
         else:
             return cleaned_data
 
@@ -425,10 +673,10 @@ class ContractfromStudentForm(forms.Form):
         self.fields['con_date'].widget.attrs['class'] = 'form-control datetimepicker'
 
 
-class StudentLevelFilter(django_filters.FilterSet):
+class StudentLevelFilter(TrigramSearchMixin, django_filters.FilterSet):
     """Filter for course."""
 
-    student__fname = django_filters.CharFilter(lookup_expr='icontains', label="Оюутаны нэр")
+    student__fname = django_filters.CharFilter(method='trigram_search', label="Оюутаны нэр")
 
     class Meta:
         """Meta."""
@@ -444,7 +692,7 @@ class StudentLevelFilter(django_filters.FilterSet):
 class StudentNoLevelForm(forms.ModelForm):
     """Form for StudentLevel."""
 
-    level = forms.ChoiceField(choices=LEVEL_CHOICES, label="Түвшин")
+    level = forms.ChoiceField(choices=Level.choices, label="Түвшин")
 
     class Meta:
         """Meta."""
@@ -463,7 +711,7 @@ class StudentNoLevelForm(forms.ModelForm):
 class StudentLevelForm(forms.ModelForm):
     """Form for StudentLevel."""
 
-    level = forms.ChoiceField(choices=LEVEL_CHOICES, label="Түвшин")
+    level = forms.ChoiceField(choices=Level.choices, label="Түвшин")
 
     class Meta:
         """Meta."""
@@ -522,3 +770,100 @@ class WorkerForm(forms.ModelForm):
         for each in self.fields:
             self.fields[each].widget.attrs['class'] = 'form-control'
         self.fields['birthday'].widget.attrs['class'] = 'form-control datetimepicker'
+
+
+class RoomForm(forms.ModelForm):
+    """Form used to save Room."""
+
+    class Meta:
+        """Meta."""
+
+        model = Room
+        fields = ['name', 'capacity', 'info']
+
+    def __init__(self, *args, **kwargs):
+        """Redefined __init__ in order to customize form."""
+        super(RoomForm, self).__init__(*args, **kwargs)
+        for each in self.fields:
+            self.fields[each].widget.attrs['class'] = 'form-control'
+
+
+class CourseSessionForm(forms.ModelForm):
+    """
+    Form used to save CourseSession.
+
+    Refuses a session overlapping an active one of the same room, teacher
+    or course; the exclusion constraints catch the rest. Shift follows
+    from the start time.
+    """
+
+    course = CachedModelChoiceField(label='Хичээл', objects=active_courses)
+    teacher = CachedModelChoiceField(label='Багш', queryset=Teacher.objects.filter(flag=True), required=False)
+    room = CachedModelChoiceField(label='Анги танхим', queryset=Room.objects.filter(flag=True).order_by('name'), required=False)
+
+    class Meta:
+        """Meta."""
+
+        model = CourseSession
+        fields = ['course', 'teacher', 'room', 'weekday', 'start_time', 'end_time']
+
+    def __init__(self, *args, **kwargs):
+        """Redefined __init__ in order to customize form."""
+        super(CourseSessionForm, self).__init__(*args, **kwargs)
+        for each in self.fields:
+            self.fields[each].widget.attrs['class'] = 'form-control'
+
+    def clean(self):
+        """Times in order, shift of start time and no overlapping session."""
+        cleaned_data = super(CourseSessionForm, self).clean()
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        if start_time is not None:
+            self.instance.mshift = Shift.of_time(start_time)
+        if start_time is None or end_time is None or cleaned_data.get('weekday') is None or not cleaned_data.get('course'):
+            return cleaned_data
+        if start_time >= end_time:
+            raise forms.ValidationError('Дуусах цаг эхлэх цагаас хойш байх ёстой.')
+
+        session = CourseSession(
+            pk=self.instance.pk,
+            course=cleaned_data['course'],
+            teacher=cleaned_data.get('teacher'),
+            room=cleaned_data.get('room'),
+            weekday=cleaned_data['weekday'],
+            start_time=start_time,
+            end_time=end_time,
+        )
+        clashes = overlapping(session).select_related('course__ctype', 'teacher', 'room')[:5]
+        errors = []
+        for other in clashes:
+            if session.room_id is not None and other.room_id == session.room_id:
+                errors.append('%s танхимд %s цагт %s хичээлтэй.' % (other.room, other, other.course))
+            if session.teacher_id is not None and other.teacher_id == session.teacher_id:
+                errors.append('%s багш %s цагт %s хичээлтэй.' % (other.teacher, other, other.course))
+            if other.course_id == session.course_id:
+                errors.append('Энэ хичээл %s цагт орно.' % other)
+        if errors:
+            raise forms.ValidationError(errors)
+        return cleaned_data
+
+
+class CourseSessionFilter(django_filters.FilterSet):
+    """Filter for timetable."""
+
+    course = CachedModelChoiceFilter(objects=active_courses)
+    weekday = django_filters.ChoiceFilter(choices=Weekday.choices)
+    mshift = django_filters.ChoiceFilter(choices=Shift.choices)
+
+    class Meta:
+        """Meta."""
+
+        model = CourseSession
+
+        fields = {
+            'course': ['exact'],
+            'teacher': ['exact'],
+            'room': ['exact'],
+            'weekday': ['exact'],
+            'mshift': ['exact'],
+        }
@@ -0,0 +1,227 @@
+"""Bulk import of contracts from CSV and XLSX files."""
+
+import csv
+import io
+import zipfile
+
+from django.db import DatabaseError
+from django.db import transaction
+
+from a01.caches import active_courses
+from a01.caches import bump_model_versions
+from a01.caches import invalidate_profit_loss
+from a01.choices import CONTRACT_INCOME
+from a01.forms import CSV_ENCODING_ERROR
+from a01.forms import ContractImportForm
+from a01.forms import XLSX_ERROR
+from a01.models import Class
+from a01.models import Contract
+from a01.models import Student
+from a01.models import Transaction
+from a01.services import change_course_counters
+from a01.services import contract_req_payment
+
+try:
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+except ImportError:
+    openpyxl = None
+    InvalidFileException = zipfile.BadZipFile
+
+
+IMPORT_COLUMNS = (
+    'fname',
+    'lname',
+    'register',
+    'phone',
+    'birthday',
+    'con_date',
+    'course',
+    'payment',
+    'minus_length',
+    'off_percent',
+    'description',
+    'txn_method',
+    'contract_number',
+)
+
+CHUNK_SIZE = 500
+
+
+class ImportFileError(Exception):
+    """File can not be read any further, rows before line were read fine."""
+
+    def __init__(self, line, message):
+        """Keep line and readable message."""
+        super(ImportFileError, self).__init__(message)
+        self.line = line
+        self.message = message
+
+
+class ImportResult(object):
+    """Outcome of an import: number of created contracts and row errors."""
+
+    def __init__(self):
+        """Empty result."""
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, messages):
+        """Remember why row at line was not imported."""
+        self.errors.append((line, messages))
+
+
+def read_rows(fileobj, filename):
+    """Yield (line number, row dict) of uploaded CSV or XLSX file."""
+    if filename.lower().endswith('.xlsx'):
+        return _read_xlsx(fileobj)
+    return _read_csv(fileobj)
+
+
+def _read_csv(fileobj):
+    """Stream rows of CSV file, header row names the columns."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    try:
+        for row in reader:
+            yield reader.line_num, _clean_row(row)
+    except UnicodeDecodeError:
+        # Text is decoded in blocks, the bad byte is at or after this line.
+        raise ImportFileError(reader.line_num + 1, CSV_ENCODING_ERROR)
+    except csv.Error as e:
+        raise ImportFileError(reader.line_num, 'CSV файл уншигдсангүй: %s.' % e)
+
+
+def _read_xlsx(fileobj):
+    """Stream rows of first sheet of XLSX file."""
+    if openpyxl is None:
+        raise ImportFileError(0, '.xlsx файл уншихад openpyxl сан суулгах шаардлагатай.')
+    try:
+        sheet = openpyxl.load_workbook(fileobj, read_only=True, data_only=True).active
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError):
+        raise ImportFileError(0, XLSX_ERROR)
+    header = None
+    for line, row in enumerate(sheet.iter_rows(), start=1):
+        values = [cell.value for cell in row]
+        if header is None:
+            header = [str(value or '').strip() for value in values]
+            continue
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield line, _clean_row(dict(zip(header, values)))
+
+
+def _clean_row(row):
+    """Keep known columns, strip strings and drop empty cells."""
+    data = {}
+    for key in IMPORT_COLUMNS:
+        value = row.get(key)
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in (None, ''):
+            data[key] = value
+    return data
+
+
+def import_contracts(rows, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Validate rows with ContractImportForm and create Student, Contract,
+    Transaction and Class for valid ones with bulk inserts, one transaction
+    per chunk of rows. progress, if given, is called with the result so far
+    after every chunk.
+
+    A file that can not be read further (ImportFileError) ends the import:
+    rows read before are saved and the reason is the last row error.
+    """
+    courses = active_courses()
+    result = ImportResult()
+    chunk = []
+
+    try:
+        for line, row in rows:
+            form = ContractImportForm(courses, data=row)
+            if form.is_valid():
+                chunk.append((line, form.cleaned_data))
+            else:
+                result.add_error(line, [
+                    '%s: %s' % (field, ' '.join(messages))
+                    for field, messages in form.errors.items()
+                ])
+
+            if len(chunk) >= chunk_size:
+                _save_chunk(chunk, result)
+                chunk = []
+                if progress is not None:
+                    progress(result)
+    except ImportFileError as e:
+        result.add_error(e.line, [e.message])
+
+    if chunk:
+        _save_chunk(chunk, result)
+
+    return result
+
+
+def _save_chunk(chunk, result):
+    """Insert one chunk of validated rows with four bulk_create calls and count them per course."""
+    try:
+        with transaction.atomic():
+            students = [
+                Student(
+                    fname=data['fname'],
+                    lname=data['lname'],
+                    register=data['register'],
+                    phone=data['phone'],
+                    birthday=data['birthday'],
+                )
+                for line, data in chunk
+            ]
+            Student.objects.bulk_create(students)
+
+            contracts = []
+            for (line, data), st in zip(chunk, students):
+                con = Contract(
+                    contract_number=data['contract_number'],
+                    date=data['con_date'],
+                    student=st,
+                    course=data['course'],
+                    minus_length=data['minus_length'],
+                    total_payment=data['payment'],
+                    off_percent=data['off_percent'] or 0,
+                    description=data['description'],
+                    req_payment=contract_req_payment(data['course'], data['minus_length'], data['off_percent']),
+                )
+                con.balance = con.remainder_payment()
+                contracts.append(con)
+            Contract.objects.bulk_create(contracts)
+
+            Transaction.objects.bulk_create([
+                Transaction(
+                    contract=con,
+                    txn_type=CONTRACT_INCOME,
+                    amount=data['payment'],
+                    txn_date=data['con_date'],
+                    txn_method=data['txn_method'],
+                )
+                for (line, data), con in zip(chunk, contracts)
+            ])
+
+            Class.objects.bulk_create([
+                Class(student=st, course=data['course'])
+                for (line, data), st in zip(chunk, students)
+            ])
+
+            per_course = {}
+            for line, data in chunk:
+                per_course[data['course']] = per_course.get(data['course'], 0) + 1
+            for course, count in per_course.items():
+                change_course_counters(course, enrollments=count, contracts=count)
+
+            invalidate_profit_loss([data['con_date'] for line, data in chunk])
+            bump_model_versions(Student, Contract, Transaction, Class)
+    except DatabaseError as e:
+        for line, data in chunk:
+            result.add_error(line, [str(e)])
+        return
+
+    result.created += len(chunk)
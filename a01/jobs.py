@@ -0,0 +1,231 @@
+"""
+Background jobs of app a01, stored in table a01_job.
+
+Views enqueue() a job and redirect to its status page. manage.py run_jobs
+claims queued jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+worker threads and processes share the table without an external broker.
+Tasks are functions registered with @task in a01.tasks; they are called
+with the job and its params and return a json friendly result. While a task
+runs a heartbeat thread touches the job every HEARTBEAT_INTERVAL seconds, so
+requeue_stale only picks up jobs whose worker died.
+"""
+
+import datetime
+import importlib
+import logging
+import os
+import socket
+import threading
+import traceback
+
+from django.db import close_old_connections
+from django.db import DatabaseError
+from django.db import connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from a01.choices import JOB_DONE
+from a01.choices import JOB_FAILED
+from a01.choices import JOB_QUEUED
+from a01.choices import JOB_RUNNING
+from a01.models import Job
+
+
+logger = logging.getLogger('a01.jobs')
+
+TASKS = {}
+
+POLL_INTERVAL = 2
+RETRY_DELAY = 30
+STALE_TIMEOUT = 10 * 60
+HEARTBEAT_INTERVAL = 60
+
+
+class JobError(Exception):
+    """Failure that another attempt would not fix, job fails at once."""
+
+
+def task(name):
+    """Register function as task called name."""
+    def register(func):
+        """Remember func."""
+        TASKS[name] = func
+        return func
+    return register
+
+
+def autodiscover():
+    """Register tasks of a01.tasks."""
+    importlib.import_module('a01.tasks')
+
+
+def enqueue(name, params=None, user=None, max_attempts=None):
+    """Queue task name with json friendly params, return the Job."""
+    job = Job(name=name, params=params or {})
+    if user is not None and user.is_authenticated:
+        job.created_by = user
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def worker_name():
+    """Host, process and thread of current worker."""
+    return '%s:%s:%s' % (socket.gethostname(), os.getpid(), threading.current_thread().name)
+
+
+def claim(worker):
+    """
+    Mark oldest due queued job as running by worker and return it.
+
+    Rows locked by other workers are skipped instead of waited for, so
+    workers never block each other and no job is claimed twice.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=JOB_QUEUED, run_at__lte=now).order_by('run_at', 'id').first()
+        if job is None:
+            return None
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        job.started_at = now
+        job.worker = worker[:100]
+        job.progress = 0
+        job.progress_message = ''
+        job.save(update_fields=['status', 'attempts', 'started_at', 'worker', 'progress', 'progress_message', 'updated_at'])
+    return job
+
+
+def set_progress(job, percent, message=''):
+    """Store progress of running job, also a heartbeat for requeue_stale."""
+    job.progress = min(max(int(percent), 0), 100)
+    job.progress_message = message[:200]
+    Job.objects.filter(pk=job.pk).update(
+        progress=job.progress, progress_message=job.progress_message, updated_at=timezone.now())
+
+
+def touch(job):
+    """Heartbeat of running job for requeue_stale."""
+    Job.objects.filter(pk=job.pk, status=JOB_RUNNING).update(updated_at=timezone.now())
+
+
+class Heartbeat(object):
+    """Touch job every interval seconds from a thread while the block runs."""
+
+    def __init__(self, job, interval=None):
+        """Job to keep alive."""
+        self.job = job
+        self.interval = interval or HEARTBEAT_INTERVAL
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='heartbeat-%s' % job.pk, daemon=True)
+
+    def __enter__(self):
+        """Start beating."""
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop beating and wait for the thread."""
+        self.stop.set()
+        self.thread.join()
+
+    def run(self):
+        """Touch job until stopped, close the thread's connection at the end."""
+        try:
+            while not self.stop.wait(self.interval):
+                try:
+                    touch(self.job)
+                except DatabaseError:
+                    logger.exception('Heartbeat of job %s failed.', self.job.pk)
+                    connection.close()
+        finally:
+            connection.close()
+
+
+def run_job(job):
+    """Run claimed job, store result or retry it later with growing delay."""
+    autodiscover()
+    try:
+        func = TASKS.get(job.name)
+        if func is None:
+            raise JobError('Unknown job %s.' % job.name)
+        with Heartbeat(job):
+            result = func(job, **job.params)
+    except JobError as e:
+        fail(job, str(e), retry=False)
+        return
+    except Exception:
+        fail(job, traceback.format_exc())
+        return
+
+    job.status = JOB_DONE
+    job.result = result
+    job.error = ''
+    job.progress = 100
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'progress', 'finished_at', 'updated_at'])
+
+
+def fail(job, error, retry=True):
+    """Queue job again after RETRY_DELAY * 2 ** (attempts - 1) or give up."""
+    now = timezone.now()
+    job.error = error
+    if retry and job.attempts < job.max_attempts:
+        job.status = JOB_QUEUED
+        job.run_at = now + datetime.timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = JOB_FAILED
+        job.finished_at = now
+    job.save(update_fields=['status', 'error', 'run_at', 'finished_at', 'updated_at'])
+
+
+def requeue_stale(timeout=STALE_TIMEOUT):
+    """
+    Queue again running jobs silent for timeout seconds, their worker died.
+
+    timeout must be well above HEARTBEAT_INTERVAL.
+
+    Jobs out of attempts fail instead. Returns number of requeued jobs.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=JOB_RUNNING, updated_at__lt=now - datetime.timedelta(seconds=timeout))
+    with transaction.atomic():
+        stale.filter(attempts__gte=F('max_attempts')).update(
+            status=JOB_FAILED, error='Worker stopped responding.', finished_at=now, updated_at=now)
+        return stale.update(status=JOB_QUEUED, run_at=now, updated_at=now)
+
+
+def work(stop, poll=POLL_INTERVAL, once=False, stale=STALE_TIMEOUT):
+    """
+    Claim and run jobs until stop event is set.
+
+    Idle workers requeue jobs of dead workers. With once the loop ends when
+    no job is due instead. Database connection of the thread is closed at
+    the end.
+    """
+    worker = worker_name()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                job = claim(worker)
+                if job is not None:
+                    run_job(job)
+                elif not once:
+                    requeue_stale(stale)
+            except DatabaseError:
+                # Lost connection or lock timeout, the next poll tries again
+                # and requeue_stale picks up a job left running.
+                logger.exception('Job worker %s failed.', worker)
+                connection.close()
+                stop.wait(poll)
+                continue
+            if job is None:
+                if once:
+                    break
+                stop.wait(poll)
+    finally:
+        connection.close()
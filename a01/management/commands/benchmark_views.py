@@ -0,0 +1,80 @@
+"""Benchmark a01 views against a JSON baseline, see a01.benchmark."""
+
+import datetime
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+
+from a01.benchmark import PERCENTILES
+from a01.benchmark import compare
+from a01.benchmark import load_baseline
+from a01.benchmark import run
+from a01.benchmark import save_baseline
+
+
+class Command(BaseCommand):
+    """manage.py benchmark_views [--save] [--only contract]."""
+
+    help = 'GET every a01 url, report latency percentiles and query counts, fail on regressions against baseline.'
+
+    def add_arguments(self, parser):
+        """Benchmark options."""
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'a01_views.json'))
+        parser.add_argument('--save', action='store_true', help='Write results as new baseline.')
+        parser.add_argument('--repeat', type=int, default=20, help='Measured requests per url.')
+        parser.add_argument('--warmup', type=int, default=1, help='Unmeasured requests per url first.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative p95 growth.')
+        parser.add_argument('--min-delta', type=float, default=5.0, help='Ignore p95 growth below so many ms.')
+        parser.add_argument('--only', action='append', help='Only urls whose name contains this, repeatable.')
+        parser.add_argument('--user', help='Username of requests, default first active superuser.')
+
+    def handle(self, *args, **options):
+        """Run, print table, then save or compare."""
+        user = self.get_user(options['user'])
+        results = run(user, repeat=options['repeat'], warmup=options['warmup'], include=options['only'])
+
+        columns = ['p%d' % p for p in PERCENTILES]
+        self.stdout.write('%-28s %6s %5s %s' % ('url', 'status', 'sql', ' '.join('%9s' % each for each in columns)))
+        for name, result in sorted(results.items()):
+            if 'skipped' in result:
+                self.stdout.write('%-28s skipped: %s' % (name, result['skipped']))
+                continue
+            self.stdout.write('%-28s %6s %5d %s' % (
+                name, result['status'], result['queries'], ' '.join('%9.1f' % result[each] for each in columns)))
+
+        path = options['baseline']
+        if options['save']:
+            directory = os.path.dirname(path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            save_baseline(path, results, meta={
+                'date': datetime.datetime.now().isoformat(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+            })
+            self.stdout.write(self.style.SUCCESS('Baseline saved to %s.' % path))
+            return
+
+        if not os.path.exists(path):
+            self.stdout.write('No baseline at %s, run with --save first.' % path)
+            return
+
+        regressions = compare(results, load_baseline(path), options['tolerance'], options['min_delta'])
+        for name, message in regressions:
+            self.stderr.write('%s: %s' % (name, message))
+        if regressions:
+            raise CommandError('%d regressions against %s.' % (len(regressions), path))
+        self.stdout.write(self.style.SUCCESS('No regressions against %s.' % path))
+
+    @staticmethod
+    def get_user(username):
+        """User making the requests."""
+        users = get_user_model().objects.filter(is_active=True)
+        user = users.filter(username=username).first() if username else users.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('No such user, pass --user or create a superuser.')
+        return user
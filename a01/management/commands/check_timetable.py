@@ -0,0 +1,52 @@
+"""Check the timetable of active courses for double booked rooms and teachers."""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from a01.choices import Weekday
+from a01.models import Room
+from a01.timetable import active_sessions
+from a01.timetable import assign_rooms
+from a01.timetable import find_conflicts
+from a01.timetable import load_slots
+from a01.timetable import save_rooms
+
+
+class Command(BaseCommand):
+    """manage.py check_timetable [--assign-rooms]."""
+
+    help = 'List overlapping sessions of one room, teacher or course; optionally give sessions without a room one.'
+
+    def add_arguments(self, parser):
+        """Command line options."""
+        parser.add_argument('--assign-rooms', action='store_true', help='Save rooms suggested for sessions without one.')
+
+    def handle(self, *args, **options):
+        """Report conflicts, fail when there are any."""
+        slots = load_slots(active_sessions())
+        started = time.perf_counter()
+        conflicts = find_conflicts(slots)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write('%d sessions checked in %.1f ms.' % (len(slots), elapsed))
+
+        for each in conflicts:
+            self.stdout.write('%s %s, %s: session %d %02d:%02d-%02d:%02d and session %d %02d:%02d-%02d:%02d' % (
+                each.kind, each.resource_id, Weekday.label(each.weekday),
+                each.first.pk, each.first.start // 60, each.first.start % 60, each.first.end // 60, each.first.end % 60,
+                each.second.pk, each.second.start // 60, each.second.start % 60, each.second.end // 60, each.second.end % 60,
+            ))
+
+        if options['assign_rooms']:
+            rooms = list(Room.objects.filter(flag=True))
+            started = time.perf_counter()
+            assigned, unassigned = assign_rooms(slots, rooms)
+            elapsed = (time.perf_counter() - started) * 1000
+            updated = save_rooms(assigned)
+            self.stdout.write('Rooms suggested in %.1f ms, %d sessions got a room, no room fits %d.' % (
+                elapsed, updated, len(unassigned)))
+
+        if conflicts:
+            raise CommandError('%d conflicts.' % len(conflicts))
+        self.stdout.write(self.style.SUCCESS('No conflicts.'))
@@ -0,0 +1,42 @@
+"""Fill database with synthetic a01 data for benchmarks, see a01.synthetic."""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from a01.synthetic import DEFAULTS
+from a01.synthetic import Generator
+
+
+class Command(BaseCommand):
+    """manage.py generate_data --students 100000 --transactions 1000000."""
+
+    help = 'Bulk insert synthetic students, courses, timetable, contracts, levels, transactions and salaries.'
+
+    def add_arguments(self, parser):
+        """Volumes of generated data."""
+        for name in ('students', 'transactions', 'courses', 'teachers', 'workers', 'months', 'rooms'):
+            parser.add_argument('--%s' % name, type=int, default=DEFAULTS[name])
+        parser.add_argument('--batch-size', type=int, default=DEFAULTS['batch_size'], help='Rows per INSERT and students per transaction.')
+        parser.add_argument('--seed', type=int, default=None, help='Seed of random data, same seed gives same data.')
+
+    def handle(self, *args, **options):
+        """Generate and report row counts."""
+        started = time.time()
+        generator = Generator(
+            students=options['students'],
+            transactions=options['transactions'],
+            courses=options['courses'],
+            teachers=options['teachers'],
+            workers=options['workers'],
+            months=options['months'],
+            rooms=options['rooms'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        counts = generator.run()
+
+        for model, count in sorted(counts.items(), key=lambda item: item[0].__name__):
+            self.stdout.write('%s: %d' % (model.__name__, count))
+        self.stdout.write(self.style.SUCCESS('Done in %.1fs.' % (time.time() - started)))
@@ -0,0 +1,29 @@
+"""Import contracts from CSV or XLSX file."""
+
+from django.core.management.base import BaseCommand
+
+from a01.importer import CHUNK_SIZE
+from a01.importer import IMPORT_COLUMNS
+from a01.importer import import_contracts
+from a01.importer import read_rows
+
+
+class Command(BaseCommand):
+    """manage.py import_contracts enrollments.csv."""
+
+    help = 'Import contracts with students, payments and classes. Columns: %s.' % ', '.join(IMPORT_COLUMNS)
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('path', help='.csv or .xlsx file')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per transaction.')
+
+    def handle(self, *args, **options):
+        """Run import and print row errors."""
+        path = options['path']
+        with open(path, 'rb') as fileobj:
+            result = import_contracts(read_rows(fileobj, path), chunk_size=options['chunk_size'])
+
+        for line, messages in result.errors:
+            self.stderr.write('line %s: %s' % (line, '; '.join(messages)))
+        self.stdout.write(self.style.SUCCESS('%d contracts imported, %d rows rejected.' % (result.created, len(result.errors))))
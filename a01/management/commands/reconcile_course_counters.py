@@ -0,0 +1,18 @@
+"""Repair drifted enrollment and active contract counters of courses."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from a01.services import reconcile_course_counters
+
+
+class Command(BaseCommand):
+    """manage.py reconcile_course_counters."""
+
+    help = 'Recount Course.enrollment_count and Course.active_contract_count from Class and Contract rows.'
+
+    def handle(self, *args, **options):
+        """Recount and report number of repaired courses."""
+        with transaction.atomic():
+            repaired = reconcile_course_counters()
+        self.stdout.write(self.style.SUCCESS('%d courses repaired.' % repaired))
@@ -0,0 +1,83 @@
+"""Worker running queued a01 jobs, see a01.jobs."""
+
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from a01.caches import cache_is_shared
+from a01.jobs import POLL_INTERVAL
+from a01.jobs import STALE_TIMEOUT
+from a01.jobs import autodiscover
+from a01.jobs import requeue_stale
+from a01.jobs import work
+
+
+def run_threads(count, stop, poll, once, stale):
+    """Run work() in count threads until all of them end."""
+    threads = [
+        threading.Thread(target=work, args=(stop, poll, once, stale), name='job-%d' % i)
+        for i in range(count)
+    ]
+    for each in threads:
+        each.start()
+    # Join with timeout, so the main thread still handles SIGTERM.
+    while any(each.is_alive() for each in threads):
+        for each in threads:
+            each.join(1)
+
+
+class Command(BaseCommand):
+    """manage.py run_jobs."""
+
+    help = 'Run queued a01 jobs in threads and/or processes until stopped with SIGTERM or Ctrl-C.'
+
+    def add_arguments(self, parser):
+        """Worker options."""
+        parser.add_argument('--threads', type=int, default=1, help='Worker threads per process.')
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes.')
+        parser.add_argument('--poll', type=float, default=POLL_INTERVAL, help='Seconds between polls of empty queue.')
+        parser.add_argument('--stale', type=int, default=STALE_TIMEOUT, help='Requeue running jobs silent for so many seconds.')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due.')
+
+    def handle(self, *args, **options):
+        """Requeue jobs of dead workers, then run jobs."""
+        if not cache_is_shared():
+            self.stderr.write('Default cache is local to this process, pages and reports changed by jobs stay stale in web processes.')
+        autodiscover()
+        requeued = requeue_stale(options['stale'])
+        if requeued:
+            self.stdout.write('%d stale jobs requeued.' % requeued)
+
+        threads = max(options['threads'], 1)
+        processes = max(options['processes'], 1)
+
+        if processes == 1:
+            stop = threading.Event()
+            self.handle_signals(stop)
+            run_threads(threads, stop, options['poll'], options['once'], options['stale'])
+            return
+
+        # Forked children must not share the parent's database connection.
+        connections.close_all()
+        stop = multiprocessing.Event()
+        self.handle_signals(stop)
+        children = [
+            multiprocessing.Process(target=run_threads, args=(threads, stop, options['poll'], options['once'], options['stale']))
+            for i in range(processes)
+        ]
+        for each in children:
+            each.start()
+        for each in children:
+            each.join()
+
+    @staticmethod
+    def handle_signals(stop):
+        """Finish running jobs and exit on SIGTERM and SIGINT."""
+        def handler(signum, frame):
+            """Ask workers to stop after current job."""
+            stop.set()
+        signal.signal(signal.SIGTERM, handler)
+        signal.signal(signal.SIGINT, handler)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Class',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Анги',
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='Contract',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Гэрээний огноо')),
+                ('minus_length', models.PositiveIntegerField(verbose_name='Хасагдсан цаг')),
+                ('total_payment', models.PositiveIntegerField(verbose_name='Нийт төлбөр')),
+                ('req_payment', models.PositiveIntegerField(verbose_name='Төлбөл зохих төлбөр')),
+                ('off_percent', models.PositiveIntegerField(default=0, verbose_name='Хямдралын хувь')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+                ('contract_number', models.CharField(blank=True, max_length=50, null=True, verbose_name='Гэрээний дугаар')),
+                ('description', models.CharField(blank=True, max_length=50, null=True, verbose_name='Тайлбар')),
+            ],
+            options={
+                'verbose_name': 'Гэрээ',
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateTimeField(verbose_name='Эхэлсэн цаг өдөр')),
+                ('info', models.CharField(blank=True, max_length=200, null=True, verbose_name='Тайлбар')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+            ],
+            options={
+                'verbose_name': 'Хичээл',
+                'permissions': (('main', 'Үндсэн ажиллагаа.'),),
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseTeachers',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lesson', models.CharField(max_length=100, verbose_name='Сэдэв')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cteachers', to='a01.Course', verbose_name='Хичээл')),
+            ],
+            options={
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseType',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.PositiveIntegerField(verbose_name='Үнэ')),
+                ('length', models.PositiveIntegerField(verbose_name='Нийт орох цаг')),
+                ('hourly_price', models.PositiveIntegerField(verbose_name='Цагын төлбөр')),
+                ('level', models.CharField(max_length=50, verbose_name='Ангийн түвшин')),
+                ('info', models.CharField(blank=True, max_length=200, null=True, verbose_name='Тайлбар')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+            ],
+            options={
+                'verbose_name': 'Хичээлийн төрөл',
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='Student',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fname', models.CharField(max_length=50, verbose_name='Нэр')),
+                ('lname', models.CharField(blank=True, max_length=50, null=True, verbose_name='Овог')),
+                ('register', models.CharField(blank=True, max_length=10, null=True, verbose_name='Регистрийн дугаар')),
+                ('phone', models.CharField(max_length=20, verbose_name='Утасны дугаар')),
+                ('birthday', models.DateField(blank=True, null=True, verbose_name='Төрсөн өдөр')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+            ],
+            options={
+                'verbose_name': 'Сурагч',
+                'permissions': (('s_composer', 'Сурагчтай холбоотой бүх юм'),),
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentLevel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('BEGINNER', 'Анхан'), ('BMID', 'Дундын өмнөх'), ('MID', 'Дунд'), ('AMID', 'Ахисан дунд'), ('ADVANCED', 'Гүнзгий')], max_length=20, verbose_name='Хэлний түвшин')),
+                ('date', models.DateField(verbose_name='Огноо')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='a01.Course', verbose_name='Хичээл')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='levels', to='a01.Student', verbose_name='Сурагч')),
+            ],
+            options={
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='Teacher',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fname', models.CharField(max_length=50, verbose_name='Нэр')),
+                ('lname', models.CharField(max_length=50, verbose_name='Овог')),
+                ('register', models.CharField(max_length=10, unique=True, verbose_name='Регистрийн дугаар')),
+                ('phone', models.CharField(max_length=20, verbose_name='Утасны дугаар')),
+                ('birthday', models.DateField(verbose_name='Төрсөн он сар өдөр')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+                ('hourly_wage', models.PositiveIntegerField(verbose_name='Цагын ажлын хөлс')),
+            ],
+            options={
+                'verbose_name': 'Багш',
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='TeacherSalary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('salary', models.PositiveIntegerField(verbose_name='Сарын цалин')),
+                ('worked_hour', models.PositiveIntegerField(default=40, verbose_name='Ажилсан цаг')),
+                ('year', models.PositiveIntegerField(verbose_name='Цалин бодсон он')),
+                ('month', models.CharField(choices=[('JANUARY', '1-р сар'), ('FEBRUARY', '2-р сар'), ('MARCH', '3-р сар'), ('APRIL', '4-р сар'), ('MAY', '5-р сар'), ('JUNE', '6-р сар'), ('JULY', '7-р сар'), ('AUGUST', '8-р сар'), ('SEPTEMBER', '9-р сар'), ('OCTOBER', '10-р сар'), ('NOVEMBER', '11-р сар'), ('DECEMBER', '12-р сар')], max_length=10, verbose_name='Цалин бодсон сар')),
+                ('mshift', models.CharField(choices=[('FIRST', '1-р ээлж'), ('SECOND', '2-р ээлж')], max_length=10, verbose_name='Ээлж')),
+                ('teacher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='a01.Teacher', verbose_name='Багш')),
+            ],
+            options={
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Дүн')),
+                ('txn_type', models.CharField(choices=[('SEXPENSE', 'Цалингын зарлага'), ('CINCOME', 'Гэрээний орлого'), ('CHANINCOME', 'Ангий солилтын орлого'), ('INCOME', 'Орлого'), ('EXPENSE', 'Зарлага')], max_length=20, verbose_name='Төрөл')),
+                ('txn_method', models.CharField(blank=True, choices=[('BY_BANK', 'Дансаар'), ('BY_CASH', 'Бэлнээр')], max_length=20, null=True, verbose_name='Гүйлгээ хийгдсэн арга')),
+                ('txn_date', models.DateTimeField(verbose_name='Огноо')),
+                ('info', models.CharField(default='', max_length=200, verbose_name='Тайлбар')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+                ('verified', models.BooleanField(default=False, verbose_name='Баталгаажсан эсэх')),
+                ('contract', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ctxns', to='a01.Contract', verbose_name='Гэрээ')),
+            ],
+            options={
+                'permissions': (('accounting', 'Төлбөр тооцоотой холбоотой.'),),
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='Worker',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fname', models.CharField(max_length=50, verbose_name='Нэр')),
+                ('lname', models.CharField(max_length=50, verbose_name='Овог')),
+                ('register', models.CharField(max_length=10, unique=True, verbose_name='Регистрийн дугаар')),
+                ('phone', models.CharField(max_length=20, verbose_name='Утасны дугаар')),
+                ('birthday', models.DateField(verbose_name='Төрсөн он сар өдөр')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+                ('monthly_wage', models.PositiveIntegerField(verbose_name='Цагын ажлын хөлс')),
+            ],
+            options={
+                'verbose_name': 'Ажилтан',
+                'default_permissions': (),
+            },
+        ),
+        migrations.AddField(
+            model_name='teachersalary',
+            name='worker',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='a01.Worker', verbose_name='Багш'),
+        ),
+        migrations.AddField(
+            model_name='courseteachers',
+            name='teacher',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tcourses', to='a01.Teacher', verbose_name='Багш'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='ctype',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='a01.CourseType', verbose_name='Түвшин'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='a01.Course', verbose_name='Хичээл'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='a01.Student', verbose_name='Сурагч'),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cclasses', to='a01.Course', verbose_name='Хичээл'),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sclasses', to='a01.Student', verbose_name='Сурагч'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+TRIGRAM_INDEXES = (
+    # Similarity (%) search of names.
+    ('a01_student_fname_trgm', 'a01_student', '"fname" gin_trgm_ops'),
+    ('a01_teacher_fname_trgm', 'a01_teacher', '"fname" gin_trgm_ops'),
+    # icontains is compiled to UPPER(column::text) LIKE UPPER(%s).
+    ('a01_student_fname_upper_trgm', 'a01_student', 'UPPER("fname"::text) gin_trgm_ops'),
+    ('a01_student_register_upper_trgm', 'a01_student', 'UPPER("register"::text) gin_trgm_ops'),
+    ('a01_student_phone_upper_trgm', 'a01_student', 'UPPER("phone"::text) gin_trgm_ops'),
+    ('a01_teacher_fname_upper_trgm', 'a01_teacher', 'UPPER("fname"::text) gin_trgm_ops'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('a01', '0001_initial'),
+    ]
+
+    operations = [TrigramExtension()] + [
+        migrations.RunSQL(
+            'CREATE INDEX %s ON %s USING gin (%s);' % (name, table, expression),
+            'DROP INDEX %s;' % name,
+        )
+        for name, table, expression in TRIGRAM_INDEXES
+    ]
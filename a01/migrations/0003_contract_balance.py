@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('a01', '0002_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='balance',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Үлдэгдэл төлбөр'),
+        ),
+        migrations.RunSQL(
+            'UPDATE a01_contract SET balance = req_payment - total_payment;',
+            migrations.RunSQL.noop,
+        ),
+        # Debtors report walks this partial index in (balance DESC, date, id) order.
+        migrations.RunSQL(
+            'CREATE INDEX a01_contract_debtor_idx ON a01_contract (balance DESC, date, id) '
+            'WHERE flag AND balance > 0;',
+            'DROP INDEX a01_contract_debtor_idx;',
+        ),
+    ]
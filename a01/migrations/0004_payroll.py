@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:55
+from __future__ import unicode_literals
+
+import sys
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models import Min
+import django.db.models.deletion
+
+
+def remove_duplicate_salaries(apps, schema_editor):
+    """
+    Keep the first salary of each teacher and worker per payroll period.
+
+    Later ones are double payments made before the unique constraint. Their
+    expense transactions are kept; removed salaries are listed so the extra
+    payments can be settled by hand.
+    """
+    TeacherSalary = apps.get_model('a01', 'TeacherSalary')
+    salaries = TeacherSalary.objects.using(schema_editor.connection.alias)
+    removed = []
+    for person in ('teacher', 'worker'):
+        periods = (
+            salaries.exclude(**{person: None}).order_by()
+            .values(person, 'year', 'month', 'mshift')
+            .annotate(first=Min('id'), count=Count('id'))
+            .filter(count__gt=1)
+        )
+        for period in periods:
+            first = period.pop('first')
+            period.pop('count')
+            duplicates = salaries.filter(**period).exclude(pk=first)
+            removed.extend(
+                '%s %s: %s-%s %s, salary %s (kept id %s)' % (person, period[person], period['year'], period['month'], period['mshift'], each.salary, first)
+                for each in duplicates
+            )
+            duplicates.delete()
+    if removed:
+        sys.stdout.write('\nRemoved %d duplicate salaries, their payments stay as transactions:\n  %s\n' % (
+            len(removed), '\n  '.join(removed)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('a01', '0003_contract_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teachersalary',
+            name='txn',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='salary', to='a01.Transaction', verbose_name='Гүйлгээ'),
+        ),
+        migrations.RunPython(remove_duplicate_salaries, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='teachersalary',
+            unique_together=set([('teacher', 'year', 'month', 'mshift'), ('worker', 'year', 'month', 'mshift')]),
+        ),
+    ]
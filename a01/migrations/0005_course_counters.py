@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('a01', '0004_payroll'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_contract_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Идэвхитэй гэрээний тоо'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Сурагчдын тоо'),
+        ),
+        migrations.RunSQL(
+            'UPDATE a01_course SET '
+            'enrollment_count = (SELECT COUNT(*) FROM a01_class WHERE a01_class.course_id = a01_course.id), '
+            'active_contract_count = (SELECT COUNT(*) FROM a01_contract '
+            'WHERE a01_contract.course_id = a01_course.id AND a01_contract.flag);',
+            migrations.RunSQL.noop,
+        ),
+    ]
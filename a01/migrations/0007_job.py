@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:12
+from __future__ import unicode_literals
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('a01', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Ажил')),
+                ('params', django.contrib.postgres.fields.jsonb.JSONField(default=dict, verbose_name='Параметр')),
+                ('status', models.CharField(choices=[('QUEUED', 'Хүлээгдэж буй'), ('RUNNING', 'Ажиллаж буй'), ('DONE', 'Дууссан'), ('FAILED', 'Амжилтгүй')], default='QUEUED', max_length=10, verbose_name='Төлөв')),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(blank=True, null=True, verbose_name='Үр дүн')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Алдаа')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Оролдлого')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Оролдлогын дээд тоо')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Гүйцэтгэл')),
+                ('progress_message', models.CharField(blank=True, default='', max_length=200, verbose_name='Гүйцэтгэлийн тайлбар')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Эхлэх хугацаа')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Үүссэн огноо')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Эхэлсэн огноо')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дууссан огноо')),
+                ('worker', models.CharField(blank=True, default='', max_length=100, verbose_name='Гүйцэтгэгч')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Өөрчлөгдсөн огноо')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Үүсгэсэн')),
+            ],
+            options={
+                'verbose_name': 'Ажил',
+                'default_permissions': (),
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='job',
+            index_together=set([('status', 'run_at')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('a01', '0007_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='request_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Хүсэлтийн түлхүүр'),
+        ),
+    ]
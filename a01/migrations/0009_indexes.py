@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:23
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+PARTIAL_INDEXES = (
+    # Active courses, e.g. cached course choices (a01.caches).
+    ('a01_course_active_idx', 'a01_course', '(id)'),
+    # Active contracts of a course, counters and course pages.
+    ('a01_contract_active_course_idx', 'a01_contract', '(course_id)'),
+    # P&L and summaries of a date range, covering so an index only scan suffices.
+    ('a01_txn_active_date_idx', 'a01_transaction', '(txn_date, txn_type, txn_method, verified, amount)'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('a01', '0008_contract_request_key'),
+    ]
+
+    operations = [
+        # Keep the oldest of duplicate classes and recount enrollments.
+        migrations.RunSQL(
+            'DELETE FROM a01_class a USING a01_class b '
+            'WHERE a.course_id = b.course_id AND a.student_id = b.student_id AND a.id > b.id;',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'UPDATE a01_course SET '
+            'enrollment_count = (SELECT COUNT(*) FROM a01_class WHERE a01_class.course_id = a01_course.id);',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterUniqueTogether(
+            name='class',
+            unique_together=set([('course', 'student')]),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['-date', '-id'], name='a01_contract_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-start_date', '-id'], name='a01_course_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentlevel',
+            index=models.Index(fields=['-date', '-id'], name='a01_studentlevel_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teachersalary',
+            index=models.Index(fields=['year', 'month', 'mshift'], name='a01_salary_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['-txn_date', '-id'], name='a01_txn_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['txn_type', '-txn_date'], name='a01_txn_type_date_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            'CREATE INDEX %s ON %s %s WHERE flag;' % (name, table, columns),
+            'DROP INDEX %s;' % name,
+        )
+        for name, table, columns in PARTIAL_INDEXES
+    ]
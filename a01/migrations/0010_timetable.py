@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:30
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Half open [start, end) range of a session on a fixed day, so back to back
+# sessions do not overlap. date + time is immutable, as index expressions
+# must be.
+SESSION_RANGE = "tsrange(DATE '2000-01-01' + start_time, DATE '2000-01-01' + end_time)"
+
+# Active sessions of one room or one teacher on one weekday never overlap.
+# btree_gist lets the GiST index compare the ids and weekday with =.
+EXCLUSION_CONSTRAINTS = (
+    ('a01_session_room_excl', 'room_id'),
+    ('a01_session_teacher_excl', 'teacher_id'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('a01', '0009_indexes'),
+    ]
+
+    operations = [
+        CreateExtension('btree_gist'),
+        migrations.CreateModel(
+            name='CourseSession',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(1, 'Даваа'), (2, 'Мягмар'), (3, 'Лхагва'), (4, 'Пүрэв'), (5, 'Баасан'), (6, 'Бямба'), (7, 'Ням')], verbose_name='Гараг')),
+                ('mshift', models.CharField(choices=[('FIRST', '1-р ээлж'), ('SECOND', '2-р ээлж')], max_length=10, verbose_name='Ээлж')),
+                ('start_time', models.TimeField(verbose_name='Эхлэх цаг')),
+                ('end_time', models.TimeField(verbose_name='Дуусах цаг')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Өөрчлөгдсөн огноо')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='a01.Course', verbose_name='Хичээл')),
+            ],
+            options={
+                'verbose_name': 'Хичээлийн цаг',
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Нэр')),
+                ('capacity', models.PositiveIntegerField(verbose_name='Суудлын тоо')),
+                ('info', models.CharField(blank=True, max_length=200, null=True, verbose_name='Тайлбар')),
+                ('flag', models.BooleanField(default=True, verbose_name='Идэвхитэй эсэх')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Өөрчлөгдсөн огноо')),
+            ],
+            options={
+                'verbose_name': 'Анги танхим',
+                'default_permissions': (),
+            },
+        ),
+        migrations.AddField(
+            model_name='coursesession',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rsessions', to='a01.Room', verbose_name='Анги танхим'),
+        ),
+        migrations.AddField(
+            model_name='coursesession',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tsessions', to='a01.Teacher', verbose_name='Багш'),
+        ),
+        migrations.AddIndex(
+            model_name='coursesession',
+            index=models.Index(fields=['weekday', 'start_time'], name='a01_session_time_idx'),
+        ),
+        migrations.RunSQL(
+            'ALTER TABLE a01_coursesession ADD CONSTRAINT a01_session_time_check CHECK (start_time < end_time);',
+            'ALTER TABLE a01_coursesession DROP CONSTRAINT a01_session_time_check;',
+        ),
+    ] + [
+        migrations.RunSQL(
+            'ALTER TABLE a01_coursesession ADD CONSTRAINT %s '
+            'EXCLUDE USING gist (%s WITH =, weekday WITH =, %s WITH &&) WHERE (flag);' % (name, column, SESSION_RANGE),
+            'ALTER TABLE a01_coursesession DROP CONSTRAINT %s;' % name,
+        )
+        for name, column in EXCLUSION_CONSTRAINTS
+    ]
@@ -1,11 +1,19 @@
 """Models of student registration."""
 
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
 from django.db import models
-from a01.choices import TXN_TYPES
-from a01.choices import MONTHS
-from a01.choices import LEVEL_CHOICES
-from a01.choices import TXN_METHODS
-from a01.choices import SHIFTS
+from django.utils import timezone
+from a01.choices import JOB_QUEUED
+from a01.choices import EXPENSE
+from a01.choices import INCOME
+from a01.choices import JobStatus
+from a01.choices import Level
+from a01.choices import Month
+from a01.choices import Shift
+from a01.choices import TxnMethod
+from a01.choices import TxnType
+from a01.choices import Weekday
 
 
 class Student(models.Model):
@@ -16,6 +24,7 @@ class Student(models.Model):
     register = models.CharField(verbose_name='Регистрийн дугаар', max_length=10, null=True, blank=True)
     phone = models.CharField(verbose_name='Утасны дугаар', max_length=20)
     birthday = models.DateField(verbose_name='Төрсөн өдөр', null=True, blank=True)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
 
 
@@ -46,6 +55,7 @@ class Worker(models.Model):
     birthday = models.DateField(verbose_name='Төрсөн он сар өдөр')
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
     monthly_wage = models.PositiveIntegerField(verbose_name='Цагын ажлын хөлс')
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
 
 
     def __str__(self):
@@ -72,6 +82,7 @@ class Teacher(models.Model):
     birthday = models.DateField(verbose_name='Төрсөн он сар өдөр')
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
     hourly_wage = models.PositiveIntegerField(verbose_name='Цагын ажлын хөлс')
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
 
 
     def __str__(self):
@@ -96,30 +107,33 @@ class TeacherSalary(models.Model):
     salary = models.PositiveIntegerField(verbose_name='Сарын цалин')
     worked_hour = models.PositiveIntegerField(verbose_name='Ажилсан цаг', default=40)
     year = models.PositiveIntegerField(verbose_name='Цалин бодсон он')
-    month = models.CharField(verbose_name='Цалин бодсон сар', max_length=10, choices=MONTHS)
-    mshift = models.CharField(verbose_name='Ээлж', max_length=10, choices=SHIFTS)
+    month = models.CharField(verbose_name='Цалин бодсон сар', max_length=10, choices=Month.choices)
+    mshift = models.CharField(verbose_name='Ээлж', max_length=10, choices=Shift.choices)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
+    txn = models.OneToOneField('Transaction', verbose_name='Гүйлгээ', related_name='salary', blank=True, null=True, on_delete=models.SET_NULL)
 
 
     class Meta:
         """Meta."""
 
         default_permissions = ()
+        unique_together = (
+            ('teacher', 'year', 'month', 'mshift'),
+            ('worker', 'year', 'month', 'mshift'),
+        )
+        indexes = [
+            models.Index(fields=['year', 'month', 'mshift'], name='a01_salary_period_idx'),
+        ]
 
     @property
     def get_month(self):
-        """Overriding txn_type."""
-        for each in MONTHS:
-            if each[0] == self.month:
-                return each[1]
-        return ''
+        """Label of month."""
+        return Month.label(self.month)
 
     @property
     def get_shift(self):
-        """Overriding txn_type."""
-        for each in SHIFTS:
-            if each[0] == self.mshift:
-                return each[1]
-        return ''
+        """Label of mshift."""
+        return Shift.label(self.mshift)
 
 
 class CourseType(models.Model):
@@ -130,6 +144,7 @@ class CourseType(models.Model):
     hourly_price = models.PositiveIntegerField(verbose_name='Цагын төлбөр')
     level = models.CharField(verbose_name='Ангийн түвшин', max_length=50)
     info = models.CharField(verbose_name='Тайлбар', max_length=200, blank=True, null=True)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
 
 
@@ -151,7 +166,11 @@ class Course(models.Model):
     start_date = models.DateTimeField(verbose_name='Эхэлсэн цаг өдөр')
     info = models.CharField(verbose_name='Тайлбар', max_length=200, blank=True, null=True)
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
+    enrollment_count = models.IntegerField(verbose_name='Сурагчдын тоо', default=0, editable=False)
+    active_contract_count = models.IntegerField(verbose_name='Идэвхитэй гэрээний тоо', default=0, editable=False)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
 
+    COUNTER_FIELDS = ('enrollment_count', 'active_contract_count')
 
     def __str__(self):
         """String representation of model."""
@@ -160,6 +179,18 @@ class Course(models.Model):
         except:
             return self.ctype.level
 
+    def save(self, *args, **kwargs):
+        """
+        Never write counters back from a loaded instance, they are changed
+        only with F() updates (a01.services.change_course_counters).
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super(Course, self).save(*args, **kwargs)
+
     @property
     def price(self):
         """Return price of ctype."""
@@ -178,6 +209,10 @@ class Course(models.Model):
             ('main', 'Үндсэн ажиллагаа.'),
         )
         verbose_name = "Хичээл"
+        # Partial index of active courses is in migration 0009.
+        indexes = [
+            models.Index(fields=['-start_date', '-id'], name='a01_course_start_idx'),
+        ]
 
 
 class CourseTeachers(models.Model):
@@ -186,12 +221,77 @@ class CourseTeachers(models.Model):
     teacher = models.ForeignKey(Teacher, verbose_name='Багш', related_name="tcourses", on_delete=models.CASCADE)
     course = models.ForeignKey(Course, verbose_name='Хичээл', related_name="cteachers", on_delete=models.CASCADE)
     lesson = models.CharField(verbose_name='Сэдэв', max_length=100)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
+
+
+    class Meta:
+        """meta."""
+
+        default_permissions = ()
+
 
+class Room(models.Model):
+    """Classroom courses are taught in."""
+
+    name = models.CharField(verbose_name='Нэр', max_length=50, unique=True)
+    capacity = models.PositiveIntegerField(verbose_name='Суудлын тоо')
+    info = models.CharField(verbose_name='Тайлбар', max_length=200, blank=True, null=True)
+    flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
+
+    def __str__(self):
+        """String representation of model."""
+        return self.name
 
     class Meta:
         """meta."""
 
         default_permissions = ()
+        verbose_name = "Анги танхим"
+
+
+class CourseSession(models.Model):
+    """
+    Weekly lesson of course: weekday, time, teacher and room.
+
+    Active sessions of one room or one teacher never overlap; PostgreSQL
+    enforces it with the exclusion constraints of migration 0010, forms
+    and a01.timetable check it before saving.
+    """
+
+    course = models.ForeignKey(Course, verbose_name='Хичээл', related_name="sessions", on_delete=models.CASCADE)
+    teacher = models.ForeignKey(Teacher, verbose_name='Багш', related_name="tsessions", blank=True, null=True, on_delete=models.SET_NULL)
+    room = models.ForeignKey(Room, verbose_name='Анги танхим', related_name="rsessions", blank=True, null=True, on_delete=models.SET_NULL)
+    weekday = models.PositiveSmallIntegerField(verbose_name='Гараг', choices=Weekday.choices)
+    mshift = models.CharField(verbose_name='Ээлж', max_length=10, choices=Shift.choices)
+    start_time = models.TimeField(verbose_name='Эхлэх цаг')
+    end_time = models.TimeField(verbose_name='Дуусах цаг')
+    flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
+
+    @property
+    def get_weekday(self):
+        """Label of weekday."""
+        return Weekday.label(self.weekday)
+
+    @property
+    def get_mshift(self):
+        """Label of mshift."""
+        return Shift.label(self.mshift)
+
+    def __str__(self):
+        """String representation of model."""
+        return '%s %s-%s' % (self.get_weekday, self.start_time.strftime('%H:%M'), self.end_time.strftime('%H:%M'))
+
+    class Meta:
+        """meta."""
+
+        default_permissions = ()
+        verbose_name = "Хичээлийн цаг"
+        # Exclusion constraints of rooms and teachers are in migration 0010.
+        indexes = [
+            models.Index(fields=['weekday', 'start_time'], name='a01_session_time_idx'),
+        ]
 
 
 class Class(models.Model):
@@ -199,6 +299,7 @@ class Class(models.Model):
 
     student = models.ForeignKey(Student, verbose_name='Сурагч', related_name="sclasses", on_delete=models.CASCADE)
     course = models.ForeignKey(Course, verbose_name='Хичээл', related_name="cclasses", on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
 
 
     class Meta:
@@ -206,6 +307,9 @@ class Class(models.Model):
 
         default_permissions = ()
         verbose_name = "Анги"
+        unique_together = (
+            ('course', 'student'),
+        )
 
 
 class Contract(models.Model):
@@ -221,6 +325,11 @@ class Contract(models.Model):
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
     contract_number = models.CharField(verbose_name="Гэрээний дугаар", max_length=50, blank=True, null=True)
     description = models.CharField(verbose_name="Тайлбар", max_length=50, blank=True, null=True)
+    balance = models.IntegerField(verbose_name='Үлдэгдэл төлбөр', default=0, editable=False)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
+    request_key = models.CharField(verbose_name='Хүсэлтийн түлхүүр', max_length=64, unique=True, blank=True, null=True, editable=False)
+
+    PAYMENT_FIELDS = ('total_payment', 'balance')
 
 
     class Meta:
@@ -228,11 +337,30 @@ class Contract(models.Model):
 
         default_permissions = ()
         verbose_name = "Гэрээ"
+        # Partial indexes of active contracts are in migrations 0003 and 0009.
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='a01_contract_date_idx'),
+        ]
 
     def __str__(self):
         """String representation of model."""
         return "Гэрээний дугаар: " + str(self.contract_number) + ", " + str(self.date)
 
+    def save(self, *args, **kwargs):
+        """
+        Store balance of a new contract; never write payments back from a
+        loaded instance, they are changed only with F() updates
+        (a01.services.post_payments).
+        """
+        if self._state.adding:
+            self.balance = self.remainder_payment()
+        elif kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.PAYMENT_FIELDS
+            ]
+        super(Contract, self).save(*args, **kwargs)
+
     def remainder_payment(self):
         return self.req_payment - self.total_payment
 
@@ -241,13 +369,14 @@ class Transaction(models.Model):
     """All tnxs made by absolute."""
 
     amount = models.PositiveIntegerField(verbose_name='Дүн')
-    txn_type = models.CharField(verbose_name='Төрөл', max_length=20, choices=TXN_TYPES)
-    txn_method = models.CharField(verbose_name='Гүйлгээ хийгдсэн арга', max_length=20, choices=TXN_METHODS, null=True, blank=True)
+    txn_type = models.CharField(verbose_name='Төрөл', max_length=20, choices=TxnType.choices)
+    txn_method = models.CharField(verbose_name='Гүйлгээ хийгдсэн арга', max_length=20, choices=TxnMethod.choices, null=True, blank=True)
     txn_date = models.DateTimeField(verbose_name='Огноо')
     info = models.CharField(verbose_name='Тайлбар', max_length=200, default='')
     contract = models.ForeignKey(Contract, verbose_name='Гэрээ', related_name="ctxns", null=True, blank=True, on_delete=models.CASCADE)
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
     verified = models.BooleanField(verbose_name='Баталгаажсан эсэх', default=False)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
 
 
     class Meta:
@@ -257,22 +386,43 @@ class Transaction(models.Model):
         permissions = (
             ('accounting', 'Төлбөр тооцоотой холбоотой.'),
         )
+        # Partial index of active transactions is in migration 0009.
+        indexes = [
+            models.Index(fields=['-txn_date', '-id'], name='a01_txn_date_idx'),
+            models.Index(fields=['txn_type', '-txn_date'], name='a01_txn_type_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember loaded txn_date, so moving txn to other month is noticed."""
+        instance = super(Transaction, cls).from_db(db, field_names, values)
+        instance._loaded_txn_date = instance.__dict__.get('txn_date')
+        return instance
 
     @property
     def get_txn_method(self):
-        """Overriding txn_type."""
-        for each in TXN_METHODS:
-            if each[0] == self.txn_method:
-                return each[1]
-        return ''
+        """Label of txn_method."""
+        return TxnMethod.label(self.txn_method)
 
     @property
     def get_txn_type(self):
-        """Overriding txn_type."""
-        for each in TXN_TYPES:
-            if each[0] == self.txn_type:
-                return each[1]
-        return ''
+        """Label of txn_type."""
+        return TxnType.label(self.txn_type)
+
+    @property
+    def direction(self):
+        """INCOME, EXPENSE or None, see TxnType."""
+        return TxnType.direction(self.txn_type)
+
+    @property
+    def is_income(self):
+        """Transaction brings money in."""
+        return self.direction == INCOME
+
+    @property
+    def is_expense(self):
+        """Transaction pays money out."""
+        return self.direction == EXPENSE
 
     def __str__(self):
         """String representation of model."""
@@ -284,20 +434,66 @@ class StudentLevel(models.Model):
 
     student = models.ForeignKey(Student, verbose_name='Сурагч', related_name="levels", on_delete=models.CASCADE)
     course = models.ForeignKey(Course, verbose_name='Хичээл', blank=True, null=True, on_delete=models.CASCADE)
-    level = models.CharField(verbose_name='Хэлний түвшин', max_length=20, choices=LEVEL_CHOICES)
+    level = models.CharField(verbose_name='Хэлний түвшин', max_length=20, choices=Level.choices)
     date = models.DateField(verbose_name='Огноо')
     flag = models.BooleanField(verbose_name='Идэвхитэй эсэх', default=True)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
 
 
     @property
     def get_level(self):
-        """Overriding txn_type."""
-        for each in LEVEL_CHOICES:
-            if each[0] == self.level:
-                return each[1]
-        return ''
+        """Label of level."""
+        return Level.label(self.level)
 
     class Meta:
         """Meta."""
 
         default_permissions = ()
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='a01_studentlevel_date_idx'),
+        ]
+
+
+class Job(models.Model):
+    """Long running operation queued for manage.py run_jobs (a01.jobs)."""
+
+    name = models.CharField(verbose_name='Ажил', max_length=50)
+    params = JSONField(verbose_name='Параметр', default=dict)
+    status = models.CharField(verbose_name='Төлөв', max_length=10, choices=JobStatus.choices, default=JOB_QUEUED)
+    result = JSONField(verbose_name='Үр дүн', blank=True, null=True)
+    error = models.TextField(verbose_name='Алдаа', blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(verbose_name='Оролдлого', default=0)
+    max_attempts = models.PositiveSmallIntegerField(verbose_name='Оролдлогын дээд тоо', default=3)
+    progress = models.PositiveSmallIntegerField(verbose_name='Гүйцэтгэл', default=0)
+    progress_message = models.CharField(verbose_name='Гүйцэтгэлийн тайлбар', max_length=200, blank=True, default='')
+    run_at = models.DateTimeField(verbose_name='Эхлэх хугацаа', default=timezone.now)
+    created_at = models.DateTimeField(verbose_name='Үүссэн огноо', auto_now_add=True)
+    started_at = models.DateTimeField(verbose_name='Эхэлсэн огноо', blank=True, null=True)
+    finished_at = models.DateTimeField(verbose_name='Дууссан огноо', blank=True, null=True)
+    worker = models.CharField(verbose_name='Гүйцэтгэгч', max_length=100, blank=True, default='')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name='Үүсгэсэн', blank=True, null=True, on_delete=models.SET_NULL)
+    updated_at = models.DateTimeField(verbose_name='Өөрчлөгдсөн огноо', auto_now=True, db_index=True)
+
+
+    class Meta:
+        """Meta."""
+
+        default_permissions = ()
+        index_together = (
+            ('status', 'run_at'),
+        )
+        verbose_name = "Ажил"
+
+    def __str__(self):
+        """String representation of model."""
+        return '%s #%s' % (self.name, self.pk)
+
+    @property
+    def get_status(self):
+        """Label of status."""
+        return JobStatus.label(self.status, self.status)
+
+    @property
+    def finished(self):
+        """Job will not run again."""
+        return self.finished_at is not None
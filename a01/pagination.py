@@ -0,0 +1,179 @@
+"""Keyset (cursor) pagination for list views of app a01."""
+
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage(object):
+    """One page of rows fetched by KeysetPaginator."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        """Store rows and cursors of the neighbouring pages."""
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_query = ''
+        self.previous_query = ''
+
+    def __iter__(self):
+        """Iterate over rows."""
+        return iter(self.object_list)
+
+    def __len__(self):
+        """Number of rows."""
+        return len(self.object_list)
+
+    def has_next(self):
+        """Is there a page after this one."""
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        """Is there a page before this one."""
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        """Is pager needed."""
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator(object):
+    """
+    Paginate a queryset by seeking past the last row of the previous page.
+
+    Rows are ordered by ``ordering`` (e.g. ``('-txn_date', '-id')``) and a
+    page is fetched with ``WHERE (txn_date, id) < (last_date, last_id)
+    LIMIT per_page + 1``, so neither OFFSET nor COUNT(*) is needed.
+    """
+
+    def __init__(self, queryset, ordering, per_page=50):
+        """Keep queryset and ordering keys."""
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+
+    @property
+    def keys(self):
+        """Field names without direction prefix."""
+        return [each.lstrip('-') for each in self.ordering]
+
+    def encode_cursor(self, direction, obj):
+        """Encode direction and key values of obj into url-safe string."""
+        values = [self._dump(getattr(obj, key)) for key in self.keys]
+        raw = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return (direction, values) or (None, None) for broken cursor."""
+        if not cursor:
+            return None, None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(data, list) or not data:
+                return None, None
+            direction, values = data[0], data[1:]
+            if direction not in ('n', 'p') or len(values) != len(self.keys):
+                return None, None
+            return direction, [self._load(key, value) for key, value in zip(self.keys, values)]
+        except (ValueError, TypeError, IndexError, ValidationError):
+            return None, None
+
+    def page(self, cursor=None):
+        """Return KeysetPage after (``n``) or before (``p``) the cursor."""
+        direction, values = self.decode_cursor(cursor)
+
+        if direction == 'p':
+            queryset = self.queryset.filter(self._seek(values, forward=False))
+            queryset = queryset.order_by(*self._reversed_ordering())
+        elif direction == 'n':
+            queryset = self.queryset.filter(self._seek(values, forward=True))
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'p':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == 'n'
+
+        next_cursor = None
+        previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor('n', rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor('p', rows[0])
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _seek(self, values, forward):
+        """Build lexicographic (a, b, ...) < / > (x, y, ...) condition."""
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            key = order.lstrip('-')
+            descending = order.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            step = dict(equal)
+            step['%s__%s' % (key, lookup)] = value
+            condition |= Q(**step)
+            equal[key] = value
+        return condition
+
+    def _reversed_ordering(self):
+        """Ordering used to walk backwards."""
+        return [each[1:] if each.startswith('-') else '-' + each for each in self.ordering]
+
+    @staticmethod
+    def _dump(value):
+        """Json friendly key value."""
+        if value is None or isinstance(value, (int, float)):
+            return value
+        return str(value)
+
+    def _load(self, key, value):
+        """Convert cursor value back using model field."""
+        if key == 'pk':
+            field = self.queryset.model._meta.pk
+        else:
+            try:
+                field = self.queryset.model._meta.get_field(key)
+            except FieldDoesNotExist:
+                return float(value)
+        return field.to_python(value)
+
+
+class KeysetPaginationMixin(object):
+    """Paginate filtered list of TemplateView with KeysetPaginator."""
+
+    keyset_ordering = ('-id',)
+    paginate_by = 50
+    cursor_param = 'cursor'
+
+    def get_keyset_ordering(self, queryset):
+        """Ordering used for keyset, ranked searches keep their rank."""
+        if 'similarity' in queryset.query.annotations:
+            return ('-similarity', '-id')
+        return self.keyset_ordering
+
+    def paginate_keyset(self, queryset):
+        """Return page of queryset, pager links keep other GET params."""
+        paginator = KeysetPaginator(queryset, self.get_keyset_ordering(queryset), self.paginate_by)
+        page = paginator.page(self.request.GET.get(self.cursor_param))
+
+        params = self.request.GET.copy()
+        params.pop(self.cursor_param, None)
+        if page.has_next():
+            params[self.cursor_param] = page.next_cursor
+            page.next_query = params.urlencode()
+        if page.has_previous():
+            params[self.cursor_param] = page.previous_cursor
+            page.previous_query = params.urlencode()
+        return page
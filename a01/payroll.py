@@ -0,0 +1,90 @@
+"""Payroll run of teachers and workers for one (year, month, mshift) period."""
+
+import datetime
+import zlib
+
+from django.db import connection
+from django.db import transaction
+
+from a01.caches import bump_model_versions
+from a01.caches import invalidate_profit_loss
+from a01.choices import Month
+from a01.choices import SALARY_EXPENSE
+from a01.choices import Shift
+from a01.models import Teacher
+from a01.models import TeacherSalary
+from a01.models import Transaction
+from a01.models import Worker
+
+
+def lock_period(year, month, mshift):
+    """Serialize payroll runs of one period until end of transaction."""
+    if connection.vendor != 'postgresql':
+        return
+    key = zlib.crc32(('payroll:%s:%s:%s' % (year, month, mshift)).encode())
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+def run_payroll(year, month, mshift, teacher_hours=None, worker_wages=None, txn_date=None):
+    """
+    Pay teachers and workers who are not paid yet for the period.
+
+    teacher_hours -- {teacher pk: worked hours}, salary is hourly_wage * hours.
+    worker_wages  -- {worker pk: salary}.
+
+    Runs a fixed number of queries however many staff there are: advisory
+    lock, one SELECT per staff table (already paid ones excluded by
+    subquery), one bulk INSERT of expense transactions and one of salaries
+    linked to them. Returns created TeacherSalary objects.
+    """
+    teacher_hours = dict((pk, hours) for pk, hours in (teacher_hours or {}).items() if hours)
+    worker_wages = dict((pk, wage) for pk, wage in (worker_wages or {}).items() if wage)
+    txn_date = txn_date or datetime.datetime.now()
+    period = '%s %s %s' % (year, Month.label(month, month), Shift.label(mshift, mshift))
+
+    with transaction.atomic():
+        lock_period(year, month, mshift)
+
+        paid = TeacherSalary.objects.filter(year=year, month=month, mshift=mshift)
+
+        salaries = []
+
+        if teacher_hours:
+            teachers = Teacher.objects.filter(flag=True, pk__in=teacher_hours).exclude(
+                pk__in=paid.exclude(teacher=None).values('teacher'))
+            for teacher in teachers:
+                hour = teacher_hours[teacher.pk]
+                salaries.append(TeacherSalary(
+                    teacher=teacher, year=year, month=month, mshift=mshift,
+                    worked_hour=hour, salary=teacher.hourly_wage * hour))
+
+        if worker_wages:
+            workers = Worker.objects.filter(flag=True, pk__in=worker_wages).exclude(
+                pk__in=paid.exclude(worker=None).values('worker'))
+            for worker in workers:
+                salaries.append(TeacherSalary(
+                    worker=worker, year=year, month=month, mshift=mshift,
+                    salary=worker_wages[worker.pk]))
+
+        if not salaries:
+            return []
+
+        txns = [
+            Transaction(
+                amount=each.salary,
+                txn_type=SALARY_EXPENSE,
+                txn_date=txn_date,
+                info='Цалин %s, %s' % (period, each.teacher or each.worker),
+            )
+            for each in salaries
+        ]
+        Transaction.objects.bulk_create(txns)
+
+        for each, txn in zip(salaries, txns):
+            each.txn = txn
+        TeacherSalary.objects.bulk_create(salaries)
+        invalidate_profit_loss([txn_date])
+        bump_model_versions(Transaction, TeacherSalary)
+
+    return salaries
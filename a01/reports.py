@@ -0,0 +1,153 @@
+"""Aggregated financial figures for app a01."""
+
+import datetime
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Case
+from django.db.models import IntegerField
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import TruncMonth
+
+from a01.caches import PROFIT_LOSS_TIMEOUT
+from a01.caches import profit_loss_key
+
+from a01.choices import TxnType
+from a01.models import Transaction
+
+
+def _sum_if(**condition):
+    """SUM(CASE WHEN condition THEN amount ELSE 0 END)."""
+    return Sum(Case(
+        When(then='amount', **condition),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def transaction_summary(queryset):
+    """
+    Income and expense totals of queryset in one grouped query.
+
+    Returns dict with ``income``, ``expense`` totals, their verified and
+    unverified parts and ``rows`` broken down by txn_type and txn_method.
+    """
+    grouped = queryset.order_by().values('txn_type', 'txn_method').annotate(
+        direction=TxnType.direction_case(),
+        verified_amount=_sum_if(verified=True),
+        unverified_amount=_sum_if(verified=False),
+    ).order_by('txn_type', 'txn_method')
+
+    return _summarize(grouped)
+
+
+def _summarize(grouped):
+    """
+    Totals and rows out of (txn_type, txn_method) grouped sums.
+
+    Rows carry ``direction`` computed in SQL by TxnType.direction_case().
+    """
+    summary = {
+        'income': 0,
+        'income_verified': 0,
+        'income_unverified': 0,
+        'expense': 0,
+        'expense_verified': 0,
+        'expense_unverified': 0,
+        'rows': [],
+    }
+
+    for each in grouped:
+        verified = each['verified_amount'] or 0
+        unverified = each['unverified_amount'] or 0
+
+        direction = each['direction']
+        if direction:
+            summary[direction] += verified + unverified
+            summary[direction + '_verified'] += verified
+            summary[direction + '_unverified'] += unverified
+
+        summary['rows'].append({
+            'txn_type': each['txn_type'],
+            'txn_method': each['txn_method'],
+            'direction': direction,
+            'verified': verified,
+            'unverified': unverified,
+            'total': verified + unverified,
+        })
+
+    return summary
+
+
+def month_starts(count, today=None):
+    """First days of last count months, oldest first, current month last."""
+    today = today or datetime.date.today()
+    year, month = today.year, today.month
+    months = []
+    for i in range(count):
+        months.append(datetime.date(year, month, 1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    months.reverse()
+    return months
+
+
+def _next_month(month):
+    """First day of month after month."""
+    if month.month == 12:
+        return datetime.date(month.year + 1, 1, 1)
+    return datetime.date(month.year, month.month + 1, 1)
+
+
+def profit_loss(months=12, today=None):
+    """
+    Monthly profit and loss of active transactions for last months.
+
+    Closed months are cached one key per month (see a01.caches) and only
+    dropped when a transaction dated in that month changes, so a report
+    normally costs one TruncMonth grouped query over the current month.
+    Returns list of transaction_summary like dicts with ``month`` and
+    ``profit``, oldest first.
+    """
+    starts = month_starts(months, today)
+    current = starts[-1]
+
+    cached = cache.get_many([profit_loss_key(each) for each in starts[:-1]])
+    report = {}
+    for each in starts[:-1]:
+        if profit_loss_key(each) in cached:
+            report[each] = cached[profit_loss_key(each)]
+
+    missing = [each for each in starts if each not in report]
+    grouped = {each: [] for each in missing}
+    transactions = Transaction.objects.all()
+    if missing[0] != current:
+        # Closed months go to cache, read them from primary, not replica.
+        transactions = transactions.using(DEFAULT_DB_ALIAS)
+    rows = transactions.filter(
+        flag=True,
+        txn_date__gte=missing[0],
+        txn_date__lt=_next_month(missing[-1]),
+    ).annotate(month=TruncMonth('txn_date')).order_by().values('month', 'txn_type', 'txn_method').annotate(
+        direction=TxnType.direction_case(),
+        verified_amount=_sum_if(verified=True),
+        unverified_amount=_sum_if(verified=False),
+    ).order_by('month', 'txn_type', 'txn_method')
+    for row in rows:
+        month = datetime.date(row['month'].year, row['month'].month, 1)
+        if month in grouped:
+            grouped[month].append(row)
+
+    fresh = {}
+    for month, month_rows in grouped.items():
+        summary = _summarize(month_rows)
+        summary['month'] = month
+        summary['profit'] = summary['income'] - summary['expense']
+        report[month] = summary
+        if month != current:
+            fresh[profit_loss_key(month)] = summary
+    if fresh:
+        cache.set_many(fresh, PROFIT_LOSS_TIMEOUT)
+
+    return [report[each] for each in starts]
@@ -0,0 +1,406 @@
+"""Business operations shared by views, imports and commands of app a01."""
+
+import operator
+from collections import Counter
+from collections import namedtuple
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db import connection
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import IntegerField
+from django.db.models import OuterRef
+from django.db.models import Prefetch
+from django.db.models import Q
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from a01.caches import bump_model_versions
+from a01.caches import invalidate_course_choices
+from a01.caches import invalidate_profit_loss
+from a01.choices import CONTRACT_INCOME
+from a01.models import Class
+from a01.models import Contract
+from a01.models import Course
+from a01.models import Student
+from a01.models import StudentLevel
+from a01.models import Transaction
+from a01.timetable import release_sessions
+
+
+def contract_req_payment(course, minus_length=0, off_percent=0):
+    """Payment required by contract for course after discount and missed hours."""
+    off_percent = off_percent or 0
+    minus_length = minus_length or 0
+
+    total_price = course.price
+    hourly_price = course.hourly_price
+
+    real_length = course.ctype.length - minus_length
+
+    if 100 >= off_percent > 0:
+        off_price = total_price * off_percent / 100
+        total_price = total_price - off_price
+
+        hourly_price = round(total_price / course.ctype.length)
+
+    if minus_length == 0:
+        return total_price
+    return hourly_price * real_length
+
+
+ALREADY_IN_CLASS = 'Энэ сурагч энэ ангид гэрээ хийгдсэн байна.'
+
+
+Payment = namedtuple('Payment', 'contract_id amount txn_date txn_method info')
+
+
+def post_payments(payments):
+    """
+    Add payments (list of Payment) to their contracts in one transaction.
+
+    Amounts are summed per contract and added in the database with
+    total_payment = total_payment + x, so concurrent cashiers never lose
+    each other's payments and no other column is rewritten. On PostgreSQL
+    all contracts take one UPDATE ... FROM (VALUES ...) RETURNING, plus one
+    INSERT of all transactions. Returns {contract pk: (total_payment,
+    balance)} after the payments; unknown contract rolls back everything
+    with Contract.DoesNotExist.
+    """
+    amounts = {}
+    for each in payments:
+        amounts[each.contract_id] = amounts.get(each.contract_id, 0) + each.amount
+    if not amounts:
+        return {}
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            totals = _add_payments_returning(amounts)
+        else:
+            totals = _add_payments(amounts)
+        missing = set(amounts) - set(totals)
+        if missing:
+            raise Contract.DoesNotExist('No contract %s.' % ', '.join(str(pk) for pk in sorted(missing)))
+
+        Transaction.objects.bulk_create([
+            Transaction(
+                contract_id=each.contract_id,
+                txn_type=CONTRACT_INCOME,
+                amount=each.amount,
+                txn_date=each.txn_date,
+                txn_method=each.txn_method,
+                info=each.info or '',
+            )
+            for each in payments
+        ])
+
+        invalidate_profit_loss([each.txn_date for each in payments])
+        bump_model_versions(Contract, Transaction)
+
+    return totals
+
+
+def _add_payments_returning(amounts):
+    """One UPDATE ... RETURNING of all contracts, in pk order."""
+    pks = sorted(amounts)
+    values = ', '.join(['(%s, %s)'] * len(pks))
+    params = [timezone.now()]
+    for pk in pks:
+        params.extend([pk, amounts[pk]])
+    table = Contract._meta.db_table
+    sql = (
+        'UPDATE {table} AS c SET '
+        'total_payment = c.total_payment + v.amount, '
+        'balance = c.req_payment - (c.total_payment + v.amount), '
+        'updated_at = %s '
+        'FROM (VALUES {values}) AS v (id, amount) '
+        'WHERE c.id = v.id '
+        'RETURNING c.id, c.total_payment, c.balance'
+    ).format(table=connection.ops.quote_name(table), values=values)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dict((pk, (total, balance)) for pk, total, balance in cursor.fetchall())
+
+
+def _add_payments(amounts):
+    """F() UPDATE and re-read per contract, for backends without RETURNING."""
+    totals = {}
+    now = timezone.now()
+    for pk in sorted(amounts):
+        updated = Contract.objects.filter(pk=pk).update(
+            total_payment=F('total_payment') + amounts[pk],
+            balance=F('req_payment') - (F('total_payment') + amounts[pk]),
+            updated_at=now,
+        )
+        if updated:
+            totals[pk] = Contract.objects.filter(pk=pk).values_list('total_payment', 'balance').get()
+    return totals
+
+
+def create_contract(data, student=None):
+    """
+    Create contract with its first payment and class in one transaction.
+
+    data is cleaned_data of ContractForm or ContractfromStudentForm; student
+    is created from it unless given. Returns (contract, created).
+
+    data['request_key'], when given, makes the call idempotent: the key is
+    stored on the contract under a unique index, a retried request with the
+    same key rolls back on that index and gets the first contract back.
+    No extra SELECT is spent on the usual, first request. A student put into
+    the course by a concurrent request raises ValidationError(ALREADY_IN_CLASS).
+    """
+    key = data.get('request_key') or None
+    try:
+        with transaction.atomic():
+            return _create_contract(data, student, key), True
+    except IntegrityError:
+        existing = Contract.objects.filter(request_key=key).first() if key else None
+        if existing is not None:
+            return existing, False
+        if student is not None and Class.objects.filter(student=student, course=data['course']).exists():
+            raise ValidationError(ALREADY_IN_CLASS, code='unique')
+        raise
+
+
+def _create_contract(data, student, key):
+    """Insert student, contract, payment and class, count them on course."""
+    course = data['course']
+
+    if student is None:
+        student = Student.objects.create(
+            fname=data['fname'],
+            lname=data['lname'],
+            register=data['register'],
+            phone=data['phone'],
+            birthday=data['birthday'],
+        )
+
+    con = Contract()
+    con.contract_number = data.get('contract_number')
+    con.date = data['con_date']
+    con.student = student
+    con.course = course
+    con.minus_length = data.get('minus_length')
+    con.total_payment = data.get('payment', 0)
+    con.off_percent = data.get('off_percent') or 0
+    con.description = data.get('description')
+    con.req_payment = contract_req_payment(course, con.minus_length, con.off_percent)
+    con.request_key = key
+    con.save()
+
+    txn = Transaction()
+    txn.contract = con
+    txn.txn_type = CONTRACT_INCOME
+    txn.amount = con.total_payment
+    txn.txn_date = con.date
+    txn.txn_method = data.get('txn_method')
+    txn.save()
+
+    Class.objects.create(student=student, course=course)
+    change_course_counters(course, enrollments=1, contracts=1)
+
+    return con
+
+
+def change_course_counters(course, enrollments=0, contracts=0):
+    """
+    Add to stored enrollment and active contract counters of course.
+
+    Uses UPDATE ... SET x = x + n, so concurrent requests never lose each
+    other's changes. Call inside the transaction that inserts or deletes
+    the Class / Contract rows being counted.
+    """
+    values = {'updated_at': timezone.now()}
+    if enrollments:
+        values['enrollment_count'] = F('enrollment_count') + enrollments
+    if contracts:
+        values['active_contract_count'] = F('active_contract_count') + contracts
+    if len(values) > 1:
+        Course.objects.filter(pk=course.pk).update(**values)
+        bump_model_versions(Course)
+
+
+def enroll(student, course):
+    """Put student into class of course and count it, if not there yet."""
+    cls, created = Class.objects.get_or_create(student=student, course=course)
+    if created:
+        change_course_counters(course, enrollments=1)
+    return cls
+
+
+def unenroll(classes):
+    """Delete Class rows of queryset and uncount them per course."""
+    removed = {}
+    for course_id in classes.select_for_update().values_list('course_id', flat=True):
+        removed[course_id] = removed.get(course_id, 0) + 1
+    classes.delete()
+    for course_id, count in removed.items():
+        change_course_counters(Course(pk=course_id), enrollments=-count)
+
+
+def _count_subquery(queryset):
+    """COUNT(*) of queryset per outer course, as expression."""
+    counts = queryset.filter(course=OuterRef('pk')).order_by().values('course').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def reconcile_course_counters():
+    """Recount counters of drifted courses, return their number."""
+    drifted = Course.objects.annotate(
+        real_enrollments=_count_subquery(Class.objects.all()),
+        real_contracts=_count_subquery(Contract.objects.filter(flag=True)),
+    ).exclude(
+        Q(enrollment_count=F('real_enrollments')) & Q(active_contract_count=F('real_contracts'))
+    ).values_list('pk', flat=True)
+
+    pks = list(drifted)
+    if pks:
+        Course.objects.filter(pk__in=pks).update(
+            enrollment_count=_count_subquery(Class.objects.all()),
+            active_contract_count=_count_subquery(Contract.objects.filter(flag=True)),
+            updated_at=timezone.now(),
+        )
+        bump_model_versions(Course)
+    return len(pks)
+
+
+def set_flags(model, ids, flag):
+    """
+    Soft delete (flag False) or restore rows of model with pk in ids.
+
+    One UPDATE ... WHERE id = ANY(%s) of rows whose flag changes, returns
+    their number. Bypasses save() and signals, callers drop caches.
+    """
+    updated = model.objects.filter(pk__any=ids, flag=not flag).update(flag=flag, updated_at=timezone.now())
+    if updated:
+        bump_model_versions(model)
+    return updated
+
+
+def set_course_flags(ids, flag):
+    """
+    set_flags of courses, cached course choices are dropped.
+
+    Sessions of deleted courses are deactivated, restoring a course does
+    not bring them back as their slots may be taken by now.
+    """
+    updated = set_flags(Course, ids, flag)
+    if updated:
+        invalidate_course_choices()
+        if not flag:
+            release_sessions(ids)
+    return updated
+
+
+def set_transaction_flags(ids, flag):
+    """
+    set_flags of transactions, verified ones are never deleted.
+
+    Cached P&L of months of changed transactions is dropped.
+    """
+    queryset = Transaction.objects.filter(pk__any=ids, flag=not flag)
+    if not flag:
+        queryset = queryset.filter(verified=False)
+    with transaction.atomic():
+        months = list(queryset.datetimes('txn_date', 'month'))
+        updated = queryset.update(flag=flag, updated_at=timezone.now())
+        if updated:
+            invalidate_profit_loss(months)
+            bump_model_versions(Transaction)
+    return updated
+
+
+def verify_transactions(ids):
+    """Mark active unverified transactions with pk in ids as verified, return their number."""
+    queryset = Transaction.objects.filter(pk__any=ids, flag=True, verified=False)
+    with transaction.atomic():
+        months = list(queryset.datetimes('txn_date', 'month'))
+        updated = queryset.update(verified=True, updated_at=timezone.now())
+        if updated:
+            invalidate_profit_loss(months)
+            bump_model_versions(Transaction)
+    return updated
+
+
+def set_contract_flags(ids, flag):
+    """
+    set_flags of contracts, keeping classes and course counters in step.
+
+    Like ContractDeleteView a deleted contract takes its student out of the
+    class of the course, a restored one puts the student back.
+    """
+    with transaction.atomic():
+        contracts = list(
+            Contract.objects.select_for_update().filter(pk__any=ids, flag=not flag).values_list('pk', 'course_id', 'student_id'))
+        if not contracts:
+            return 0
+        Contract.objects.filter(pk__any=[pk for pk, course_id, student_id in contracts]).update(
+            flag=flag, updated_at=timezone.now())
+
+        pairs = set((course_id, student_id) for pk, course_id, student_id in contracts)
+        classes = Class.objects.filter(reduce(operator.or_, [Q(course_id=c, student_id=s) for c, s in pairs]))
+        if flag:
+            enrolled = set(classes.values_list('course_id', 'student_id'))
+            Class.objects.bulk_create([Class(course_id=c, student_id=s) for c, s in pairs - enrolled])
+            enrollments = Counter(c for c, s in pairs - enrolled)
+        else:
+            unenroll(classes)
+            enrollments = Counter()
+
+        sign = 1 if flag else -1
+        for course_id, count in Counter(course_id for pk, course_id, student_id in contracts).items():
+            change_course_counters(
+                Course(pk=course_id), enrollments=enrollments.get(course_id, 0), contracts=sign * count)
+        bump_model_versions(Contract, Class)
+    return len(contracts)
+
+
+def student_profile(queryset, pk):
+    """
+    Student pk with classes, contracts and their payments, and levels.
+
+    Related rows come from one prefetch query each, so the profile costs
+    five queries however long the history is. Returns None for unknown pk.
+    Contracts have ``payments`` (active transactions, newest first) and
+    the student gets ``payments`` of all contracts and ``totals``.
+    """
+    student = queryset.filter(pk=pk).prefetch_related(
+        Prefetch(
+            'sclasses',
+            queryset=Class.objects.select_related('course__ctype').order_by('-course__start_date', '-id'),
+        ),
+        Prefetch(
+            'contract_set',
+            queryset=Contract.objects.select_related('course__ctype').order_by('-date', '-id'),
+        ),
+        Prefetch(
+            'contract_set__ctxns',
+            queryset=Transaction.objects.filter(flag=True).order_by('-txn_date', '-id'),
+            to_attr='payments',
+        ),
+        Prefetch(
+            'levels',
+            queryset=StudentLevel.objects.filter(flag=True).select_related('course__ctype').order_by('-date', '-id'),
+        ),
+    ).first()
+    if student is None:
+        return None
+
+    contracts = student.contract_set.all()
+    active = [each for each in contracts if each.flag]
+    student.payments = sorted(
+        (txn for con in contracts for txn in con.payments),
+        key=lambda txn: (txn.txn_date, txn.pk), reverse=True,
+    )
+    student.totals = {
+        'contracts': len(active),
+        'req_payment': sum(each.req_payment for each in active),
+        'total_payment': sum(each.total_payment for each in active),
+        'balance': sum(each.balance for each in active),
+    }
+    return student
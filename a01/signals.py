@@ -0,0 +1,44 @@
+"""Signal handlers of app a01."""
+
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from a01.caches import bump_model_versions
+from a01.caches import invalidate_course_choices
+from a01.caches import invalidate_profit_loss
+from a01.models import Course
+from a01.models import CourseType
+from a01.models import Transaction
+from a01.timetable import release_sessions
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=CourseType)
+@receiver(post_delete, sender=CourseType)
+def course_changed(sender, **kwargs):
+    """Course labels and prices are cached in a01.caches."""
+    invalidate_course_choices()
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, **kwargs):
+    """Deleted (flag False) course frees its rooms and teachers."""
+    if not instance.flag:
+        release_sessions([instance.pk])
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def transaction_changed(sender, instance, **kwargs):
+    """Cached P&L of both old and new month of transaction is stale."""
+    invalidate_profit_loss([instance.txn_date, getattr(instance, '_loaded_txn_date', None)])
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def model_changed(sender, **kwargs):
+    """Rows rendered from a01 models are cached per model version."""
+    if sender._meta.app_label == 'a01':
+        bump_model_versions(sender)
@@ -0,0 +1,398 @@
+"""
+Synthetic data of realistic volume for benchmarks of app a01.
+
+Rows are written with bulk_create in batches, signals do not run, so
+denormalized columns (Contract.balance, Course counters) are filled here and
+caches are dropped at the end.
+"""
+
+import datetime
+import random
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.db import transaction
+from django.db.models import Max
+
+from a01.caches import bump_model_versions
+from a01.choices import BY_BANK
+from a01.choices import BY_CASH
+from a01.choices import CONTRACT_INCOME
+from a01.choices import Level
+from a01.choices import Month
+from a01.choices import NOR_EXPENSE
+from a01.choices import NOR_INCOME
+from a01.choices import SALARY_EXPENSE
+from a01.choices import Shift
+from a01.models import Class
+from a01.models import Contract
+from a01.models import Course
+from a01.models import CourseSession
+from a01.models import CourseTeachers
+from a01.models import CourseType
+from a01.models import Student
+from a01.models import StudentLevel
+from a01.models import Teacher
+from a01.models import TeacherSalary
+from a01.models import Transaction
+from a01.models import Room
+from a01.models import Worker
+from a01.services import contract_req_payment
+from a01.services import reconcile_course_counters
+
+
+FIRST_NAMES = (
+    'Бат', 'Болд', 'Дорж', 'Ганбаатар', 'Тэмүүлэн', 'Анар', 'Сарангэрэл', 'Номин',
+    'Оюун', 'Энхжин', 'Мөнх', 'Хулан', 'Төгөлдөр', 'Ариунаа', 'Билгүүн', 'Золбоо',
+)
+LAST_NAMES = (
+    'Батбаяр', 'Ганзориг', 'Дашдорж', 'Энхбаяр', 'Лхагва', 'Мягмар', 'Пүрэв', 'Сүхбаатар',
+    'Цэрэн', 'Чулуун', 'Эрдэнэ', 'Алтанхуяг',
+)
+LETTERS = 'АБВГДЕЁЖЗИЙКЛМНОӨПРСТУҮФХЦЧШЩЪЫЬЭЮЯ'
+
+COURSE_TYPES = (
+    ('Beginner', 32, 320000),
+    ('Elementary', 40, 400000),
+    ('Pre-Intermediate', 48, 480000),
+    ('Intermediate', 48, 520000),
+    ('Upper-Intermediate', 56, 600000),
+    ('Advanced', 60, 680000),
+    ('IELTS', 40, 750000),
+    ('TOEFL', 40, 750000),
+)
+
+# 90 minute lessons Monday to Saturday; lessons from 14:00 are second shift.
+SESSION_STARTS = (
+    datetime.time(9, 0), datetime.time(10, 30), datetime.time(12, 0),
+    datetime.time(14, 0), datetime.time(15, 30), datetime.time(17, 0), datetime.time(18, 30),
+)
+SESSION_LENGTH = datetime.timedelta(minutes=90)
+TERM_DAYS = 90
+
+DEFAULTS = {
+    'students': 100000,
+    'transactions': 1000000,
+    'courses': 3000,
+    'teachers': 300,
+    'workers': 50,
+    'months': 24,
+    'rooms': 40,
+    'batch_size': 5000,
+}
+
+
+class Generator(object):
+    """Write one data set, random but reproducible for a seed."""
+
+    def __init__(self, students, transactions, courses, teachers, workers, months,
+                 batch_size=DEFAULTS['batch_size'], seed=None, today=None, log=None, rooms=0):
+        """Keep volumes."""
+        self.students = students
+        self.transactions = transactions
+        self.courses = courses
+        self.teachers = teachers
+        self.workers = workers
+        self.months = months
+        self.rooms = rooms
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.today = today or datetime.date.today()
+        self.start = self.today - datetime.timedelta(days=30 * months)
+        self.log = log or (lambda message: None)
+
+    def run(self):
+        """Write all rows and return number of rows per model."""
+        counts = {}
+        course_types = self.create_course_types()
+        teachers = self.create_staff(Teacher, self.teachers, 'hourly_wage', (8000, 25000))
+        workers = self.create_staff(Worker, self.workers, 'monthly_wage', (600000, 1500000))
+        courses = self.create_courses(course_types, teachers)
+        salary_txns = self.create_salaries(teachers, workers)
+        rooms = self.create_rooms()
+        sessions = self.create_timetable(courses, teachers, rooms)
+
+        counts[CourseType] = len(course_types)
+        counts[Teacher] = len(teachers)
+        counts[Worker] = len(workers)
+        counts[Course] = len(courses)
+        counts[TeacherSalary] = salary_txns
+        counts[Room] = len(rooms)
+        counts[CourseSession] = sessions
+
+        # Transaction budget left after salaries: a few plain incomes and
+        # expenses, the rest are contract payments.
+        left = max(self.transactions - salary_txns, 0)
+        plain = left // 50
+        payments = left - plain
+        self.create_plain_transactions(plain)
+        counts[Transaction] = salary_txns + plain
+
+        contracts = int(self.students * 1.2)
+        per_contract = payments / float(contracts) if contracts else 0
+        done = 0
+        while done < self.students:
+            size = min(self.batch_size, self.students - done)
+            created = self.create_students(size, courses, per_contract)
+            for model, count in created.items():
+                counts[model] = counts.get(model, 0) + count
+            done += size
+            self.log('%d / %d students' % (done, self.students))
+
+        with transaction.atomic():
+            reconcile_course_counters()
+        cache.clear()
+        bump_model_versions(*apps.get_app_config('a01').get_models())
+        return counts
+
+    def bulk(self, model, objects):
+        """bulk_create objects and return them with primary keys on every backend."""
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        # Explicit batch_size is not capped by backend limits (SQLite).
+        batch_size = min(self.batch_size, connection.ops.bulk_batch_size(model._meta.concrete_fields, objects) or self.batch_size)
+        model.objects.bulk_create(objects, batch_size=batch_size)
+        if objects and objects[0].pk is None:
+            # Only PostgreSQL returns ids of bulk inserted rows.
+            pks = model.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)
+            for obj, pk in zip(objects, pks):
+                obj.pk = pk
+        return objects
+
+    def date(self, start=None, end=None):
+        """Random date between start and end, default the generated period."""
+        start = start or self.start
+        end = end or self.today
+        return start + datetime.timedelta(days=self.random.randint(0, max((end - start).days, 0)))
+
+    def datetime(self, start=None, end=None):
+        """Random working hour time on random date."""
+        day = self.date(start, end)
+        return datetime.datetime(day.year, day.month, day.day, self.random.randint(9, 19), self.random.randint(0, 59))
+
+    def person(self):
+        """Name, register and phone of random person."""
+        birthday = self.date(datetime.date(1970, 1, 1), datetime.date(2012, 12, 31))
+        return {
+            'fname': self.random.choice(FIRST_NAMES),
+            'lname': self.random.choice(LAST_NAMES),
+            'register': '%s%s%02d%02d%02d%02d' % (
+                self.random.choice(LETTERS), self.random.choice(LETTERS), birthday.year % 100,
+                birthday.month, birthday.day, self.random.randint(0, 99)),
+            'phone': '%d' % self.random.randint(80000000, 99999999),
+            'birthday': birthday,
+        }
+
+    def create_course_types(self):
+        """Course types of COURSE_TYPES."""
+        return self.bulk(CourseType, [
+            CourseType(level=level, length=length, price=price, hourly_price=price // length)
+            for level, length, price in COURSE_TYPES
+        ])
+
+    def create_staff(self, model, count, wage_field, wages):
+        """Teachers or workers with unique registers."""
+        objects = []
+        registers = set()
+        while len(objects) < count:
+            data = self.person()
+            if data['register'] in registers or model.objects.filter(register=data['register']).exists():
+                continue
+            registers.add(data['register'])
+            data[wage_field] = self.random.randrange(wages[0], wages[1], 1000)
+            objects.append(model(**data))
+        return self.bulk(model, objects)
+
+    def create_courses(self, course_types, teachers):
+        """Courses over the period, each with one or two teachers."""
+        courses = self.bulk(Course, [
+            Course(
+                ctype=self.random.choice(course_types),
+                start_date=self.datetime(),
+                info='%s анги' % (i + 1),
+                flag=self.random.random() < 0.9,
+            )
+            for i in range(self.courses)
+        ])
+        if teachers:
+            self.bulk(CourseTeachers, [
+                CourseTeachers(teacher=teacher, course=course, lesson=course.ctype.level)
+                for course in courses
+                for teacher in self.random.sample(teachers, min(len(teachers), self.random.randint(1, 2)))
+            ])
+        return courses
+
+    def create_rooms(self):
+        """Rooms of 8 to 30 seats."""
+        return self.bulk(Room, [
+            Room(name='%d тоот' % (101 + i), capacity=self.random.choice((8, 12, 16, 20, 24, 30)))
+            for i in range(self.rooms)
+        ])
+
+    def create_timetable(self, courses, teachers, rooms):
+        """
+        Two weekly sessions of active courses of the last term, return their
+        number.
+
+        Lessons start on SESSION_STARTS only, so two of them overlap exactly
+        when they start together; a teacher or room already taken then is
+        left empty and no exclusion constraint is violated.
+        """
+        term_start = self.today - datetime.timedelta(days=TERM_DAYS)
+        taken = set()
+        sessions = []
+        for course in courses:
+            if not course.flag or course.start_date.date() < term_start:
+                continue
+            for weekday in self.random.sample(range(1, 7), 2):
+                start = self.random.choice(SESSION_STARTS)
+                teacher = self.random.choice(teachers) if teachers else None
+                room = self.random.choice(rooms) if rooms else None
+                if teacher is not None and ('teacher', teacher.pk, weekday, start) in taken:
+                    teacher = None
+                if room is not None and ('room', room.pk, weekday, start) in taken:
+                    room = None
+                taken.update((
+                    ('teacher', teacher and teacher.pk, weekday, start),
+                    ('room', room and room.pk, weekday, start),
+                ))
+                end = (datetime.datetime.combine(self.today, start) + SESSION_LENGTH).time()
+                sessions.append(CourseSession(
+                    course=course, teacher=teacher, room=room, weekday=weekday, start_time=start, end_time=end,
+                    mshift=Shift.of_time(start),
+                ))
+        self.bulk(CourseSession, sessions)
+        return len(sessions)
+
+    def create_salaries(self, teachers, workers):
+        """Salary of every staff member for every month and shift, return their number."""
+        periods = []
+        day = self.start.replace(day=1)
+        while day <= self.today:
+            periods.append(day)
+            day = (day + datetime.timedelta(days=32)).replace(day=1)
+
+        salaries = []
+        for day in periods:
+            month = Month.choices[day.month - 1][0]
+            paid_at = datetime.datetime(day.year, day.month, 25, 12)
+            info = 'Цалин %s %s' % (day.year, Month.choices[day.month - 1][1])
+            for shift, label in Shift.choices:
+                for teacher in teachers:
+                    hours = self.random.randint(20, 80)
+                    salaries.append((paid_at, info, TeacherSalary(
+                        teacher=teacher, year=day.year, month=month, mshift=shift,
+                        worked_hour=hours, salary=teacher.hourly_wage * hours)))
+                for worker in workers:
+                    salaries.append((paid_at, info, TeacherSalary(
+                        worker=worker, year=day.year, month=month, mshift=shift,
+                        salary=worker.monthly_wage // 2)))
+
+        for i in range(0, len(salaries), self.batch_size):
+            batch = salaries[i:i + self.batch_size]
+            txns = self.bulk(Transaction, [
+                Transaction(
+                    amount=each.salary,
+                    txn_type=SALARY_EXPENSE,
+                    txn_date=paid_at,
+                    txn_method=BY_BANK,
+                    info=info,
+                    verified=True,
+                )
+                for paid_at, info, each in batch
+            ])
+            for (paid_at, info, each), txn in zip(batch, txns):
+                each.txn = txn
+            self.bulk(TeacherSalary, [each for paid_at, info, each in batch])
+        return len(salaries)
+
+    def create_plain_transactions(self, count):
+        """Incomes and expenses not linked to contracts."""
+        for i in range(0, count, self.batch_size):
+            self.bulk(Transaction, [
+                Transaction(
+                    amount=self.random.randrange(10000, 2000000, 500),
+                    txn_type=self.random.choice((NOR_INCOME, NOR_EXPENSE)),
+                    txn_date=self.datetime(),
+                    txn_method=self.random.choice((BY_BANK, BY_CASH)),
+                    info=self.random.choice(('Түрээс', 'Бичиг хэрэг', 'Ном', 'Цахилгаан', 'Хандив')),
+                    verified=self.random.random() < 0.7,
+                )
+                for j in range(min(self.batch_size, count - i))
+            ])
+
+    def create_students(self, count, courses, per_contract):
+        """Students with contracts, payments, classes and levels."""
+        with transaction.atomic():
+            students = self.bulk(Student, [Student(**self.person()) for i in range(count)])
+
+            contracts = []
+            payments = []
+            classes = []
+            levels = []
+            for st in students:
+                taken = self.random.sample(courses, 2 if self.random.random() < 0.2 else 1)
+                for course in taken:
+                    day = self.date(course.start_date.date() - datetime.timedelta(days=14), course.start_date.date())
+                    minus_length = self.random.choice((0, 0, 0, 4, 8))
+                    off_percent = self.random.choice((0, 0, 0, 10, 20))
+                    con = Contract(
+                        student=st,
+                        course=course,
+                        date=day,
+                        minus_length=minus_length,
+                        off_percent=off_percent,
+                        req_payment=contract_req_payment(course, minus_length, off_percent),
+                        contract_number='%s-%d' % (day.strftime('%y%m'), self.random.randint(1000, 99999)),
+                        flag=self.random.random() < 0.95,
+                    )
+                    amounts = self.payments(con, per_contract)
+                    con.total_payment = sum(amounts)
+                    con.balance = con.remainder_payment()
+                    contracts.append(con)
+                    payments.append(amounts)
+                    classes.append(Class(student=st, course=course))
+                    levels.append(StudentLevel(
+                        student=st, course=course, date=day,
+                        level=self.random.choice(Level.choices)[0]))
+
+            self.bulk(Contract, contracts)
+            self.bulk(Class, classes)
+            self.bulk(StudentLevel, levels)
+            txns = self.bulk(Transaction, [
+                Transaction(
+                    contract=con,
+                    amount=amount,
+                    txn_type=CONTRACT_INCOME,
+                    txn_date=self.datetime(con.date, min(con.date + datetime.timedelta(days=90), self.today)),
+                    txn_method=self.random.choice((BY_BANK, BY_CASH)),
+                    verified=self.random.random() < 0.6,
+                )
+                for con, amounts in zip(contracts, payments)
+                for amount in amounts
+            ])
+
+        return {
+            Student: len(students),
+            Contract: len(contracts),
+            Class: len(classes),
+            StudentLevel: len(levels),
+            Transaction: len(txns),
+        }
+
+    def payments(self, con, per_contract):
+        """Amounts paid for contract, on average per_contract payments."""
+        times = int(per_contract) + (1 if self.random.random() < per_contract % 1 else 0)
+        if not times:
+            return []
+        # Most contracts are paid in full, some leave a debt.
+        paid = con.req_payment if self.random.random() < 0.8 else con.req_payment * self.random.randint(3, 9) // 10
+        return self.split(int(paid), times)
+
+    def split(self, total, parts):
+        """Split total into parts positive amounts rounded to 1000."""
+        if parts <= 1 or total < parts * 1000:
+            return [total]
+        cuts = sorted(self.random.randrange(0, total, 1000) for i in range(parts - 1))
+        amounts = [b - a for a, b in zip([0] + cuts, cuts + [total])]
+        return [each for each in amounts if each > 0] or [total]
@@ -0,0 +1,104 @@
+"""Tasks of app a01 run in background by manage.py run_jobs, see a01.jobs."""
+
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import QueryDict
+
+from a01.caches import invalidate_profit_loss
+from a01.exports import csv_lines
+from a01.importer import import_contracts
+from a01.importer import read_rows
+from a01.jobs import JobError
+from a01.jobs import set_progress
+from a01.jobs import task
+from a01.payroll import run_payroll
+from a01.reports import month_starts
+from a01.reports import profit_loss
+from a01.services import reconcile_course_counters
+from a01.views import ContractExportView
+from a01.views import SalaryExportView
+from a01.views import TransactionExportView
+
+
+EXPORT_VIEWS = {
+    'contracts': ContractExportView,
+    'transactions': TransactionExportView,
+    'salaries': SalaryExportView,
+}
+
+PROGRESS_EVERY = 1000
+
+
+def job_file_name(job, filename):
+    """Storage name of file made by job."""
+    return 'jobs/%s/%s' % (job.pk, filename)
+
+
+@task('import_contracts')
+def import_contracts_task(job, path, filename):
+    """Import uploaded file saved in default_storage, file is removed after."""
+    try:
+        size = default_storage.size(path)
+        with default_storage.open(path, 'rb') as fileobj:
+            def progress(result):
+                """Share of file read so far."""
+                percent = 100 * fileobj.tell() // size if size else 0
+                set_progress(job, min(percent, 99), 'Бүртгэгдсэн: %d, алдаатай: %d' % (result.created, len(result.errors)))
+
+            result = import_contracts(read_rows(fileobj, filename), progress=progress)
+    finally:
+        default_storage.delete(path)
+
+    return {'created': result.created, 'errors': result.errors}
+
+
+@task('payroll')
+def payroll_task(job, year, month, mshift, teacher_hours=None, worker_wages=None):
+    """Payroll of period, json keeps staff pks of maps as strings."""
+    salaries = run_payroll(
+        year, month, mshift,
+        teacher_hours=dict((int(pk), value) for pk, value in (teacher_hours or {}).items()),
+        worker_wages=dict((int(pk), value) for pk, value in (worker_wages or {}).items()),
+    )
+    return {'paid': len(salaries), 'total': sum(each.salary for each in salaries)}
+
+
+@task('export_csv')
+def export_csv_task(job, export, query=''):
+    """Write CSV of export view filtered by query string to default_storage."""
+    view_class = EXPORT_VIEWS.get(export)
+    if view_class is None:
+        raise JobError('Unknown export %s.' % export)
+
+    view = view_class()
+    f = view.filterset_class(QueryDict(query), queryset=view.get_queryset())
+    queryset = f.qs.order_by(*view.ordering)
+    total = queryset.count()
+
+    with tempfile.TemporaryFile() as tmp:
+        for i, line in enumerate(csv_lines(queryset, view.columns)):
+            tmp.write(line.encode('utf-8'))
+            if i and i % PROGRESS_EVERY == 0:
+                set_progress(job, 100 * i // (total or 1), '%d / %d мөр' % (i, total))
+        tmp.seek(0)
+        name = default_storage.save(job_file_name(job, view.filename), File(tmp))
+
+    return {'file': name, 'rows': total}
+
+
+@task('profit_loss')
+def profit_loss_task(job, months=12):
+    """Drop and compute again cached P&L of last months."""
+    invalidate_profit_loss(month_starts(months))
+    report = profit_loss(months)
+    return {'months': len(report), 'profit': sum(each['profit'] for each in report)}
+
+
+@task('reconcile_course_counters')
+def reconcile_course_counters_task(job):
+    """Recount enrollment and contract counters of courses."""
+    with transaction.atomic():
+        return {'repaired': reconcile_course_counters()}
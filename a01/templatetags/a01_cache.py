@@ -0,0 +1,129 @@
+"""Template tags caching rendered rows of app a01."""
+
+from django import template
+from django.core.cache import cache
+
+from absolute.db_routers import reading_replica
+from absolute.db_routers import replica_current
+
+from a01.caches import ROW_CACHE_TIMEOUT
+from a01.caches import model_versions
+from a01.caches import models_modified
+from a01.caches import row_fragment_key
+
+
+register = template.Library()
+
+
+class RowCacheNode(template.Node):
+    """Render block once per object and versions of models it shows."""
+
+    def __init__(self, nodelist, name, obj, rows, models):
+        """Keep unresolved arguments, rows may be None."""
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+        self.rows = rows
+        self.models = models
+
+    def render(self, context):
+        """
+        Cached block or freshly rendered and cached one.
+
+        Blocks rendered from a replica that has not replayed the last change
+        of their models are not cached, they would be stored under the new
+        versions until the next change.
+        """
+        obj = self.obj.resolve(context)
+        name = self.name.resolve(context)
+        key = self.key(context, name, obj)
+
+        prefetched = self.prefetch(context, name)
+        if key in prefetched:
+            html = prefetched[key]
+        else:
+            html = cache.get(key)
+        if html is None:
+            html = self.nodelist.render(context)
+            if self.storable(context, self.labels(context, obj)):
+                cache.set(key, html, ROW_CACHE_TIMEOUT)
+        return html
+
+    def labels(self, context, obj):
+        """Labels of obj's model and listed models."""
+        return [obj._meta.label_lower] + [each.resolve(context).lower() for each in self.models]
+
+    def key(self, context, name, obj):
+        """Cache key of block of obj at current versions."""
+        labels = self.labels(context, obj)
+        versions = self.versions(context, labels)
+        return row_fragment_key(name, obj, [versions[each] for each in labels])
+
+    def prefetch(self, context, name):
+        """
+        {key: html or None} of all rows, one cache.get_many per render.
+
+        Empty without rows, every block then takes its own cache.get.
+        """
+        if self.rows is None:
+            return {}
+        if self not in context.render_context:
+            keys = [self.key(context, name, each) for each in self.rows.resolve(context) or []]
+            found = cache.get_many(keys)
+            context.render_context[self] = dict((each, found.get(each)) for each in keys)
+        return context.render_context[self]
+
+    @staticmethod
+    def versions(context, labels):
+        """Model versions, fetched once per template render."""
+        known = context.render_context.setdefault('a01_model_versions', {})
+        missing = [each for each in labels if each not in known]
+        if missing:
+            known.update(model_versions(missing))
+        return known
+
+    @staticmethod
+    def storable(context, labels):
+        """May blocks showing models labels be cached, decided once per template render."""
+        known = context.render_context.setdefault('a01_row_storable', {})
+        labels = tuple(sorted(labels))
+        if labels not in known:
+            known[labels] = not reading_replica() or replica_current(models_modified(labels))
+        return known[labels]
+
+
+@register.tag
+def rowcache(parser, token):
+    """
+    Cache rendered row of an object until it or models it shows change.
+
+    {% for each in page %}
+    {% rowcache "contract_list" each in page "a01.Student" "a01.Course" %}
+        <td>{{each.student}}</td> ...
+    {% endrowcache %}
+    {% endfor %}
+
+    Fragment is keyed by name, object pk and version counters of the
+    object's model and listed models, bumped on every save or delete
+    (a01.signals). With ``in rows`` the blocks of all rows are read with
+    one cache.get_many. Block must not depend on anything but those rows.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError("'%s' takes fragment name, object and optional model labels." % bits[0])
+    rows = None
+    models = bits[3:]
+    if models[:1] == ['in']:
+        if len(models) < 2:
+            raise template.TemplateSyntaxError("'%s' takes rows after 'in'." % bits[0])
+        rows = parser.compile_filter(models[1])
+        models = models[2:]
+    nodelist = parser.parse(('endrowcache',))
+    parser.delete_first_token()
+    return RowCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        rows,
+        [parser.compile_filter(each) for each in models],
+    )
@@ -0,0 +1,18 @@
+"""Template filters for choices of app a01 (a01.choices.REGISTRY)."""
+
+from django import template
+
+from a01.choices import REGISTRY
+
+
+register = template.Library()
+
+
+@register.filter
+def choice_label(value, name):
+    """
+    Label of value in choices class called name.
+
+    {{ row.txn_type|choice_label:"TxnType" }}
+    """
+    return REGISTRY[name].label(value)
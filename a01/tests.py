@@ -1,3 +1,1061 @@
+"""
+Tests of app a01.
+
+Query plan and trigram tests run on PostgreSQL only. In the plan tests
+every query of a view request, and a few querysets of reports and
+services, is EXPLAINed against data made by a01.synthetic with sequential
+scans switched off. The planner then only picks a Seq Scan when no index
+can serve the query at all, so the tests do not depend on table sizes.
+"""
+
+import base64
+import csv
+import datetime
+import io
+import json
+import random
+import threading
+from unittest import mock
+from unittest import skipUnless
+
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import Permission
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connection
+from django.db import router
+from django.http import HttpResponse
+from django.template import Context
+from django.template import Template
+from django.test import RequestFactory
 from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from absolute import db_routers
+from absolute.middleware import ReplicaRoutingMiddleware
+
+from a01.caches import bump_model_versions
+from a01.caches import models_modified
+from a01.checks import check_shared_cache
+from a01.choices import BEGINNER
+from a01.choices import CONTRACT_INCOME
+from a01.choices import JOB_DONE
+from a01.choices import FIRST_SHIFT
+from a01.choices import JOB_FAILED
+from a01.choices import JOB_QUEUED
+from a01.choices import JOB_RUNNING
+from a01.choices import SECOND_SHIFT
+from a01.conditional import data_conditions
+from a01.forms import CSV_ENCODING_ERROR
+from a01.forms import ContractUploadForm
+from a01.forms import CourseSessionForm
+from a01.forms import TrigramSearchMixin
+from a01.forms import XLSX_ERROR
+from a01.importer import IMPORT_COLUMNS
+from a01.importer import import_contracts
+from a01.importer import read_rows
+from a01.jobs import RETRY_DELAY
+from a01.jobs import TASKS
+from a01.jobs import autodiscover
+from a01.jobs import claim
+from a01.jobs import enqueue
+from a01.jobs import fail
+from a01.jobs import requeue_stale
+from a01.jobs import run_job
+from a01.models import Class
+from a01.models import Contract
+from a01.models import Course
+from a01.models import CourseType
+from a01.models import CourseSession
+from a01.models import Job
+from a01.models import Room
+from a01.models import Student
+from a01.models import StudentLevel
+from a01.models import Teacher
+from a01.models import TeacherSalary
+from a01.models import Transaction
+from a01.models import Worker
+from a01.pagination import KeysetPaginator
+from a01.services import ALREADY_IN_CLASS
+from a01.services import Payment
+from a01.services import create_contract
+from a01.services import post_payments
+from a01.synthetic import Generator
+from a01.timetable import Slot
+from a01.timetable import assign_rooms
+from a01.timetable import find_conflicts
+from a01.timetable import overlapping
+from a01.views import ContractAddView
+from a01.views import ContractListView
+
+
+# Tables big enough in production that a full scan is a regression. Small
+# lookup tables (course types, teachers, workers) may be scanned.
+HOT_TABLES = (
+    'a01_student',
+    'a01_course',
+    'a01_contract',
+    'a01_class',
+    'a01_transaction',
+    'a01_teachersalary',
+    'a01_studentlevel',
+    'a01_coursesession',
+)
+
+
+def seq_scans(plan):
+    """Relations read by Seq Scan nodes of EXPLAIN (FORMAT JSON) plan."""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for each in plan.get('Plans', []):
+        found.extend(seq_scans(each))
+    return found
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are PostgreSQL specific.')
+# The test replica is a second connection that cannot see rows of the
+# test transaction, so views read from default here.
+@override_settings(DATABASE_ROUTERS=[])
+class QueryPlanTests(TestCase):
+    """Hot queries of app a01 are served by indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Small generated data set with fresh statistics."""
+        cls.today = datetime.date.today()
+        Generator(students=300, transactions=2000, courses=20, teachers=10, workers=5, months=6,
+                  batch_size=100, seed=1, today=cls.today, rooms=10).run()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = User.objects.create_superuser('plan', 'plan@example.com', 'plan')
+
+    def setUp(self):
+        """Log in."""
+        self.client.force_login(self.user)
+
+    def explain(self, sql, params=None):
+        """EXPLAIN (FORMAT JSON) of sql without sequential scans, top plan node."""
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if not isinstance(plan, list):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def assertIndexed(self, sql, params=None):
+        """Fail when sql reads a hot table by Seq Scan."""
+        plan = self.explain(sql, params)
+        scanned = [each for each in seq_scans(plan) if each in HOT_TABLES]
+        self.assertFalse(scanned, 'Seq Scan of %s in plan of\n%s\n%s' % (
+            ', '.join(scanned), sql, json.dumps(plan, indent=2)))
+
+    def assertQuerysetIndexed(self, queryset):
+        """assertIndexed of queryset."""
+        sql, params = queryset.query.sql_with_params()
+        self.assertIndexed(sql, params)
+
+    def assertViewIndexed(self, path, data=None):
+        """assertIndexed of every SELECT run by GET path."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, data)
+        self.assertEqual(response.status_code, 200)
+
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertIndexed(sql)
+
+    def month_range(self):
+        """txn_date__gt / __lt filter of last month."""
+        return {
+            'txn_date__gt': (self.today - datetime.timedelta(days=30)).isoformat(),
+            'txn_date__lt': self.today.isoformat(),
+        }
+
+    def test_student_list(self):
+        """Students newest first, active ones and fuzzy name search."""
+        self.assertViewIndexed('/a01/student/')
+        self.assertViewIndexed('/a01/student/', {'flag': 'True'})
+        self.assertViewIndexed('/a01/student/', {'fname': 'Бат'})
+
+    def test_course_list(self):
+        """Courses by start date, active ones."""
+        self.assertViewIndexed('/a01/course/')
+        self.assertViewIndexed('/a01/course/', {'flag': 'True'})
+
+    def test_contract_list(self):
+        """Contracts by date, of a course and of a date range."""
+        course = Course.objects.filter(flag=True).first()
+        self.assertViewIndexed('/a01/contract/')
+        self.assertViewIndexed('/a01/contract/', {'course': course.pk, 'flag': 'True'})
+        self.assertViewIndexed('/a01/contract/', {
+            'date__gt': (self.today - datetime.timedelta(days=60)).isoformat(),
+            'date__lt': self.today.isoformat(),
+        })
+
+    def test_debtor_list(self):
+        """Active contracts with balance."""
+        self.assertViewIndexed('/a01/contract/debtors/')
+
+    def test_transaction_list(self):
+        """Transactions and their summary of a month, also of one type."""
+        self.assertViewIndexed('/a01/transaction/', self.month_range())
+        data = self.month_range()
+        data['txn_type'] = 'CINCOME'
+        self.assertViewIndexed('/a01/transaction/', data)
+        data['flag'] = 'True'
+        self.assertViewIndexed('/a01/transaction/', data)
+
+    def test_profit_loss(self):
+        """Monthly report of active transactions."""
+        self.assertViewIndexed('/a01/report/pnl/', {'months': 6})
+
+    def test_student_level_list(self):
+        """Levels newest first."""
+        self.assertViewIndexed('/a01/student_level/')
+
+    def test_salary_list(self):
+        """Salaries of a payroll period."""
+        salary = TeacherSalary.objects.first()
+        self.assertViewIndexed('/a01/teacher/salary/detail/', {'year': salary.year, 'month': salary.month})
+
+    def test_detail_views(self):
+        """Pages of one student, course and contract."""
+        contract = Contract.objects.filter(flag=True).first()
+        self.assertViewIndexed('/a01/student/%d/' % contract.student_id)
+        self.assertViewIndexed('/a01/course/%d/' % contract.course_id)
+        self.assertViewIndexed('/a01/contract/%d/' % contract.pk)
+
+    def test_timetable(self):
+        """Timetable of the term and sessions clashing with one."""
+        self.assertViewIndexed('/a01/timetable/')
+        session = CourseSession.objects.filter(flag=True).exclude(room=None).exclude(teacher=None).first()
+        self.assertQuerysetIndexed(overlapping(session))
+
+    def test_service_querysets(self):
+        """Lookups of services and payroll."""
+        contract = Contract.objects.filter(flag=True).first()
+        salary = TeacherSalary.objects.first()
+        self.assertQuerysetIndexed(Class.objects.filter(course=contract.course_id, student=contract.student_id))
+        self.assertQuerysetIndexed(Contract.objects.filter(course=contract.course_id, flag=True).values('pk'))
+        self.assertQuerysetIndexed(Course.objects.filter(flag=True).order_by('id'))
+        self.assertQuerysetIndexed(Student.objects.filter(pk__any=[contract.student_id]))
+        self.assertQuerysetIndexed(
+            TeacherSalary.objects.filter(year=salary.year, month=salary.month, mshift=salary.mshift))
+        self.assertQuerysetIndexed(
+            Transaction.objects.filter(flag=True, txn_date__gte=self.today - datetime.timedelta(days=30))
+            .values('txn_type', 'txn_method').order_by())
+
+
+class KeysetPaginatorTests(TestCase):
+    """Cursors of KeysetPaginator."""
+
+    def test_cursors(self):
+        """Pages follow each other, a tampered cursor starts from the first page."""
+        for i in range(5):
+            Student.objects.create(fname='Bat', phone='99%06d' % i)
+        paginator = KeysetPaginator(Student.objects.all(), ('-id',), 2)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(len(set(first.object_list) | set(second.object_list)), 4)
+
+        pks = [each.pk for each in first]
+        for raw in ('{"a":1}', '[]', '"n1"', '1', '["x",1]', '["n",{"a":1}]', 'not json'):
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            self.assertEqual(paginator.decode_cursor(cursor), (None, None), raw)
+            self.assertEqual([each.pk for each in paginator.page(cursor)], pks, raw)
+        self.assertEqual(paginator.decode_cursor('%%%'), (None, None))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Trigram similarity is PostgreSQL specific.')
+class TrigramPagingTests(TestCase):
+    """Keyset pages of a ranked name search."""
+
+    def test_tied_scores(self):
+        """Rows sharing the similarity of a page's last row are on the next page."""
+        for i in range(25):
+            Student.objects.create(fname='Батбаяр', phone='99%06d' % i)
+        for i in range(5):
+            Student.objects.create(fname='Батаа', phone='88%06d' % i)
+        queryset = TrigramSearchMixin().trigram_search(Student.objects.all(), 'fname', 'Батбаяр')
+        paginator = KeysetPaginator(queryset, ('-similarity', '-id'), 10)
+
+        page = paginator.page()
+        seen = [each.pk for each in page]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            seen.extend(each.pk for each in page)
+
+        self.assertEqual(seen, list(queryset.values_list('pk', flat=True)))
+        self.assertEqual(len(seen), queryset.count())
+
+
+def make_course(price=100000, length=40):
+    """Active course of a new course type."""
+    ctype = CourseType.objects.create(price=price, length=length, hourly_price=price // length, level='B1')
+    return Course.objects.create(ctype=ctype, start_date=datetime.datetime(2020, 1, 1))
+
+
+class ImporterTests(TestCase):
+    """Contract import from CSV and XLSX files."""
+
+    def setUp(self):
+        """Course to import into."""
+        self.course = make_course()
+
+    def csv_bytes(self, count, encoding='utf-8', fname='Bat'):
+        """CSV file of count valid rows."""
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(IMPORT_COLUMNS)
+        for i in range(count):
+            writer.writerow([
+                fname, 'Dorj', '', '9911%04d' % i, '', '2020-01-01', self.course.pk,
+                10000, 0, 0, '', 'BY_CASH', 'n%d' % i,
+            ])
+        return text.getvalue().encode(encoding)
+
+    def run_import(self, data, filename='contracts.csv', chunk_size=50):
+        """ImportResult of file data."""
+        return import_contracts(read_rows(io.BytesIO(data), filename), chunk_size=chunk_size)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Only PostgreSQL returns ids of bulk inserted rows.')
+    def test_csv(self):
+        """Valid rows make contracts, counters follow."""
+        result = self.run_import(self.csv_bytes(3), chunk_size=2)
+        self.assertEqual((result.created, result.errors), (3, []))
+        self.assertEqual(Contract.objects.filter(course=self.course).count(), 3)
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.enrollment_count, self.course.active_contract_count), (3, 3))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Only PostgreSQL returns ids of bulk inserted rows.')
+    def test_wrong_encoding(self):
+        """Windows-1251 text ends the import with a readable error, rows before it are kept."""
+        data = self.csv_bytes(300) + self.csv_bytes(1, encoding='cp1251', fname='Батаа').split(b'\r\n', 1)[1]
+        result = self.run_import(data)
+        self.assertTrue(result.created)
+        self.assertEqual(Contract.objects.count(), result.created)
+        line, messages = result.errors[-1]
+        self.assertEqual(messages, [CSV_ENCODING_ERROR])
+        self.assertGreater(line, result.created)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Only PostgreSQL returns ids of bulk inserted rows.')
+    def test_csv_error(self):
+        """Malformed CSV is a row error, not a crash."""
+        data = self.csv_bytes(1) + b'"' + b'x' * (csv.field_size_limit() + 1) + b'"\r\n'
+        result = self.run_import(data)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn('CSV', result.errors[0][1][0])
+
+    def test_corrupt_xlsx(self):
+        """Broken .xlsx is reported, nothing is imported."""
+        result = self.run_import(b'not a zip file', filename='contracts.xlsx')
+        self.assertEqual(result.created, 0)
+        self.assertEqual(len(result.errors), 1)
+
+    def test_upload_form(self):
+        """Wrong encoding and broken .xlsx are refused on upload."""
+        form = ContractUploadForm(files={'file': SimpleUploadedFile('a.csv', self.csv_bytes(2, 'cp1251', 'Батаа'))})
+        self.assertEqual(form.errors['file'], [CSV_ENCODING_ERROR])
+        form = ContractUploadForm(files={'file': SimpleUploadedFile('a.xlsx', b'not a zip file')})
+        self.assertEqual(form.errors['file'], [XLSX_ERROR])
+        form = ContractUploadForm(files={'file': SimpleUploadedFile('a.csv', self.csv_bytes(2))})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['file'].read(), self.csv_bytes(2))
+
+
+def login_user(client, *codenames):
+    """Log client in as new user with a01 permissions codenames."""
+    user = User.objects.create_user('user', 'user@example.com', 'secret')
+    user.user_permissions.set(Permission.objects.filter(content_type__app_label='a01', codename__in=codenames))
+    client.force_login(user)
+    return user
+
+
+class CreateContractTests(TestCase):
+    """Contract creation of a01.services.create_contract and the API."""
+
+    def setUp(self):
+        """Course and cleaned data of ContractForm."""
+        cache.clear()
+        self.course = make_course()
+        self.data = {
+            'fname': 'Bat', 'lname': 'Dorj', 'register': '', 'phone': '99110000', 'birthday': None,
+            'con_date': datetime.date(2020, 1, 1), 'course': self.course, 'payment': 10000,
+            'minus_length': 0, 'off_percent': 0, 'description': '', 'txn_method': 'BY_CASH',
+            'contract_number': 'n1', 'request_key': 'key-1',
+        }
+
+    def counts(self):
+        """Numbers of students, contracts, transactions and classes."""
+        return [model.objects.count() for model in (Student, Contract, Transaction, Class)]
+
+    def test_replayed_key(self):
+        """Same key returns the first contract and adds nothing."""
+        contract, created = create_contract(self.data)
+        self.assertTrue(created)
+        counts = self.counts()
+        self.assertEqual(counts, [1, 1, 1, 1])
+
+        again, created = create_contract(self.data)
+        self.assertFalse(created)
+        self.assertEqual(again.pk, contract.pk)
+        self.assertEqual(self.counts(), counts)
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.enrollment_count, self.course.active_contract_count), (1, 1))
+
+    def test_already_in_class(self):
+        """Student put into the course meanwhile is a validation error."""
+        contract, created = create_contract(self.data)
+        self.data['request_key'] = 'key-2'
+        with self.assertRaises(ValidationError) as caught:
+            create_contract(self.data, student=contract.student)
+        self.assertEqual(caught.exception.messages, [ALREADY_IN_CLASS])
+        self.assertEqual(self.counts(), [1, 1, 1, 1])
+
+    def test_api_replay(self):
+        """API answers 201 first and 200 with the same contract on replay."""
+        login_user(self.client, 'main')
+        body = dict(self.data, course=self.course.pk, con_date='2020-01-01', birthday='', request_key='')
+        responses = [
+            self.client.post(reverse('api_contracts'), json.dumps(body), content_type='application/json', HTTP_IDEMPOTENCY_KEY='api-1')
+            for i in range(2)
+        ]
+        self.assertEqual([each.status_code for each in responses], [201, 200])
+        first, second = [json.loads(each.content.decode())['data'] for each in responses]
+        self.assertEqual(first['id'], second['id'])
+        self.assertEqual(self.counts(), [1, 1, 1, 1])
+
+
+
+class SalaryApiTests(TestCase):
+    """Payroll runs of the salaries API."""
+
+    def setUp(self):
+        """Teacher, worker and accountant."""
+        self.teacher = Teacher.objects.create(
+            fname='Bat', lname='Dorj', register='AA00000000', phone='99110000',
+            birthday=datetime.date(1990, 1, 1), hourly_wage=10000)
+        self.worker = Worker.objects.create(
+            fname='Dorj', lname='Bat', register='AA00000001', phone='99110001',
+            birthday=datetime.date(1990, 1, 1), monthly_wage=500000)
+
+    def post(self, **amounts):
+        """POST payroll of January, first shift."""
+        body = dict({'year': 2020, 'month': 'JANUARY', 'mshift': FIRST_SHIFT}, **amounts)
+        response = self.client.post(reverse('api_salaries'), json.dumps(body), content_type='application/json')
+        return response.status_code, json.loads(response.content.decode())
+
+    def test_payroll(self):
+        """Listed teacher and worker are paid."""
+        login_user(self.client, 'accounting')
+        status, data = self.post(teacher_hours={self.teacher.pk: 10}, worker_wages={self.worker.pk: 500000})
+        self.assertEqual(status, 201)
+        self.assertEqual(sorted(each['salary'] for each in data['data']), [100000, 500000])
+
+    def test_invalid_amounts(self):
+        """Hours and wages not above zero, unknown and inactive staff are 400 errors."""
+        login_user(self.client, 'accounting')
+        Worker.objects.filter(pk=self.worker.pk).update(flag=False)
+        for amounts in (
+            {'teacher_hours': {self.teacher.pk: 0}},
+            {'teacher_hours': {self.teacher.pk: -5}},
+            {'teacher_hours': {self.teacher.pk + 100: 10}},
+            {'teacher_hours': {self.teacher.pk: 'ten'}},
+            {'worker_wages': {self.worker.pk: 500000}},
+        ):
+            status, data = self.post(**amounts)
+            self.assertEqual(status, 400, amounts)
+            self.assertEqual(list(data['errors']), list(amounts))
+        self.assertFalse(TeacherSalary.objects.exists())
+
+    def test_permission_denied(self):
+        """User without accounting permission gets a JSON 403."""
+        login_user(self.client, 'main')
+        status, data = self.post(teacher_hours={self.teacher.pk: 10})
+        self.assertEqual((status, data), (403, {'errors': {'__all__': ['Permission denied.']}}))
+        self.assertFalse(TeacherSalary.objects.exists())
+
+class PaymentTests(TestCase):
+    """Payments of a01.services.post_payments and stale contract saves."""
+
+    def setUp(self):
+        """Two contracts of 100000 with nothing paid."""
+        course = make_course()
+        student = Student.objects.create(fname='Bat', lname='Dorj', phone='99110000')
+        self.contracts = [
+            Contract.objects.create(
+                student=student, course=course, date=datetime.date(2020, 1, 1), minus_length=0,
+                total_payment=0, req_payment=100000)
+            for i in range(2)
+        ]
+
+    def payment(self, contract, amount):
+        """Cash payment of amount to contract."""
+        return Payment(contract.pk, amount, datetime.datetime(2020, 1, 2), 'BY_CASH', '')
+
+    def test_post_payments(self):
+        """Amounts are summed per contract, one transaction per payment."""
+        first, second = self.contracts
+        totals = post_payments([self.payment(first, 30000), self.payment(first, 20000), self.payment(second, 10000)])
+        self.assertEqual(totals, {first.pk: (50000, 50000), second.pk: (10000, 90000)})
+        self.assertEqual(Transaction.objects.filter(contract=first).count(), 2)
+        first.refresh_from_db()
+        self.assertEqual((first.total_payment, first.balance), (50000, 50000))
+
+    def test_unknown_contract(self):
+        """Unknown contract rolls back all payments."""
+        first = self.contracts[0]
+        with self.assertRaises(Contract.DoesNotExist):
+            post_payments([self.payment(first, 30000), Payment(0, 1, datetime.datetime(2020, 1, 2), 'BY_CASH', '')])
+        first.refresh_from_db()
+        self.assertEqual((first.total_payment, Transaction.objects.count()), (0, 0))
+
+    def test_stale_save(self):
+        """Saving a contract loaded before a payment keeps the payment."""
+        stale = Contract.objects.get(pk=self.contracts[0].pk)
+        post_payments([self.payment(stale, 30000)])
+        stale.flag = False
+        stale.save()
+        fresh = Contract.objects.get(pk=stale.pk)
+        self.assertEqual((fresh.flag, fresh.total_payment, fresh.balance), (False, 30000, 70000))
+
+
+class ConditionalTests(TestCase):
+    """ETag and Last-Modified of a01.conditional."""
+
+    def setUp(self):
+        """Conditions of a contract page and a logged in request."""
+        self.conditions = data_conditions('a01.Contract')
+        self.request = RequestFactory().get('/a01/contract/')
+        self.request.user = AnonymousUser()
+        self.request.session = SessionStore()
+        self.request._messages = FallbackStorage(self.request)
+        self.request.META['CSRF_COOKIE'] = 'a' * 64
+
+    def test_csrf_token(self):
+        """New CSRF token after a login changes the ETag of pages with forms."""
+        etag = self.conditions['etag_func'](self.request)
+        self.assertEqual(self.conditions['etag_func'](self.request), etag)
+        self.request.META['CSRF_COOKIE'] = 'b' * 64
+        self.assertNotEqual(self.conditions['etag_func'](self.request), etag)
+
+    def test_pending_messages(self):
+        """Page with messages to show has no validators."""
+        self.assertTrue(self.conditions['etag_func'](self.request))
+        messages.success(self.request, 'Saved.')
+        self.assertIsNone(self.conditions['etag_func'](self.request))
+        self.assertIsNone(self.conditions['last_modified_func'](self.request))
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    def test_not_modified(self):
+        """Unchanged list answers 304, a message waiting for it 200."""
+        login_user(self.client, 'main')
+        first = self.client.get('/a01/contract/')
+        # First page sets the CSRF cookie, so the next one has a new ETag.
+        etag = self.client.get('/a01/contract/', HTTP_IF_NONE_MATCH=first['ETag'])['ETag']
+        self.assertNotEqual(etag, first['ETag'])
+        self.assertEqual(self.client.get('/a01/contract/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        storage = CookieStorage(self.request)
+        self.client.cookies[storage.cookie_name] = storage._encode([Message(messages.SUCCESS, 'Saved.')])
+        response = self.client.get('/a01/contract/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Saved.')
+
+
+class StudentLevelTests(TestCase):
+    """Recording English levels of students."""
+
+    def test_level_in_attended_course(self):
+        """Level of a course the student attends keeps one class and count."""
+        course = make_course()
+        student = Student.objects.create(fname='Bat', lname='Dorj', phone='99110000')
+        Class.objects.create(student=student, course=course)
+        Course.objects.filter(pk=course.pk).update(enrollment_count=1)
+        login_user(self.client, 's_composer')
+
+        response = self.client.post(
+            reverse('student_level_add', args=[student.pk]),
+            {'level': BEGINNER, 'date': '2020-02-01', 'course': course.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(StudentLevel.objects.filter(student=student, course=course).count(), 1)
+        self.assertEqual(Class.objects.filter(student=student, course=course).count(), 1)
+        course.refresh_from_db()
+        self.assertEqual(course.enrollment_count, 1)
+
+
+# Counted here without the middleware, first requests fill the caches. Views
+# read from default, the test replica cannot see rows of the test transaction
+# and its queries would not be counted.
+@override_settings(QUERY_BUDGET_ENABLED=False, DATABASE_ROUTERS=[])
+class StudentProfileTests(TestCase):
+    """Student page and profile API cost the same queries for any history."""
+
+    def setUp(self):
+        """Student with one course and student with ten, logged in user."""
+        cache.clear()
+        self.short = self.make_student(1)
+        self.long = self.make_student(10)
+        login_user(self.client, 's_composer')
+
+    def make_student(self, courses):
+        """Student with class, contract, three payments and level per course."""
+        student = Student.objects.create(fname='Bat', lname='Dorj', phone='99110000')
+        for i in range(courses):
+            course = make_course()
+            Class.objects.create(student=student, course=course)
+            contract = Contract.objects.create(
+                student=student, course=course, date=datetime.date(2020, 1, 1), minus_length=0,
+                total_payment=30000, req_payment=100000)
+            for day in range(1, 4):
+                Transaction.objects.create(
+                    contract=contract, amount=10000, txn_type=CONTRACT_INCOME, txn_date=datetime.datetime(2020, 1, day))
+            StudentLevel.objects.create(student=student, course=course, level=BEGINNER, date=datetime.date(2020, 1, 1))
+        return student
+
+    def assert_queries(self, name):
+        """Page name of both students takes session, user, two permission and five profile queries."""
+        for student in (self.short, self.long):
+            url = reverse(name, args=[student.pk])
+            self.client.get(url)
+            with self.assertNumQueries(9):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_detail(self):
+        """HTML student page."""
+        self.assert_queries('detail')
+
+    def test_api(self):
+        """Profile API."""
+        self.assert_queries('api_student_profile')
+        data = json.loads(self.client.get(reverse('api_student_profile', args=[self.long.pk])).content.decode())['data']
+        self.assertEqual([len(data['contracts']), len(data['contracts'][0]['transactions'])], [10, 3])
+
+def slot(pk, start, end, course_id=None, teacher_id=None, room_id=None, weekday=1, size=10):
+    """Slot of course pk unless given, times in minutes."""
+    return Slot(pk, course_id or pk, teacher_id, room_id, weekday, start, end, size)
+
+
+class CountedSlot(Slot):
+    """Slot counting reads of its fields, a measure of work independent of the machine."""
+
+    __slots__ = ()
+    reads = 0
+
+    def __getattribute__(self, name):
+        """Count and read attribute."""
+        CountedSlot.reads += 1
+        return super(CountedSlot, self).__getattribute__(name)
+
+
+class TimetableTests(TestCase):
+    """Conflicts and room assignment of a01.timetable."""
+
+    def test_back_to_back(self):
+        """Sessions are half open, one ending when the next starts do not clash."""
+        slots = [slot(1, 540, 630, room_id=1, teacher_id=1), slot(2, 630, 720, room_id=1, teacher_id=1)]
+        self.assertEqual(find_conflicts(slots), [])
+        rooms = [Room(pk=1, capacity=20)]
+        self.assertEqual(assign_rooms([slot(1, 540, 630), slot(2, 630, 720)], rooms), ({1: 1, 2: 1}, []))
+
+    def test_conflicts(self):
+        """Overlaps of one room, teacher or course on one weekday, first starts first."""
+        slots = [
+            slot(1, 540, 630, room_id=1, teacher_id=1),
+            slot(2, 600, 690, room_id=1, teacher_id=2),
+            slot(3, 620, 700, room_id=2, teacher_id=1, course_id=1),
+            slot(4, 540, 630, room_id=1, weekday=2),
+        ]
+        found = sorted((each.kind, each.resource_id, each.first.pk, each.second.pk) for each in find_conflicts(slots))
+        self.assertEqual(found, [
+            ('course', 1, 1, 3),
+            ('room', 1, 1, 2),
+            ('teacher', 1, 1, 3),
+        ])
+
+    def test_conflicts_match_pairs(self):
+        """Sweep finds exactly the overlapping pairs."""
+        rng = random.Random(1)
+        slots = []
+        for pk in range(1, 301):
+            start = rng.randrange(480, 1200, 10)
+            slots.append(slot(pk, start, start + rng.choice((60, 90, 120)), room_id=rng.randrange(10), weekday=rng.randrange(1, 3)))
+        expected = set(
+            (a.pk, b.pk) for a in slots for b in slots
+            if a.pk != b.pk and a.room_id == b.room_id and a.weekday == b.weekday
+            and (a.start, a.end, a.pk) < (b.start, b.end, b.pk) and a.start < b.end and b.start < a.end
+        )
+        found = set((each.first.pk, each.second.pk) for each in find_conflicts(slots) if each.kind == 'room')
+        self.assertEqual(found, expected)
+
+    def test_booked_rooms(self):
+        """Rooms taken by sessions with a room are not suggested."""
+        slots = [slot(1, 540, 630, room_id=1), slot(2, 600, 690), slot(3, 630, 720)]
+        rooms = [Room(pk=1, capacity=20), Room(pk=2, capacity=30)]
+        self.assertEqual(assign_rooms(slots, rooms), ({2: 2, 3: 1}, []))
+
+    def test_capacity(self):
+        """Smallest room seating the course, too big courses are left out."""
+        slots = [slot(1, 540, 630, size=25), slot(2, 540, 630, size=10), slot(3, 540, 630, size=50)]
+        rooms = [Room(pk=1, capacity=30), Room(pk=2, capacity=12)]
+        self.assertEqual(assign_rooms(slots, rooms), ({1: 1, 2: 2}, [3]))
+
+    def test_fewest_rooms(self):
+        """Rooms of one size are reused, as many as sessions running at once."""
+        slots = [slot(1, 540, 630), slot(2, 560, 650), slot(3, 630, 720), slot(4, 650, 740)]
+        assigned, unassigned = assign_rooms(slots, [Room(pk=pk, capacity=20) for pk in range(1, 4)])
+        self.assertEqual((len(set(assigned.values())), unassigned), (2, []))
+
+    def test_scaling(self):
+        """Work grows about linearly with a term of the same density, four times the sessions."""
+        # Days, teachers and rooms grow with the sessions, so each day has
+        # as many sessions running at once.
+        reads = {}
+        for size in (2500, 10000):
+            rng = random.Random(2)
+            slots = []
+            for pk in range(1, size + 1):
+                start = rng.randrange(480, 1200, 10)
+                room_id = rng.randrange(60) if pk % 2 else None
+                slots.append(CountedSlot(
+                    pk, pk // 4 + 1, rng.randrange(size // 50), room_id, rng.randrange(size // 250), start, start + 90, 10))
+            rooms = [Room(pk=pk, capacity=rng.randrange(10, 40)) for pk in range(60)]
+            for func, args in ((find_conflicts, (slots,)), (assign_rooms, (slots, rooms))):
+                CountedSlot.reads = 0
+                func(*args)
+                reads[(func.__name__, size)] = CountedSlot.reads
+        for name in ('find_conflicts', 'assign_rooms'):
+            # Quadratic work would read sixteen times as much.
+            self.assertLess(reads[(name, 10000)], 5 * reads[(name, 2500)], name)
+
+    def test_overlapping(self):
+        """Active sessions sharing room, teacher or course and overlapping in time."""
+        course, other = make_course(), make_course()
+        room = Room.objects.create(name='101', capacity=20)
+        teacher = Teacher.objects.create(
+            fname='Bat', lname='Dorj', register='AA00000000', phone='99110000',
+            birthday=datetime.date(1990, 1, 1), hourly_wage=10000)
+
+        def session(course, start, end, save=True, **kwargs):
+            """Monday session, saved unless told otherwise."""
+            session = CourseSession(
+                course=course, weekday=1, mshift=FIRST_SHIFT,
+                start_time=datetime.time(*start), end_time=datetime.time(*end), **kwargs)
+            if save:
+                session.save()
+            return session
+
+        first = session(course, (9, 0), (10, 30), room=room, teacher=teacher)
+        by_room = session(other, (10, 30), (12, 0), room=room)
+        by_teacher = session(other, (12, 0), (13, 0), teacher=teacher)
+        session(other, (8, 0), (9, 30), teacher=teacher, flag=False)
+
+        self.assertFalse(overlapping(first).exists())
+        self.assertFalse(overlapping(session(other, (8, 0), (9, 0), False, room=room, teacher=teacher)).exists())
+        self.assertEqual(list(overlapping(session(other, (8, 0), (9, 1), False, teacher=teacher))), [first])
+        self.assertEqual(list(overlapping(session(course, (10, 30), (11, 0), False))), [])
+        self.assertEqual(
+            list(overlapping(session(other, (10, 0), (12, 30), False, room=room, teacher=teacher)).order_by('start_time')),
+            [first, by_room, by_teacher])
+        self.assertEqual(list(overlapping(session(course, (10, 0), (11, 0), False))), [first])
+
+    def test_form_shift(self):
+        """Shift of a session is taken from its start time."""
+        course = make_course()
+        cache.clear()
+        data = {'course': course.pk, 'weekday': 1, 'start_time': '13:30', 'end_time': '15:00'}
+        form = CourseSessionForm(data=data)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().mshift, FIRST_SHIFT)
+        form = CourseSessionForm(data=dict(data, weekday=2, start_time='14:00', end_time='15:30'))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().mshift, SECOND_SHIFT)
+
+
+class JobTests(TestCase):
+    """Claiming, retrying and requeueing jobs of a01.jobs."""
+
+    def test_claim(self):
+        """Oldest due job is claimed once, future ones wait."""
+        later = enqueue('export', max_attempts=2)
+        first = enqueue('export')
+        Job.objects.filter(pk=later.pk).update(run_at=timezone.now() + datetime.timedelta(hours=1))
+        Job.objects.filter(pk=first.pk).update(run_at=timezone.now() - datetime.timedelta(minutes=1))
+
+        job = claim('worker-1')
+        self.assertEqual(job.pk, first.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker), (JOB_RUNNING, 1, 'worker-1'))
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNone(claim('worker-2'))
+
+    def test_fail(self):
+        """Failed job is retried with growing delay until out of attempts."""
+        enqueue('export', max_attempts=2)
+        job = claim('worker')
+        before = timezone.now()
+        fail(job, 'boom')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (JOB_QUEUED, 'boom'))
+        self.assertGreaterEqual(job.run_at, before + datetime.timedelta(seconds=RETRY_DELAY))
+        self.assertIsNone(claim('worker'))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job = claim('worker')
+        self.assertEqual(job.attempts, 2)
+        fail(job, 'boom again')
+        job.refresh_from_db()
+        self.assertEqual(job.status, JOB_FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_fail_without_retry(self):
+        """retry=False fails the job on first attempt."""
+        enqueue('export')
+        job = claim('worker')
+        fail(job, 'bad params', retry=False)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JOB_FAILED)
+
+    def test_requeue_stale(self):
+        """Silent running jobs are queued again, ones out of attempts fail."""
+        enqueue('export')
+        enqueue('export', max_attempts=1)
+        enqueue('export')
+        stale, dead, alive = claim('a'), claim('b'), claim('c')
+        old = timezone.now() - datetime.timedelta(hours=1)
+        Job.objects.filter(pk__in=[stale.pk, dead.pk]).update(updated_at=old)
+
+        self.assertEqual(requeue_stale(timeout=60), 1)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {stale.pk: JOB_QUEUED, dead.pk: JOB_FAILED, alive.pk: JOB_RUNNING})
+
+    def test_heartbeat(self):
+        """Job is touched while its task runs, and not after."""
+        touched = threading.Event()
+
+        def slow(job):
+            """Wait for the first heartbeat."""
+            return touched.wait(5)
+
+        autodiscover()
+        enqueue('slow')
+        job = claim('worker')
+        with mock.patch.dict(TASKS, {'slow': slow}), \
+                mock.patch('a01.jobs.HEARTBEAT_INTERVAL', 0.01), \
+                mock.patch('a01.jobs.touch', side_effect=lambda job: touched.set()) as touch:
+            run_job(job)
+            calls = touch.call_count
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (JOB_DONE, True))
+        self.assertGreaterEqual(calls, 1)
+        self.assertEqual(touch.call_count, calls)
+
+
+class RowCacheTests(TestCase):
+    """rowcache template tag."""
+
+    def setUp(self):
+        """Three courses and an empty cache."""
+        cache.clear()
+        self.courses = [Course(pk=pk, info='course %d' % pk) for pk in range(1, 4)]
+        self.template = Template(
+            '{% load a01_cache %}{% for each in courses %}'
+            '{% rowcache "test" each in courses "a01.CourseType" %}{{ each.info }},{% endrowcache %}'
+            '{% endfor %}')
+
+    def render(self):
+        """Rendered courses and number of cache reads of rows."""
+        with mock.patch('a01.templatetags.a01_cache.cache', wraps=cache) as spy:
+            html = self.template.render(Context({'courses': self.courses}))
+        return html, spy.get_many.call_count, spy.get.call_count
+
+    def test_get_many(self):
+        """Rows of a loop are read with one get_many, changed rows are rendered again."""
+        self.assertEqual(self.render(), ('course 1,course 2,course 3,', 1, 0))
+        self.courses[1].info = 'changed'
+        self.assertEqual(self.render(), ('course 1,course 2,course 3,', 1, 0))
+        bump_model_versions(CourseType)
+        self.assertEqual(self.render()[0], 'course 1,changed,course 3,')
+
+
+class CacheCheckTests(TestCase):
+    """System check of a shared cache."""
+
+    @override_settings(DEBUG=False)
+    def test_shared_cache(self):
+        """Local memory cache is reported outside development, memcached is not."""
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache'}}
+        with self.settings(CACHES=local):
+            self.assertEqual([each.id for each in check_shared_cache(None)], ['a01.W001'])
+            with self.settings(DEBUG=True):
+                self.assertEqual(check_shared_cache(None), [])
+        with self.settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class ReplicaSettingsTests(TestCase):
+    """Which replica alias counts as a separate database."""
+
+    def test_replica_enabled(self):
+        """Test mirror or copy of default settings is not a replica, another server is."""
+        self.assertFalse(db_routers.replica_enabled())
+        servers = {
+            DEFAULT_DB_ALIAS: ('postgresql', 'db1', '', 'absolute'),
+            db_routers.REPLICA_DB_ALIAS: ('postgresql', 'db2', '', 'absolute'),
+        }
+        with override_settings(DATABASES=dict((alias, {}) for alias in servers)):
+            with mock.patch.object(db_routers, '_server', side_effect=servers.get):
+                self.assertTrue(db_routers.replica_enabled())
+            servers[db_routers.REPLICA_DB_ALIAS] = servers[DEFAULT_DB_ALIAS]
+            with mock.patch.object(db_routers, '_server', side_effect=servers.get):
+                self.assertFalse(db_routers.replica_enabled())
+
+    def test_replica_current(self):
+        """Changes up to the measured horizon are on the replica."""
+        now = timezone.now()
+        second = datetime.timedelta(seconds=1)
+        self.assertTrue(db_routers.replica_current(None))
+        with mock.patch.object(db_routers, 'replica_horizon', return_value=now):
+            self.assertTrue(db_routers.replica_current(now - second))
+            self.assertFalse(db_routers.replica_current(now + second))
+        with mock.patch.object(db_routers, 'replica_horizon', return_value=None):
+            self.assertFalse(db_routers.replica_current(now - second))
+
+
+@override_settings(DATABASE_ROUTERS=['absolute.db_routers.ReplicaRouter'])
+class ReplicaRoutingTests(TestCase):
+    """ReplicaRoutingMiddleware and ReplicaRouter, replica taken as enabled but never connected."""
+
+    def setUp(self):
+        """Middleware and a fresh session."""
+        patcher = mock.patch.object(db_routers, 'replica_enabled', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = ReplicaRoutingMiddleware()
+        self.factory = RequestFactory()
+        self.session = SessionStore()
+
+    def tearDown(self):
+        """Leave thread on default."""
+        db_routers.reset()
+
+    def start(self, method, view):
+        """Request of method to view with middleware hooks up to the view run."""
+        request = getattr(self.factory, method)('/a01/contract/')
+        request.session = self.session
+        self.middleware.process_request(request)
+        self.middleware.process_view(request, view.as_view(), (), {})
+        return request
+
+    def test_reads_of_replica_views(self):
+        """GET and HEAD of use_replica views read a01 models from the replica."""
+        for method in ('get', 'head'):
+            request = self.start(method, ContractListView)
+            self.assertEqual(router.db_for_read(Contract), db_routers.REPLICA_DB_ALIAS)
+            self.middleware.process_response(request, HttpResponse())
+            self.assertEqual(router.db_for_read(Contract), DEFAULT_DB_ALIAS)
+
+    def test_other_views_and_methods(self):
+        """POST and views without use_replica stay on default."""
+        request = self.start('post', ContractListView)
+        self.assertEqual(router.db_for_read(Contract), DEFAULT_DB_ALIAS)
+        self.middleware.process_response(request, HttpResponse())
+        request = self.start('get', ContractAddView)
+        self.assertEqual(router.db_for_read(Contract), DEFAULT_DB_ALIAS)
+        self.middleware.process_response(request, HttpResponse())
+
+    def test_writes_and_auth(self):
+        """Writes, auth and sessions use default while reading from replica."""
+        request = self.start('get', ContractListView)
+        self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_read(Session), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_write(Contract), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate(db_routers.REPLICA_DB_ALIAS, 'a01'))
+        self.middleware.process_response(request, HttpResponse())
+
+    def test_sticky_after_write(self):
+        """After a write the session reads from default, also on replica views."""
+        request = self.start('get', ContractListView)
+        self.middleware.process_response(request, HttpResponse())
+        self.assertNotIn(ReplicaRoutingMiddleware.session_key, self.session)
+
+        request = self.start('post', ContractAddView)
+        router.db_for_write(Contract)
+        self.middleware.process_response(request, HttpResponse())
+        self.assertIn(ReplicaRoutingMiddleware.session_key, self.session)
+
+        request = self.start('get', ContractListView)
+        self.assertEqual(router.db_for_read(Contract), DEFAULT_DB_ALIAS)
+        self.middleware.process_response(request, HttpResponse())
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_sticky_expires(self):
+        """With REPLICA_STICKY_SECONDS the session goes back to the replica."""
+        self.middleware = ReplicaRoutingMiddleware()
+        self.session[ReplicaRoutingMiddleware.session_key] = 0
+        request = self.start('get', ContractListView)
+        self.assertEqual(router.db_for_read(Contract), db_routers.REPLICA_DB_ALIAS)
+        self.middleware.process_response(request, HttpResponse())
+
+    def test_use_replica_block(self):
+        """use_replica() routes reads inside the block only."""
+        with db_routers.use_replica():
+            self.assertEqual(router.db_for_read(Contract), db_routers.REPLICA_DB_ALIAS)
+        self.assertEqual(router.db_for_read(Contract), DEFAULT_DB_ALIAS)
+
+    def test_row_cache_on_replica(self):
+        """Rows rendered from a lagging replica are not cached, from default or a current replica they are."""
+        cache.clear()
+        template = Template('{% load a01_cache %}{% rowcache "test" course %}{{ course.info }}{% endrowcache %}')
+        course = Course(pk=1, info='first')
+
+        def render(info):
+            """Render course with info."""
+            course.info = info
+            return template.render(Context({'course': course}))
+
+        bump_model_versions(Course)
+        with db_routers.use_replica(), mock.patch.object(db_routers, 'replica_horizon', return_value=None):
+            self.assertEqual(render('first'), 'first')
+        self.assertEqual(render('second'), 'second')
+        self.assertEqual(render('third'), 'second')
+
+        bump_model_versions(Course)
+        horizon = timezone.now() + datetime.timedelta(seconds=1)
+        with db_routers.use_replica(), mock.patch.object(db_routers, 'replica_horizon', return_value=horizon):
+            self.assertEqual(render('fourth'), 'fourth')
+        self.assertEqual(render('fifth'), 'fourth')
 
-# Create your tests here.
+    def test_validators_on_replica(self):
+        """Pages read from replica have ETag and Last-Modified once it replayed their last change."""
+        conditions = data_conditions('a01.Contract')
+        request = self.factory.get('/a01/contract/')
+        request.user = AnonymousUser()
+        bump_model_versions(Contract)
+        modified = models_modified(['a01.contract'])
+        for horizon, validators in ((None, False), (modified - datetime.timedelta(seconds=1), False), (modified, True)):
+            with db_routers.use_replica(), mock.patch.object(db_routers, 'replica_horizon', return_value=horizon):
+                self.assertEqual(bool(conditions['etag_func'](request)), validators, horizon)
+                self.assertEqual(bool(conditions['last_modified_func'](request)), validators, horizon)
+        self.assertTrue(conditions['etag_func'](request))
@@ -0,0 +1,203 @@
+"""
+Weekly timetable of app a01: conflicts of sessions and room assignment.
+
+A term's timetable is a few thousand CourseSession rows at most, so it is
+loaded once as Slot tuples and checked in memory. Times are minutes since
+midnight and sessions are half open [start, end), back to back ones do not
+overlap. The database enforces the same rule for rooms and teachers with
+exclusion constraints (migration 0010); these functions find the existing
+clashes of a whole term at once and suggest rooms before anything is saved.
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from a01.caches import bump_model_versions
+from a01.models import CourseSession
+
+
+Slot = namedtuple('Slot', 'pk course_id teacher_id room_id weekday start end size')
+
+Conflict = namedtuple('Conflict', 'kind resource_id weekday first second')
+
+# Slot attribute of each resource a session occupies. Two sessions of one
+# course overlapping means its students are in two places.
+RESOURCES = (
+    ('room', 'room_id'),
+    ('teacher', 'teacher_id'),
+    ('course', 'course_id'),
+)
+
+
+def minutes(value):
+    """Minutes since midnight of time value."""
+    return value.hour * 60 + value.minute
+
+
+def active_sessions():
+    """Active sessions of active courses."""
+    return CourseSession.objects.filter(flag=True, course__flag=True)
+
+
+def load_slots(queryset):
+    """Slots of sessions of queryset, one query."""
+    rows = queryset.values_list(
+        'pk', 'course_id', 'teacher_id', 'room_id', 'weekday', 'start_time', 'end_time', 'course__enrollment_count')
+    return [
+        Slot(pk, course_id, teacher_id, room_id, weekday, minutes(start), minutes(end), size)
+        for pk, course_id, teacher_id, room_id, weekday, start, end, size in rows
+    ]
+
+
+def session_slot(session):
+    """Slot of loaded session, course must be joined."""
+    return Slot(
+        session.pk, session.course_id, session.teacher_id, session.room_id, session.weekday,
+        minutes(session.start_time), minutes(session.end_time), session.course.enrollment_count,
+    )
+
+
+def find_conflicts(slots):
+    """
+    Conflicts of overlapping slots sharing a room, teacher or course.
+
+    Slots of each resource and weekday are swept in start order keeping a
+    heap of the ones still running, so every slot is compared only with
+    slots it overlaps: O(n log n + conflicts). first starts no later than
+    second.
+    """
+    conflicts = []
+    for kind, attr in RESOURCES:
+        groups = defaultdict(list)
+        for slot in slots:
+            resource_id = getattr(slot, attr)
+            if resource_id is not None:
+                groups[(resource_id, slot.weekday)].append(slot)
+
+        for (resource_id, weekday), group in sorted(groups.items()):
+            group.sort(key=lambda slot: (slot.start, slot.end, slot.pk))
+            running = []
+            for slot in group:
+                while running and running[0][0] <= slot.start:
+                    heapq.heappop(running)
+                for end, pk, other in sorted(running, key=lambda each: (each[2].start, each[1])):
+                    conflicts.append(Conflict(kind, resource_id, weekday, other, slot))
+                heapq.heappush(running, (slot.end, slot.pk, slot))
+    return conflicts
+
+
+def assign_rooms(slots, rooms):
+    """
+    Suggest rooms of slots without one, returns ({slot pk: room pk}, [slot pk]).
+
+    Greedy coloring of the interval graph of each weekday: slots are taken
+    in start order and get the smallest free room that seats the course and
+    is not booked by a slot that already has a room. With rooms of one size
+    and nothing booked this needs only as many rooms as sessions running at
+    once, the fewest possible. Slots no room fits are in the second list.
+    rooms is an iterable of Room.
+    """
+    rooms = sorted(rooms, key=lambda room: (room.capacity, room.pk))
+    booked = defaultdict(list)
+    for slot in slots:
+        if slot.room_id is not None:
+            booked[(slot.room_id, slot.weekday)].append((slot.start, slot.end))
+    # Starts of fixed bookings and the latest end among them so far, the
+    # bookings starting before a slot ends overlap it when that end is later
+    # than the slot's start.
+    for key, intervals in booked.items():
+        intervals.sort()
+        latest = []
+        for start, end in intervals:
+            latest.append(max(end, latest[-1]) if latest else end)
+        booked[key] = ([start for start, end in intervals], latest)
+
+    def is_booked(room_pk, slot):
+        """Slot overlaps a fixed booking of room."""
+        if (room_pk, slot.weekday) not in booked:
+            return False
+        starts, latest = booked[(room_pk, slot.weekday)]
+        i = bisect_left(starts, slot.end)
+        return i > 0 and latest[i - 1] > slot.start
+
+    assigned = {}
+    unassigned = []
+    pending = sorted(
+        (slot for slot in slots if slot.room_id is None),
+        key=lambda slot: (slot.weekday, slot.start, slot.end, slot.pk),
+    )
+    weekday = None
+    for slot in pending:
+        if slot.weekday != weekday:
+            weekday = slot.weekday
+            busy = []
+            taken = set()
+        while busy and busy[0][0] <= slot.start:
+            taken.discard(heapq.heappop(busy)[1])
+
+        for room in rooms:
+            if room.pk in taken or room.capacity < (slot.size or 0) or is_booked(room.pk, slot):
+                continue
+            assigned[slot.pk] = room.pk
+            taken.add(room.pk)
+            heapq.heappush(busy, (slot.end, room.pk))
+            break
+        else:
+            unassigned.append(slot.pk)
+    return assigned, unassigned
+
+
+def overlapping(session, queryset=None):
+    """
+    Active sessions sharing room, teacher or course with session and
+    overlapping it, other than session itself.
+    """
+    if queryset is None:
+        queryset = CourseSession.objects.filter(flag=True)
+    shared = Q(course=session.course_id)
+    if session.room_id is not None:
+        shared |= Q(room=session.room_id)
+    if session.teacher_id is not None:
+        shared |= Q(teacher=session.teacher_id)
+    queryset = queryset.filter(
+        shared,
+        weekday=session.weekday,
+        start_time__lt=session.end_time,
+        end_time__gt=session.start_time,
+    )
+    if session.pk is not None:
+        queryset = queryset.exclude(pk=session.pk)
+    return queryset
+
+
+def save_rooms(assigned):
+    """
+    Store rooms suggested by assign_rooms, one UPDATE per room.
+
+    Sessions given a room meanwhile keep it. Returns number of updated
+    sessions; an IntegrityError means another request booked the room first.
+    """
+    sessions = defaultdict(list)
+    for session_pk, room_pk in assigned.items():
+        sessions[room_pk].append(session_pk)
+    updated = 0
+    with transaction.atomic():
+        for room_pk, pks in sorted(sessions.items()):
+            updated += CourseSession.objects.filter(pk__any=pks, room=None).update(room=room_pk, updated_at=timezone.now())
+        if updated:
+            bump_model_versions(CourseSession)
+    return updated
+
+
+def release_sessions(course_ids):
+    """Deactivate sessions of courses course_ids, their rooms and teachers are free again."""
+    updated = CourseSession.objects.filter(course__in=course_ids, flag=True).update(flag=False, updated_at=timezone.now())
+    if updated:
+        bump_model_versions(CourseSession)
+    return updated
@@ -6,6 +6,7 @@ from .views import StudentDetailView
 from .views import StudentAddView
 from .views import StudentEditView
 from .views import StudentDeleteView
+from .views import StudentBulkView
 
 from .views import CourseTypeListView
 from .views import CourseTypeAddView
@@ -16,15 +17,20 @@ from .views import CourseListView
 from .views import CourseAddView
 from .views import CourseEditView
 from .views import CourseDeleteView
+from .views import CourseBulkView
 from .views import CourseDetailView
 
 from .views import ContractListView
 from .views import ContractAddView
 from .views import ContractPaymentView
 from .views import ContractDeleteView
+from .views import ContractBulkView
 from .views import ContractDetailView
 from .views import ContractClassChangeView
 from .views import ContractFromStudentView
+from .views import DebtorListView
+from .views import ContractImportView
+from .views import ContractExportView
 
 from .views import TeacherListView
 from .views import TeacherAddView
@@ -33,11 +39,15 @@ from .views import TeacherDeleteView
 from .views import TeacherDetailView
 from .views import TeacherSalaryCalculatorView
 from .views import TeacherSalaryDetailView
+from .views import SalaryExportView
 
 from .views import TransactionListView
 from .views import TransactionAddView
 from .views import TransactionEditView
 from .views import TransactionDeleteView
+from .views import TransactionBulkView
+from .views import TransactionExportView
+from .views import ProfitLossView
 
 from .views import StudentLevelListView
 from .views import StudentLevelAddView
@@ -54,6 +64,28 @@ from .views import WorkerDetailView
 from .views import WorkerSalaryCalculatorView
 from .views import WorkerSalaryDetailView
 
+from .views import JobListView
+from .views import JobDetailView
+from .views import JobStatusView
+from .views import JobFileView
+
+from .views import RoomListView
+from .views import RoomAddView
+from .views import RoomEditView
+from .views import RoomDeleteView
+from .views import TimetableView
+from .views import TimetableAssignView
+from .views import CourseSessionAddView
+from .views import CourseSessionEditView
+from .views import CourseSessionDeleteView
+
+from .api import StudentApiView
+from .api import StudentProfileApiView
+from .api import CourseApiView
+from .api import ContractApiView
+from .api import TransactionApiView
+from .api import SalaryApiView
+
 
 urlpatterns = [
     url(r'^student/$', StudentView.as_view(), name='student'),
@@ -61,6 +93,7 @@ urlpatterns = [
     url(r'^student/add/$', StudentAddView.as_view(), name='student_add'),
     url(r'^student/edit/(?P<id>[0-9]+)/$', StudentEditView.as_view(), name='student_edit'),
     url(r'^student/delete/(?P<pk>[0-9]+)/$', StudentDeleteView.as_view(), name='student_delete'),
+    url(r'^student/bulk/$', StudentBulkView.as_view(), name='student_bulk'),
     url(r'^student/contract/(?P<id>[0-9]+)/$', ContractFromStudentView.as_view(), name='student_contract'),
 
     url(r'^course_type/$', CourseTypeListView.as_view(), name='course_type'),
@@ -72,14 +105,19 @@ urlpatterns = [
     url(r'^course/add/$', CourseAddView.as_view(), name='course_add'),
     url(r'^course/edit/(?P<id>[0-9]+)/$', CourseEditView.as_view(), name='course_edit'),
     url(r'^course/delete/(?P<pk>[0-9]+)/$', CourseDeleteView.as_view(), name='course_delete'),
+    url(r'^course/bulk/$', CourseBulkView.as_view(), name='course_bulk'),
     url(r'^course/(?P<id>[0-9]+)/$', CourseDetailView.as_view(), name='course_detail'),
 
     url(r'^contract/$', ContractListView.as_view(), name='contract'),
     url(r'^contract/add/$', ContractAddView.as_view(), name='contract_add'),
     url(r'^contract/payment/(?P<id>[0-9]+)/$', ContractPaymentView.as_view(), name='contract_payment'),
     url(r'^contract/delete/(?P<pk>[0-9]+)/$', ContractDeleteView.as_view(), name='contract_delete'),
+    url(r'^contract/bulk/$', ContractBulkView.as_view(), name='contract_bulk'),
     url(r'^contract/(?P<id>[0-9]+)/$', ContractDetailView.as_view(), name='contract_detail'),
     url(r'^contract/change/(?P<id>[0-9]+)/$', ContractClassChangeView.as_view(), name='contract_change'),
+    url(r'^contract/debtors/$', DebtorListView.as_view(), name='debtor'),
+    url(r'^contract/import/$', ContractImportView.as_view(), name='contract_import'),
+    url(r'^contract/export/$', ContractExportView.as_view(), name='contract_export'),
 
     url(r'^teacher/$', TeacherListView.as_view(), name='teacher'),
     url(r'^teacher/(?P<id>[0-9]+)/$', TeacherDetailView.as_view(), name='teacher_detail'),
@@ -89,12 +127,16 @@ urlpatterns = [
 
     url(r'^teacher/salary/$', TeacherSalaryCalculatorView.as_view(), name='teacher_salary'),
     url(r'^teacher/salary/detail/$', TeacherSalaryDetailView.as_view(), name='teacher_salary_detail'),
+    url(r'^teacher/salary/export/$', SalaryExportView.as_view(), name='salary_export'),
 
     url(r'^transaction/$', TransactionListView.as_view(), name='transaction'),
     url(r'^transaction/add/$', TransactionAddView.as_view(), name='transaction_add'),
     url(r'^transaction/edit/(?P<id>[0-9]+)/$', TransactionEditView.as_view(), name='transaction_edit'),
     url(r'^transaction/delete/(?P<pk>[0-9]+)/$', TransactionDeleteView.as_view(), name='transaction_delete'),
     url(r'^transaction/verify/(?P<pk>[0-9]+)/$', TransactionVerifyView.as_view(), name='transaction_verify'),
+    url(r'^transaction/bulk/$', TransactionBulkView.as_view(), name='transaction_bulk'),
+    url(r'^transaction/export/$', TransactionExportView.as_view(), name='transaction_export'),
+    url(r'^report/pnl/$', ProfitLossView.as_view(), name='profit_loss'),
 
 
     url(r'^student_level/$', StudentLevelListView.as_view(), name='student_level'),
@@ -111,4 +153,32 @@ urlpatterns = [
     url(r'^worker/calculator/$', WorkerSalaryCalculatorView.as_view(), name='worker_calculator'),
     url(r'^worker/salary/detail/$', WorkerSalaryDetailView.as_view(), name='worker_salary_detail'),
 
+    url(r'^job/$', JobListView.as_view(), name='job'),
+    url(r'^job/(?P<id>[0-9]+)/$', JobDetailView.as_view(), name='job_detail'),
+    url(r'^job/(?P<id>[0-9]+)/status/$', JobStatusView.as_view(), name='job_status'),
+    url(r'^job/(?P<id>[0-9]+)/file/$', JobFileView.as_view(), name='job_file'),
+
+    url(r'^room/$', RoomListView.as_view(), name='room'),
+    url(r'^room/add/$', RoomAddView.as_view(), name='room_add'),
+    url(r'^room/edit/(?P<id>[0-9]+)/$', RoomEditView.as_view(), name='room_edit'),
+    url(r'^room/delete/(?P<pk>[0-9]+)/$', RoomDeleteView.as_view(), name='room_delete'),
+
+    url(r'^timetable/$', TimetableView.as_view(), name='timetable'),
+    url(r'^timetable/assign/$', TimetableAssignView.as_view(), name='timetable_assign'),
+    url(r'^course_session/add/$', CourseSessionAddView.as_view(), name='course_session_add'),
+    url(r'^course_session/edit/(?P<id>[0-9]+)/$', CourseSessionEditView.as_view(), name='course_session_edit'),
+    url(r'^course_session/delete/(?P<pk>[0-9]+)/$', CourseSessionDeleteView.as_view(), name='course_session_delete'),
+
+    url(r'^api/students/$', StudentApiView.as_view(), name='api_students'),
+    url(r'^api/students/(?P<pk>[0-9]+)/$', StudentApiView.as_view(), name='api_student'),
+    url(r'^api/students/(?P<pk>[0-9]+)/profile/$', StudentProfileApiView.as_view(), name='api_student_profile'),
+    url(r'^api/courses/$', CourseApiView.as_view(), name='api_courses'),
+    url(r'^api/courses/(?P<pk>[0-9]+)/$', CourseApiView.as_view(), name='api_course'),
+    url(r'^api/contracts/$', ContractApiView.as_view(), name='api_contracts'),
+    url(r'^api/contracts/(?P<pk>[0-9]+)/$', ContractApiView.as_view(), name='api_contract'),
+    url(r'^api/transactions/$', TransactionApiView.as_view(), name='api_transactions'),
+    url(r'^api/transactions/(?P<pk>[0-9]+)/$', TransactionApiView.as_view(), name='api_transaction'),
+    url(r'^api/salaries/$', SalaryApiView.as_view(), name='api_salaries'),
+    url(r'^api/salaries/(?P<pk>[0-9]+)/$', SalaryApiView.as_view(), name='api_salary'),
+
 ]
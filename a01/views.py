@@ -2,14 +2,18 @@
 
 import datetime
 
+from django.http import FileResponse
 from django.http import Http404
 from django.http import HttpResponseRedirect
+from django.http import JsonResponse
 from django.db import IntegrityError, transaction
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
 from django.core.paginator import EmptyPage
 from django.core.paginator import PageNotAnInteger
 from django.views.generic import ListView
 from django.views.generic import TemplateView
+from django.views.generic import View
 
 from django.views.generic.edit import FormView
 from django.views.generic.edit import UpdateView
@@ -18,11 +22,15 @@ from django.views.generic.edit import DeleteView
 from django.shortcuts import redirect
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.urls import reverse
+from django.utils.http import is_safe_url
 
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.core.files.storage import default_storage
 
 from a01.models import Student
 from a01.models import CourseType
@@ -35,18 +43,22 @@ from a01.models import TeacherSalary
 from a01.models import Transaction
 from a01.models import StudentLevel
 from a01.models import Worker
+from a01.models import Job
+from a01.models import Room
+from a01.models import CourseSession
 
-from a01.choices import CONTRACT_INCOME
 from a01.choices import CLASS_CHANGE_INCOME
-from a01.choices import SALARY_EXPENSE
 from a01.choices import NON_FREE
 from a01.choices import FREE
+from a01.choices import JOB_DONE
+from a01.choices import JOB_FAILED
 
 from a01.forms import CourseTypeForm
 from a01.forms import CourseForm
 from a01.forms import ContractForm
 from a01.forms import ContractPaymentForm
 from a01.forms import ContractClassChangeForm
+from a01.forms import ContractUploadForm
 from a01.forms import TeacherForm
 from a01.forms import TeacherCourseFormSet
 from a01.forms import TeacherSalaryFormSet
@@ -58,6 +70,8 @@ from a01.forms import StudentForm
 from a01.forms import StudentNoLevelForm
 from a01.forms import WorkerForm
 from a01.forms import WorkerSalaryFormSet
+from a01.forms import RoomForm
+from a01.forms import CourseSessionForm
 
 from a01.forms import CourseFilter
 from a01.forms import ContractFilter
@@ -65,6 +79,35 @@ from a01.forms import StudentFilter
 from a01.forms import SalaryFilter
 from a01.forms import TransactionFilter
 from a01.forms import StudentLevelFilter
+from a01.forms import CourseSessionFilter
+
+from a01.exports import CsvExportView
+from a01.exports import CONTRACT_COLUMNS
+from a01.exports import SALARY_COLUMNS
+from a01.exports import TRANSACTION_COLUMNS
+from a01.jobs import enqueue
+from a01.conditional import data_conditions
+from a01.pagination import KeysetPaginationMixin
+from a01.reports import profit_loss
+from a01.reports import transaction_summary
+from a01.services import change_course_counters
+from a01.services import create_contract
+from a01.services import enroll
+from a01.services import Payment
+from a01.services import post_payments
+from a01.services import set_contract_flags
+from a01.services import set_course_flags
+from a01.services import set_flags
+from a01.services import set_transaction_flags
+from a01.services import student_profile
+from a01.services import unenroll
+from a01.services import verify_transactions
+from a01.timetable import active_sessions
+from a01.timetable import assign_rooms
+from a01.timetable import find_conflicts
+from a01.timetable import load_slots
+from a01.timetable import save_rooms
+from a01.timetable import session_slot
 
 
 class CustomDeleteView(DeleteView):
@@ -91,6 +134,64 @@ class CustomDeleteView(DeleteView):
         return HttpResponseRedirect(success_url)
 
 
+class BulkActionView(PermissionRequiredMixin, View):
+    """
+    Apply action picked on a list to its checked rows, POST only.
+
+    Form posts action, ids of checked rows and next, the list url to go
+    back to. Each action is a method <action>_rows(ids) returning number of
+    rows it changed, reported back as a message.
+    """
+
+    model = None
+    success_url = None
+    max_rows = 1000
+    labels = {
+        'delete': 'Устгасан',
+        'restore': 'Сэргээсэн',
+    }
+
+    def delete_rows(self, ids):
+        """Soft delete rows."""
+        return set_flags(self.model, ids, False)
+
+    def restore_rows(self, ids):
+        """Undo soft delete of rows."""
+        return set_flags(self.model, ids, True)
+
+    def get_ids(self):
+        """Checked pks, at most max_rows of them."""
+        ids = []
+        for each in self.request.POST.getlist('ids'):
+            if each.isdigit():
+                ids.append(int(each))
+        return sorted(set(ids))[:self.max_rows]
+
+    def get_success_url(self):
+        """List the form was posted from, with its filters and cursor."""
+        url = self.request.POST.get('next')
+        if url and is_safe_url(url, allowed_hosts={self.request.get_host()}):
+            return url
+        return self.success_url
+
+    def post(self, request, *args, **kwargs):
+        """Run action and report number of changed rows."""
+        action = request.POST.get('action')
+        if action not in self.labels:
+            raise Http404
+        ids = self.get_ids()
+        if not ids:
+            messages.warning(request, 'Мөр сонгоогүй байна.')
+            return HttpResponseRedirect(self.get_success_url())
+
+        changed = getattr(self, action + '_rows')(ids)
+        message = '%s: %d мөр.' % (self.labels[action], changed)
+        if changed < len(ids):
+            message += ' Өөрчлөгдөөгүй: %d мөр.' % (len(ids) - changed)
+        messages.success(request, message)
+        return HttpResponseRedirect(self.get_success_url())
+
+
 class FilterMixin(object):
     """Overrided method to filter."""
 
@@ -122,33 +223,47 @@ class FilterMixin(object):
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.Student', 'a01.Class', 'a01.Course', 'a01.CourseType', 'a01.Contract', 'a01.Transaction', 'a01.StudentLevel')), name='get')
 class StudentDetailView(PermissionRequiredMixin, TemplateView):
-    """Detailed information of Student."""
+    """Student with classes, contracts, payments and level history."""
 
     permission_required = 'a01.s_composer'
+    use_replica = True
     template_name = 'a01/student_detail.html'
+    query_budget = 8
 
     def get_context_data(self, **kwargs):
         """Function for context."""
         context = super(StudentDetailView, self).get_context_data(**kwargs)
-        stud = get_object_or_404(Student, pk=kwargs.get('id'))
+        stud = student_profile(Student.objects.all(), kwargs.get('id'))
+        if stud is None:
+            raise Http404
         context['obj'] = stud
         context['classes'] = stud.sclasses.all()
+        context['contracts'] = stud.contract_set.all()
+        context['payments'] = stud.payments
+        context['levels'] = stud.levels.all()
+        context['totals'] = stud.totals
         return context
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
-class StudentView(PermissionRequiredMixin, TemplateView):
+@method_decorator(condition(**data_conditions('a01.Student')), name='get')
+class StudentView(PermissionRequiredMixin, KeysetPaginationMixin, TemplateView):
     """Display Student's data."""
 
     template_name = 'a01/student_list.html'
     permission_required = 'a01.s_composer'
+    use_replica = True
+    keyset_ordering = ('-id',)
+    query_budget = 8
 
     def get_context_data(self, **kwargs):
         """Context data."""
         context = super(StudentView, self).get_context_data(**kwargs)
         f = StudentFilter(self.request.GET, queryset=Student.objects.all())
         context['filter'] = f
+        context['page'] = self.paginate_keyset(f.qs)
 
         return context
 
@@ -218,6 +333,16 @@ class StudentDeleteView(PermissionRequiredMixin, CustomDeleteView):
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class StudentBulkView(BulkActionView):
+    """Bulk soft delete and restore of students."""
+
+    model = Student
+    success_url = '/a01/student/'
+    permission_required = 'a01.s_composer'
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.CourseType')), name='get')
 class CourseTypeListView(PermissionRequiredMixin, FilterMixin, ListView):
     """View list of course types."""
 
@@ -225,6 +350,7 @@ class CourseTypeListView(PermissionRequiredMixin, FilterMixin, ListView):
     model = CourseType
     context_object_name = 'ct_list'
     permission_required = 'a01.main'
+    use_replica = True
 
     allowed_filters = {
         'level': 'level__icontains',
@@ -302,17 +428,31 @@ class CourseTypeDeleteView(PermissionRequiredMixin, CustomDeleteView):
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
-class CourseListView(PermissionRequiredMixin, TemplateView):
+@method_decorator(condition(**data_conditions('a01.Course', 'a01.CourseType')), name='get')
+class CourseListView(PermissionRequiredMixin, KeysetPaginationMixin, TemplateView):
     """View list of courses."""
 
     template_name = 'a01/course_list.html'
     permission_required = 'a01.main'
+    use_replica = True
+    keyset_ordering = ('-start_date', '-id')
+    orderings = {
+        'enrollment': ('-enrollment_count', '-id'),
+        'contracts': ('-active_contract_count', '-id'),
+    }
+    query_budget = 8
+
+    def get_keyset_ordering(self, queryset):
+        """Sort by stored counters when asked with ?o=enrollment or ?o=contracts."""
+        return self.orderings.get(self.request.GET.get('o'), self.keyset_ordering)
 
     def get_context_data(self, **kwargs):
         """Context data."""
         context = super(CourseListView, self).get_context_data(**kwargs)
-        f = CourseFilter(self.request.GET, queryset=Course.objects.all())
+        f = CourseFilter(self.request.GET, queryset=Course.objects.select_related('ctype'))
         context['filter'] = f
+        context['o'] = self.request.GET.get('o', '')
+        context['page'] = self.paginate_keyset(f.qs)
 
         return context
 
@@ -392,7 +532,7 @@ class CourseEditView(PermissionRequiredMixin, UpdateView):
         """Context data."""
         context = super(CourseEditView, self).get_context_data(**kwargs)
         obj = get_object_or_404(Course, pk=self.kwargs.get('id'))
-        object_list = CourseTeachers.objects.filter(course=obj)
+        object_list = CourseTeachers.objects.filter(course=obj).select_related('teacher')
         initial_data = []
 
         for each in object_list:
@@ -452,42 +592,84 @@ class CourseDeleteView(PermissionRequiredMixin, CustomDeleteView):
         return context
 
 
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class CourseBulkView(BulkActionView):
+    """Bulk soft delete and restore of courses."""
+
+    model = Course
+    success_url = '/a01/course/'
+    permission_required = 'a01.main'
+
+    def delete_rows(self, ids):
+        """Soft delete courses."""
+        return set_course_flags(ids, False)
+
+    def restore_rows(self, ids):
+        """Undo soft delete of courses."""
+        return set_course_flags(ids, True)
+
+
+@method_decorator(condition(**data_conditions('a01.Course', 'a01.CourseType', 'a01.Contract', 'a01.Student', 'a01.CourseTeachers', 'a01.Teacher')), name='get')
 class CourseDetailView(PermissionRequiredMixin, TemplateView):
     """Detailed information of Contract."""
 
     template_name = 'a01/course_detail.html'
     permission_required = 'a01.main'
+    use_replica = True
 
     def get_context_data(self, **kwargs):
         """Function for context."""
         context = super(CourseDetailView, self).get_context_data(**kwargs)
         con = get_object_or_404(Course, pk=kwargs.get('id'))
 
-        contracts = Contract.objects.filter(course=con)
+        contracts = Contract.objects.filter(course=con).select_related('student')
 
-        classes = con.cclasses.all()
         teachers = con.cteachers.all()
         context['obj'] = con
         context['contracts'] = contracts
         context['teachers'] = teachers
-        context['total_student'] = classes.count()
+        context['total_student'] = con.enrollment_count
         return context
 
 ################################################################################
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
-class ContractListView(PermissionRequiredMixin, TemplateView):
+@method_decorator(condition(**data_conditions('a01.Contract', 'a01.Student', 'a01.Course', 'a01.CourseType')), name='get')
+class ContractListView(PermissionRequiredMixin, KeysetPaginationMixin, TemplateView):
     """View list of Contracts."""
 
     template_name = 'a01/contract_list.html'
     permission_required = 'a01.main'
+    use_replica = True
+    keyset_ordering = ('-date', '-id')
+    query_budget = 8
 
     def get_context_data(self, **kwargs):
         """Context data."""
         context = super(ContractListView, self).get_context_data(**kwargs)
-        f = ContractFilter(self.request.GET, queryset=Contract.objects.all())
+        f = ContractFilter(self.request.GET, queryset=Contract.objects.select_related('student', 'course__ctype'))
         context['filter'] = f
+        context['page'] = self.paginate_keyset(f.qs)
+
+        return context
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class DebtorListView(PermissionRequiredMixin, KeysetPaginationMixin, TemplateView):
+    """Active contracts with outstanding balance, largest and oldest first."""
+
+    template_name = 'a01/debtor_list.html'
+    permission_required = 'a01.main'
+    use_replica = True
+    keyset_ordering = ('-balance', 'date', 'id')
+    query_budget = 6
+
+    def get_context_data(self, **kwargs):
+        """Context data."""
+        context = super(DebtorListView, self).get_context_data(**kwargs)
+        contracts = Contract.objects.filter(flag=True, balance__gt=0).select_related('student', 'course__ctype')
+        context['page'] = self.paginate_keyset(contracts)
 
         return context
 
@@ -503,71 +685,38 @@ class ContractAddView(PermissionRequiredMixin, FormView):
 
     def form_valid(self, form):
         """Called after valid data."""
-        data = form.cleaned_data
-
-        fname = data['fname']
-        lname = data['lname']
-        register = data['register']
-        phone = data['phone']
-        birthday = data['birthday']
-        course = data['course']
-        payment = data['payment']
-        txn_method = data['txn_method']
-        minus_length = data['minus_length']
-        contract_number = data['contract_number']
-        off_percent = data['off_percent']
-        description = data['description']
-        con_date = data['con_date']
-
-        st = Student()
-        st.fname = fname
-        st.lname = lname
-        st.register = register
-        st.birthday = birthday
-        st.phone = phone
-        st.save()
+        create_contract(form.cleaned_data)
 
-        con = Contract()
-        con.contract_number = contract_number
-        con.date = con_date
-        con.student = st
-        con.course = course
-        con.minus_length = minus_length
-        con.total_payment = payment
-        con.off_percent = off_percent
-        con.description = description
-
-        total_price = course.price
-        hourly_price = course.hourly_price
+        return super(ContractAddView, self).form_valid(form)
 
-        real_length = course.ctype.length - minus_length
 
-        if 100 >= off_percent > 0:
-            off_price = total_price * off_percent / 100
-            total_price = total_price - off_price
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class ContractExportView(PermissionRequiredMixin, CsvExportView):
+    """CSV of contracts matching ContractFilter."""
 
-            hourly_price = round(total_price / course.ctype.length)
+    permission_required = 'a01.main'
+    filterset_class = ContractFilter
+    columns = CONTRACT_COLUMNS
+    ordering = ('date', 'id')
+    filename = 'contracts.csv'
+    export_name = 'contracts'
 
-        if minus_length == 0:
-            con.req_payment = total_price
-        else:
-            con.req_payment = hourly_price * real_length
-        con.save()
 
-        txn = Transaction()
-        txn.contract = con
-        txn.txn_type = CONTRACT_INCOME
-        txn.amount = payment
-        txn.txn_date = con_date
-        txn.txn_method = txn_method
-        txn.save()
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class ContractImportView(PermissionRequiredMixin, FormView):
+    """Bulk import of contracts from CSV or XLSX file."""
 
-        cls = Class()
-        cls.student = st
-        cls.course = course
-        cls.save()
+    template_name = 'a01/contract_import.html'
+    form_class = ContractUploadForm
+    permission_required = 'a01.main'
 
-        return super(ContractAddView, self).form_valid(form)
+    def form_valid(self, form):
+        """Save file and import it in background job, errors show on job page."""
+        upload = form.cleaned_data['file']
+        path = default_storage.save('jobs/uploads/%s' % upload.name, upload)
+        # Chunks already imported are committed, another attempt would repeat them.
+        job = enqueue('import_contracts', {'path': path, 'filename': upload.name}, user=self.request.user, max_attempts=1)
+        return HttpResponseRedirect(reverse('job_detail', kwargs={'id': job.pk}))
 
 
 class ContractPaymentView(PermissionRequiredMixin, FormView):
@@ -583,27 +732,18 @@ class ContractPaymentView(PermissionRequiredMixin, FormView):
         return {"txn_date": datetime.datetime.now()}
 
     def form_valid(self, form):
-        """Called after valid data."""
+        """Add payment to contract in the database, see post_payments."""
         data = form.cleaned_data
-        payment = data.get('payment', 0)
-        txn_date = data.get('txn_date')
-        txn_method = data.get('txn_method')
-        description = data.get('description')
-        con_id = self.kwargs.get('id')
-
-        con = get_object_or_404(Contract, pk=con_id)
-
-        txn = Transaction()
-        txn.contract = con
-        txn.txn_type = CONTRACT_INCOME
-        txn.amount = payment
-        txn.txn_date = txn_date
-        txn.txn_method = txn_method
-        txn.description = description
-        txn.save()
-
-        con.total_payment = con.total_payment + payment
-        con.save()
+        try:
+            post_payments([Payment(
+                contract_id=int(self.kwargs.get('id')),
+                amount=data.get('payment', 0),
+                txn_date=data.get('txn_date'),
+                txn_method=data.get('txn_method'),
+                info=data.get('description'),
+            )])
+        except Contract.DoesNotExist:
+            raise Http404
 
         return super(ContractPaymentView, self).form_valid(form)
 
@@ -631,19 +771,42 @@ class ContractDeleteView(PermissionRequiredMixin, CustomDeleteView):
         """
         self.object = self.get_object()
         success_url = self.get_success_url()
-        cls = Class.objects.filter(course=self.object.course, student=self.object.student).first()
-        cls.delete()
-        self.object.flag = False
-        self.object.save()
+        with transaction.atomic():
+            cls = Class.objects.filter(course=self.object.course, student=self.object.student).first()
+            if cls:
+                unenroll(Class.objects.filter(pk=cls.pk))
+            if self.object.flag:
+                change_course_counters(self.object.course, contracts=-1)
+            self.object.flag = False
+            self.object.save()
         return HttpResponseRedirect(success_url)
 
 
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class ContractBulkView(BulkActionView):
+    """Bulk soft delete and restore of contracts."""
+
+    model = Contract
+    success_url = '/a01/contract/'
+    permission_required = 'a01.main'
+
+    def delete_rows(self, ids):
+        """Soft delete contracts, students leave their classes."""
+        return set_contract_flags(ids, False)
+
+    def restore_rows(self, ids):
+        """Undo soft delete of contracts, students return to their classes."""
+        return set_contract_flags(ids, True)
 
+
+
+@method_decorator(condition(**data_conditions('a01.Contract', 'a01.Student', 'a01.Course', 'a01.CourseType', 'a01.Transaction')), name='get')
 class ContractDetailView(PermissionRequiredMixin, TemplateView):
     """Detailed information of Contract."""
 
     template_name = 'a01/contract_detail.html'
     permission_required = 'a01.main'
+    use_replica = True
 
     def get_context_data(self, **kwargs):
         """Function for context."""
@@ -691,11 +854,20 @@ class ContractClassChangeView(PermissionRequiredMixin, FormView):
         con = get_object_or_404(Contract, pk=id)
         initial_class = con.course
 
-        class_obj = Class.objects.filter(course=con.course, student=con.student).first()
-        class_obj.course = course
-        class_obj.save()
-        con.course = course
-        con.save()
+        with transaction.atomic():
+            class_obj = Class.objects.filter(course=con.course, student=con.student).first()
+            if class_obj and initial_class.pk != course.pk and Class.objects.filter(course=course, student=con.student).exists():
+                # Student already sits in the new class, only one row per (course, student).
+                unenroll(Class.objects.filter(pk=class_obj.pk))
+                class_obj = None
+            if class_obj:
+                class_obj.course = course
+                class_obj.save()
+            if initial_class.pk != course.pk:
+                change_course_counters(initial_class, enrollments=-1 if class_obj else 0, contracts=-1 if con.flag else 0)
+                change_course_counters(course, enrollments=1 if class_obj else 0, contracts=1 if con.flag else 0)
+            con.course = course
+            con.save()
         from django.utils import timezone
         now = timezone.now()
         if class_change == FREE:
@@ -716,6 +888,7 @@ class ContractClassChangeView(PermissionRequiredMixin, FormView):
 ################################################################################
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.Teacher')), name='get')
 class TeacherListView(PermissionRequiredMixin, FilterMixin, ListView):
     """List of all teachers."""
 
@@ -723,6 +896,7 @@ class TeacherListView(PermissionRequiredMixin, FilterMixin, ListView):
     model = Teacher
     context_object_name = 'list'
     permission_required = 'a01.main'
+    use_replica = True
 
     allowed_filters = {
         'fname': 'fname__icontains',
@@ -798,11 +972,13 @@ class TeacherDeleteView(PermissionRequiredMixin, CustomDeleteView):
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.Teacher', 'a01.CourseTeachers', 'a01.Course', 'a01.CourseType')), name='get')
 class TeacherDetailView(PermissionRequiredMixin, TemplateView):
     """Detailed information of Teacher."""
 
     template_name = 'a01/teacher_detail.html'
     permission_required = 'a01.main'
+    use_replica = True
 
     def get_context_data(self, **kwargs):
         """Function for context."""
@@ -842,85 +1018,128 @@ class TeacherSalaryCalculatorView(PermissionRequiredMixin, FormView):
         context = self.get_context_data()
         salary_form = context['salary_form']
 
-        t_objs = TeacherSalary.objects.filter(month=month, year=year, mshift=mshift).exclude(teacher=None)
-
-        teachers = []
-
-        now = datetime.datetime.now()
-
-        for each in t_objs:
-            teachers.append(each.teacher)
-
         if salary_form.is_valid():
-            objects = []
-            txn_objs = []
+            hours = {}
             for each in salary_form:
                 teacher = each.cleaned_data.get('teacher')
-                if teacher in teachers:
-                    continue
                 hour = each.cleaned_data.get('hour')
-                salary = teacher.hourly_wage * hour
                 if teacher and hour:
-                    objects.append(TeacherSalary(teacher=teacher, year=year, worked_hour=hour, month=month, mshift=mshift, salary=salary))
-                    txn_objs.append(Transaction(amount=salary, txn_type=SALARY_EXPENSE, txn_date=now))
-
-            try:
-                with transaction.atomic():
-                    TeacherSalary.objects.bulk_create(objects)
-                    Transaction.objects.bulk_create(txn_objs)
+                    hours[teacher.pk] = hour
 
-            except IntegrityError:
-                return redirect(reverse('teacher'))
+            job = enqueue('payroll', {
+                'year': year,
+                'month': month,
+                'mshift': mshift,
+                'teacher_hours': hours,
+            }, user=self.request.user)
+            return HttpResponseRedirect(reverse('job_detail', kwargs={'id': job.pk}))
 
         return HttpResponseRedirect(self.get_success_url())
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
-class TeacherSalaryDetailView(PermissionRequiredMixin, TemplateView):
+@method_decorator(condition(**data_conditions('a01.TeacherSalary', 'a01.Teacher', 'a01.Worker')), name='get')
+class TeacherSalaryDetailView(PermissionRequiredMixin, KeysetPaginationMixin, TemplateView):
     """View list of Salaries."""
 
     template_name = 'a01/teacher_salary_detail.html'
     permission_required = 'a01.accounting'
+    use_replica = True
+    keyset_ordering = ('-year', '-id')
+    query_budget = 8
 
     def get_context_data(self, **kwargs):
         """Context data."""
         context = super(TeacherSalaryDetailView, self).get_context_data(**kwargs)
-        f = SalaryFilter(self.request.GET, queryset=TeacherSalary.objects.all())
+        f = SalaryFilter(self.request.GET, queryset=TeacherSalary.objects.select_related('teacher', 'worker'))
         context['filter'] = f
+        context['page'] = self.paginate_keyset(f.qs)
 
         return context
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
-class TransactionListView(PermissionRequiredMixin, TemplateView):
+class SalaryExportView(PermissionRequiredMixin, CsvExportView):
+    """CSV of salaries matching SalaryFilter."""
+
+    permission_required = 'a01.accounting'
+    filterset_class = SalaryFilter
+    columns = SALARY_COLUMNS
+    ordering = ('year', 'id')
+    filename = 'salaries.csv'
+    export_name = 'salaries'
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.Transaction', 'a01.Contract')), name='get')
+class TransactionListView(PermissionRequiredMixin, KeysetPaginationMixin, TemplateView):
     """View list of Transactions."""
 
     template_name = 'a01/transaction_list.html'
     permission_required = 'a01.accounting'
+    use_replica = True
+    keyset_ordering = ('-txn_date', '-id')
+    query_budget = 8
 
     def get_context_data(self, **kwargs):
         """Context data."""
         context = super(TransactionListView, self).get_context_data(**kwargs)
-        f = TransactionFilter(self.request.GET, queryset=Transaction.objects.all())
+        f = TransactionFilter(self.request.GET, queryset=Transaction.objects.select_related('contract'))
 
-        income = 0
-        expense = 0
+        summary = transaction_summary(f.qs)
+        context['summary'] = summary
+        context['income'] = summary['income']
+        context['expense'] = summary['expense']
 
-        for each in f.qs:
-            if each.txn_type.endswith('INCOME'):
-                income += each.amount
-            elif each.txn_type.endswith('EXPENSE'):
-                expense += each.amount
+        context['filter'] = f
+        context['page'] = self.paginate_keyset(f.qs)
+
+        return context
 
-        context['income'] = income
-        context['expense'] = expense
 
-        context['filter'] = f
-        context['type_list'] = ['INCOME', 'EXPENSE']
-        context['expense_list'] = ['SEXPENSE', 'EXPENSE']
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class ProfitLossView(PermissionRequiredMixin, TemplateView):
+    """Monthly income, expense and profit, closed months come from cache."""
+
+    template_name = 'a01/profit_loss.html'
+    permission_required = 'a01.accounting'
+    use_replica = True
+    query_budget = 4
+
+    def get_context_data(self, **kwargs):
+        """Context data."""
+        context = super(ProfitLossView, self).get_context_data(**kwargs)
+        try:
+            months = min(max(int(self.request.GET.get('months', 12)), 1), 36)
+        except ValueError:
+            months = 12
+
+        report = profit_loss(months)
+        context['months'] = months
+        context['report'] = report
+        context['income'] = sum(each['income'] for each in report)
+        context['expense'] = sum(each['expense'] for each in report)
+        context['profit'] = context['income'] - context['expense']
 
         return context
 
+    def post(self, request, *args, **kwargs):
+        """Rebuild cached months of report in background job."""
+        job = enqueue('profit_loss', {'months': 36}, user=request.user)
+        return HttpResponseRedirect(reverse('job_detail', kwargs={'id': job.pk}))
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class TransactionExportView(PermissionRequiredMixin, CsvExportView):
+    """CSV of transactions matching TransactionFilter."""
+
+    permission_required = 'a01.accounting'
+    filterset_class = TransactionFilter
+    columns = TRANSACTION_COLUMNS
+    ordering = ('txn_date', 'id')
+    filename = 'transactions.csv'
+    export_name = 'transactions'
+
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
 class TransactionAddView(PermissionRequiredMixin, FormView):
@@ -1012,6 +1231,32 @@ class TransactionVerifyView(PermissionRequiredMixin, CustomDeleteView):
         return HttpResponseRedirect(success_url)
 
 
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class TransactionBulkView(BulkActionView):
+    """Bulk verify, soft delete and restore of transactions."""
+
+    model = Transaction
+    success_url = '/a01/transaction/'
+    permission_required = 'a01.accounting'
+    labels = {
+        'verify': 'Баталгаажсан',
+        'delete': 'Устгасан',
+        'restore': 'Сэргээсэн',
+    }
+
+    def verify_rows(self, ids):
+        """Verify active transactions."""
+        return verify_transactions(ids)
+
+    def delete_rows(self, ids):
+        """Soft delete unverified transactions."""
+        return set_transaction_flags(ids, False)
+
+    def restore_rows(self, ids):
+        """Undo soft delete of transactions."""
+        return set_transaction_flags(ids, True)
+
+
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
 class ContractFromStudentView(PermissionRequiredMixin, FormView):
     """View to add data into TransactionModel."""
@@ -1030,57 +1275,13 @@ class ContractFromStudentView(PermissionRequiredMixin, FormView):
 
     def form_valid(self, form):
         """Called after valid data."""
-        data = form.cleaned_data
-        payment = data.get('payment', 0)
-        course = data.get('course')
-        minus_length = data.get('minus_length')
-        txn_method = data.get('txn_method')
-        contract_number = data.get('contract_number')
-        off_percent = data['off_percent']
-        description = data['description']
-        con_date = data['con_date']
-
-        obj = get_object_or_404(Student, pk=self.kwargs.get('id'))
-
-        con = Contract()
-        con.course = course
-        con.date = con_date
-        con.total_payment = payment
-        con.minus_length = minus_length
-        con.contract_number = contract_number
-        con.off_percent = off_percent
-        con.description = description
-        con.student = obj
-
-        total_price = course.price
-        hourly_price = course.hourly_price
-
-        if 100 >= off_percent > 0:
-            off_price = total_price * off_percent / 100
-            total_price = total_price - off_price
-
-            hourly_price = round(total_price / course.ctype.length)
-
-        real_length = course.ctype.length - minus_length
-        if minus_length == 0:
-            con.req_payment = total_price
-        else:
-            con.req_payment = hourly_price * real_length
-
-        con.save()
-
-        txn = Transaction()
-        txn.contract = con
-        txn.txn_type = CONTRACT_INCOME
-        txn.amount = payment
-        txn.txn_date = con_date
-        txn.txn_method = txn_method
-        txn.save()
-
-        cls = Class()
-        cls.student = obj
-        cls.course = course
-        cls.save()
+        student = get_object_or_404(Student, pk=self.kwargs.get('id'))
+        try:
+            create_contract(form.cleaned_data, student=student)
+        except ValidationError as e:
+            # Another request put the student into the course meanwhile.
+            form.add_error(None, e)
+            return self.form_invalid(form)
 
         return super(ContractFromStudentView, self).form_valid(form)
 
@@ -1088,6 +1289,7 @@ class ContractFromStudentView(PermissionRequiredMixin, FormView):
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.Worker')), name='get')
 class WorkerListView(PermissionRequiredMixin, FilterMixin, ListView):
     """List of all workers."""
 
@@ -1095,6 +1297,7 @@ class WorkerListView(PermissionRequiredMixin, FilterMixin, ListView):
     model = Worker
     context_object_name = 'list'
     permission_required = 'a01.accounting'
+    use_replica = True
 
     allowed_filters = {
         'fname': 'fname__icontains',
@@ -1174,11 +1377,13 @@ class WorkerDeleteView(PermissionRequiredMixin, CustomDeleteView):
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.Worker')), name='get')
 class WorkerDetailView(PermissionRequiredMixin, TemplateView):
     """Detailed information of Teacher."""
 
     template_name = 'a01/worker_detail.html'
     permission_required = 'a01.accounting'
+    use_replica = True
 
     def get_context_data(self, **kwargs):
         """Function for context."""
@@ -1217,50 +1422,42 @@ class WorkerSalaryCalculatorView(PermissionRequiredMixin, FormView):
         context = self.get_context_data()
         salary_form = context['salary_form']
 
-        t_objs = TeacherSalary.objects.filter(month=month, year=year, mshift=mshift).exclude(worker=None)
-
-        workers = []
-
-        now = datetime.datetime.now()
-
-        for each in t_objs:
-            workers.append(each.worker)
-
         if salary_form.is_valid():
-            objects = []
-            txn_objs = []
+            wages = {}
             for each in salary_form:
                 worker = each.cleaned_data.get('worker')
-                if worker in workers:
-                    continue
                 wage = each.cleaned_data.get('wage')
                 if worker and wage:
-                    objects.append(TeacherSalary(worker=worker, year=year, month=month, mshift=mshift, salary=wage))
-                    txn_objs.append(Transaction(amount=wage, txn_type=SALARY_EXPENSE, txn_date=now))
-
-            try:
-                with transaction.atomic():
-                    TeacherSalary.objects.bulk_create(objects)
-                    Transaction.objects.bulk_create(txn_objs)
+                    wages[worker.pk] = wage
 
-            except IntegrityError:
-                return redirect(reverse('worker'))
+            job = enqueue('payroll', {
+                'year': year,
+                'month': month,
+                'mshift': mshift,
+                'worker_wages': wages,
+            }, user=self.request.user)
+            return HttpResponseRedirect(reverse('job_detail', kwargs={'id': job.pk}))
 
         return HttpResponseRedirect(self.get_success_url())
 
 
 @method_decorator(login_required(redirect_field_name='home'), name='dispatch')
-class StudentLevelListView(PermissionRequiredMixin, TemplateView):
+@method_decorator(condition(**data_conditions('a01.StudentLevel', 'a01.Student', 'a01.Course', 'a01.CourseType')), name='get')
+class StudentLevelListView(PermissionRequiredMixin, KeysetPaginationMixin, TemplateView):
     """View list of Student levels."""
 
     template_name = 'a01/student_level_list.html'
     permission_required = 'a01.s_composer'
+    use_replica = True
+    keyset_ordering = ('-date', '-id')
+    query_budget = 8
 
     def get_context_data(self, **kwargs):
         """Context data."""
         context = super(StudentLevelListView, self).get_context_data(**kwargs)
-        f = StudentLevelFilter(self.request.GET, queryset=StudentLevel.objects.all())
+        f = StudentLevelFilter(self.request.GET, queryset=StudentLevel.objects.select_related('student', 'course__ctype'))
         context['filter'] = f
+        context['page'] = self.paginate_keyset(f.qs)
 
         return context
 
@@ -1274,6 +1471,7 @@ class StudentLevelAddView(PermissionRequiredMixin, FormView):
     success_url = '/a01/student/'
     permission_required = 'a01.s_composer'
 
+    @transaction.atomic
     def form_valid(self, form):
         """Called after valid data."""
         data = form.cleaned_data
@@ -1292,10 +1490,7 @@ class StudentLevelAddView(PermissionRequiredMixin, FormView):
         stl.save()
 
         if course:
-            cls = Class()
-            cls.student = student
-            cls.course = course
-            cls.save()
+            enroll(student, course)
 
         return super(StudentLevelAddView, self).form_valid(form)
 
@@ -1337,7 +1532,8 @@ class StudentLevelDeleteView(PermissionRequiredMixin, CustomDeleteView):
         self.object = self.get_object()
         success_url = self.get_success_url()
 
-        Class.objects.filter(student=self.object.student, course=self.object.course).delete()
+        with transaction.atomic():
+            unenroll(Class.objects.filter(student=self.object.student, course=self.object.course))
 
         return HttpResponseRedirect(success_url)
 
@@ -1347,3 +1543,270 @@ class WorkerSalaryDetailView(TeacherSalaryDetailView):
     """View list of Salaries."""
 
     template_name = 'a01/worker_salary_detail.html'
+
+
+class JobMixin(object):
+    """Jobs of current user, superusers see every job."""
+
+    def get_jobs(self):
+        """Visible jobs."""
+        jobs = Job.objects.select_related('created_by')
+        if not self.request.user.is_superuser:
+            jobs = jobs.filter(created_by=self.request.user)
+        return jobs
+
+    def get_job(self):
+        """Job of url or 404."""
+        return get_object_or_404(self.get_jobs(), pk=self.kwargs.get('id'))
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class JobListView(JobMixin, KeysetPaginationMixin, TemplateView):
+    """View list of background jobs."""
+
+    template_name = 'a01/job_list.html'
+
+    def get_context_data(self, **kwargs):
+        """Context data."""
+        context = super(JobListView, self).get_context_data(**kwargs)
+        context['page'] = self.paginate_keyset(self.get_jobs().defer('params', 'result', 'error'))
+        return context
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class JobDetailView(JobMixin, TemplateView):
+    """Status, progress and result of background job."""
+
+    template_name = 'a01/job_detail.html'
+
+    def get_context_data(self, **kwargs):
+        """Context data."""
+        context = super(JobDetailView, self).get_context_data(**kwargs)
+        context['obj'] = self.get_job()
+        return context
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class JobStatusView(JobMixin, View):
+    """Status of background job as JSON, polled by job page."""
+
+    def get(self, request, *args, **kwargs):
+        """Status, progress and, once finished, result or error."""
+        job = self.get_job()
+        data = {
+            'id': job.pk,
+            'name': job.name,
+            'status': job.status,
+            'progress': job.progress,
+            'message': job.progress_message,
+            'attempts': job.attempts,
+        }
+        if job.status == JOB_DONE:
+            data['result'] = job.result
+        elif job.status == JOB_FAILED:
+            data['error'] = job.error
+        return JsonResponse(data)
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class JobFileView(JobMixin, View):
+    """Download file written by background job."""
+
+    def get(self, request, *args, **kwargs):
+        """Stream file of job result."""
+        job = self.get_job()
+        name = (job.result or {}).get('file') if job.status == JOB_DONE else None
+        if not name or not default_storage.exists(name):
+            raise Http404
+        response = FileResponse(default_storage.open(name, 'rb'), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="%s"' % name.rsplit('/', 1)[-1]
+        return response
+
+################################################################################
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.Room')), name='get')
+class RoomListView(PermissionRequiredMixin, ListView):
+    """View list of rooms."""
+
+    template_name = 'a01/room_list.html'
+    context_object_name = 'room_list'
+    permission_required = 'a01.main'
+    use_replica = True
+
+    def get_queryset(self):
+        """Active rooms by name."""
+        return Room.objects.filter(flag=True).order_by('name')
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class RoomAddView(PermissionRequiredMixin, FormView):
+    """To add room."""
+
+    template_name = 'a01/room_add.html'
+    form_class = RoomForm
+    success_url = '/a01/room/'
+    permission_required = 'a01.main'
+
+    def form_valid(self, form):
+        """Called after valid data."""
+        form.save()
+        return super(RoomAddView, self).form_valid(form)
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class RoomEditView(PermissionRequiredMixin, UpdateView):
+    """View to edit room."""
+
+    model = Room
+    template_name = 'a01/room_add.html'
+    form_class = RoomForm
+    success_url = '/a01/room/'
+    permission_required = 'a01.main'
+
+    def get_object(self, queryset=None):
+        """Handling GET objects."""
+        return get_object_or_404(Room, pk=self.kwargs.get('id'), flag=True)
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class RoomDeleteView(PermissionRequiredMixin, CustomDeleteView):
+    """Deleting data row from Model Room, its sessions lose the room."""
+
+    template_name = 'a01/delete.html'
+    model = Room
+    success_url = '/a01/room/'
+    permission_required = 'a01.main'
+
+    def delete(self, request, *args, **kwargs):
+        """Soft delete room and free its sessions for other rooms."""
+        with transaction.atomic():
+            CourseSession.objects.filter(room=self.kwargs.get('pk')).update(room=None)
+            return super(RoomDeleteView, self).delete(request, *args, **kwargs)
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+@method_decorator(condition(**data_conditions('a01.CourseSession', 'a01.Course', 'a01.CourseType', 'a01.Teacher', 'a01.Room')), name='get')
+class TimetableView(PermissionRequiredMixin, TemplateView):
+    """
+    Weekly sessions of active courses with their conflicts and rooms
+    suggested for sessions without one.
+
+    Conflicts and suggestions are computed over the whole term, filters
+    only narrow the listed sessions.
+    """
+
+    template_name = 'a01/timetable.html'
+    permission_required = 'a01.main'
+    use_replica = True
+    query_budget = 8
+
+    def get_context_data(self, **kwargs):
+        """Function for context."""
+        context = super(TimetableView, self).get_context_data(**kwargs)
+        queryset = active_sessions().select_related('course__ctype', 'teacher', 'room').order_by('weekday', 'start_time', 'id')
+        sessions = dict((each.pk, each) for each in queryset)
+        rooms = dict((each.pk, each) for each in Room.objects.filter(flag=True))
+
+        slots = [session_slot(each) for each in sessions.values()]
+        conflicts = find_conflicts(slots)
+        assigned, unassigned = assign_rooms(slots, rooms.values())
+        clashing = set()
+        for each in conflicts:
+            clashing.update((each.first.pk, each.second.pk))
+
+        session_filter = CourseSessionFilter(self.request.GET, queryset=queryset)
+        listed = set(session_filter.qs.values_list('pk', flat=True))
+        days = []
+        for each in sessions.values():
+            if each.pk not in listed:
+                continue
+            each.clashing = each.pk in clashing
+            each.suggested_room = rooms.get(assigned.get(each.pk))
+            if not days or days[-1][0] != each.weekday:
+                days.append((each.weekday, each.get_weekday, []))
+            days[-1][2].append(each)
+
+        context['filter'] = session_filter
+        context['days'] = days
+        context['conflicts'] = [
+            (each, sessions[each.first.pk], sessions[each.second.pk]) for each in conflicts
+        ]
+        context['suggested'] = len(assigned)
+        context['unassigned'] = [sessions[pk] for pk in unassigned]
+        return context
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class TimetableAssignView(PermissionRequiredMixin, View):
+    """Give sessions without a room the rooms suggested on timetable, POST only."""
+
+    http_method_names = ['post']
+    permission_required = 'a01.main'
+
+    def post(self, request, *args, **kwargs):
+        """Assign rooms and report back."""
+        assigned, unassigned = assign_rooms(load_slots(active_sessions()), Room.objects.filter(flag=True))
+        try:
+            updated = save_rooms(assigned)
+        except IntegrityError:
+            messages.error(request, 'Танхим давхцсан тул оноосонгүй, дахин оролдоно уу.')
+        else:
+            messages.success(request, 'Танхим оноосон: %d хичээл. Танхим олдоогүй: %d хичээл.' % (updated, len(unassigned)))
+        return redirect('timetable')
+
+
+class CourseSessionSaveMixin(object):
+    """Save session form; a slot taken by another request meanwhile is a form error."""
+
+    def form_valid(self, form):
+        """Save or show clash caught by the exclusion constraints."""
+        try:
+            with transaction.atomic():
+                self.object = form.save()
+        except IntegrityError:
+            form.add_error(None, 'Танхим эсвэл багш энэ цагт завгүй болсон байна.')
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class CourseSessionAddView(PermissionRequiredMixin, CourseSessionSaveMixin, FormView):
+    """To add weekly session of course."""
+
+    template_name = 'a01/course_session_add.html'
+    form_class = CourseSessionForm
+    success_url = '/a01/timetable/'
+    permission_required = 'a01.main'
+
+    def get_initial(self):
+        """Course picked on course page."""
+        initial = super(CourseSessionAddView, self).get_initial()
+        initial['course'] = self.request.GET.get('course')
+        return initial
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class CourseSessionEditView(PermissionRequiredMixin, CourseSessionSaveMixin, UpdateView):
+    """View to edit weekly session of course."""
+
+    model = CourseSession
+    template_name = 'a01/course_session_add.html'
+    form_class = CourseSessionForm
+    success_url = '/a01/timetable/'
+    permission_required = 'a01.main'
+
+    def get_object(self, queryset=None):
+        """Handling GET objects."""
+        return get_object_or_404(CourseSession, pk=self.kwargs.get('id'), flag=True)
+
+
+@method_decorator(login_required(redirect_field_name='home'), name='dispatch')
+class CourseSessionDeleteView(PermissionRequiredMixin, CustomDeleteView):
+    """Deleting data row from Model CourseSession."""
+
+    template_name = 'a01/delete.html'
+    model = CourseSession
+    success_url = '/a01/timetable/'
+    permission_required = 'a01.main'
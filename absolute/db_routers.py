@@ -0,0 +1,169 @@
+"""Database routers of absolute project."""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import DatabaseError
+from django.db import connections
+
+
+REPLICA_DB_ALIAS = 'replica'
+
+_state = threading.local()
+
+# Last replication horizon measured by this process, see replica_horizon().
+_horizon = {'checked': None, 'value': None}
+
+
+def _server(alias):
+    """Engine, host, port and database name alias connects to."""
+    settings_dict = connections[alias].settings_dict
+    return (
+        settings_dict.get('ENGINE'),
+        settings_dict.get('HOST') or 'localhost',
+        str(settings_dict.get('PORT') or ''),
+        settings_dict.get('NAME'),
+    )
+
+
+def replica_enabled():
+    """
+    Is replica alias a database other than default.
+
+    An alias pointing at default, like the settings without a streaming
+    replica or the test mirror, is the same data read over a second
+    connection: nothing to gain, and a test transaction is not visible
+    through it.
+    """
+    if REPLICA_DB_ALIAS not in settings.DATABASES:
+        return False
+    return _server(REPLICA_DB_ALIAS) != _server(DEFAULT_DB_ALIAS)
+
+
+def _measure_horizon():
+    """Time up to which the PostgreSQL standby replayed default, or None."""
+    connection = connections[REPLICA_DB_ALIAS]
+    if connection.vendor != 'postgresql':
+        return None
+    wal, lsn = ('wal', 'lsn') if connection.pg_version >= 100000 else ('xlog', 'location')
+    sql = (
+        'SELECT pg_is_in_recovery(), '
+        'pg_last_{wal}_receive_{lsn}() = pg_last_{wal}_replay_{lsn}(), '
+        'pg_last_xact_replay_timestamp(), now()'
+    ).format(wal=wal, lsn=lsn)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            standby, caught_up, replayed, now = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not standby:
+        # A copy of default, e.g. made with createdb -T, may be of any age.
+        return None
+    return now if caught_up else replayed
+
+
+def replica_horizon():
+    """
+    Time up to which every commit of default is readable on the replica.
+
+    Measured on the replica at most every REPLICA_LAG_CHECK_SECONDS per
+    process: a caught up standby is current as of the measurement,
+    otherwise as of its last replayed commit. A remembered value only gets
+    older, so callers err on the safe side. None when unknown.
+    """
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 1)
+    now = time.time()
+    checked = _horizon['checked']
+    if checked is None or now - checked >= interval:
+        _horizon['value'] = _measure_horizon()
+        _horizon['checked'] = now
+    return _horizon['value']
+
+
+def replica_current(since):
+    """
+    Does the replica hold all changes made up to datetime since.
+
+    since None (nothing changed) always is; compares the app server clock
+    with the database clock, keep them in sync.
+    """
+    if since is None:
+        return True
+    horizon = replica_horizon()
+    return horizon is not None and since <= horizon
+
+
+def reset():
+    """Forget replica choice and writes of current thread."""
+    _state.use_replica = False
+    _state.wrote = False
+
+
+def read_from_replica():
+    """Read routed models of current thread from replica until reset."""
+    _state.use_replica = True
+
+
+def reading_replica():
+    """Are routed reads of current thread sent to replica."""
+    return getattr(_state, 'use_replica', False) and replica_enabled()
+
+
+def wrote_primary():
+    """Has current thread written any routed model since reset."""
+    return getattr(_state, 'wrote', False)
+
+
+@contextmanager
+def use_replica():
+    """Read routed models from replica inside the block."""
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+class ReplicaRouter(object):
+    """
+    Send reads of app a01 to the replica while use_replica() is active.
+
+    Writes always go to default. Reads outside use_replica(), and reads of
+    auth, sessions and other apps, stay on default too, so logins and the
+    session flag of ReplicaRoutingMiddleware never see replication lag.
+    """
+
+    route_app_labels = ('a01',)
+
+    def db_for_read(self, model, **hints):
+        """Replica for routed apps when asked for and configured."""
+        if model._meta.app_label not in self.route_app_labels:
+            return None
+        if reading_replica():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """Always default, remembered for sticky reads."""
+        if model._meta.app_label not in self.route_app_labels:
+            return None
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replica holds the same rows as default."""
+        databases = (DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS)
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Schema changes reach replica through replication only."""
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
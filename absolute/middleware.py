@@ -0,0 +1,148 @@
+"""Middlewares of absolute project."""
+
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+from absolute import db_routers
+
+
+logger = logging.getLogger('absolute.query_budget')
+
+
+class QueryBudgetExceeded(Exception):
+    """View issued more SQL than its budget allows."""
+
+
+class QueryBudgetMiddleware(MiddlewareMixin):
+    """
+    Count SQL queries and database time spent by each resolved view.
+
+    A view declares its budget as class attributes::
+
+        class ContractListView(TemplateView):
+            query_budget = 10           # queries per request
+            query_time_budget = 0.25    # seconds of database time
+
+    Settings:
+        QUERY_BUDGET_ENABLED      -- middleware removes itself when False.
+        QUERY_BUDGET_SAMPLE_RATE  -- share of requests measured (0..1).
+        QUERY_BUDGET_RAISE        -- raise QueryBudgetExceeded instead of logging.
+        QUERY_BUDGET_DEFAULT      -- budget for views without query_budget.
+    """
+
+    def __init__(self, get_response=None):
+        """Read settings once, drop out entirely when disabled."""
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.sample_rate = getattr(settings, 'QUERY_BUDGET_SAMPLE_RATE', 1.0)
+        self.raise_exceeded = getattr(settings, 'QUERY_BUDGET_RAISE', settings.DEBUG)
+        self.default_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        super(QueryBudgetMiddleware, self).__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Start measuring if request is sampled."""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+
+        view = getattr(view_func, 'view_class', view_func)
+        marks = {}
+        for conn in connections.all():
+            marks[conn.alias] = (conn.force_debug_cursor, len(conn.queries_log))
+            conn.force_debug_cursor = True
+
+        request._query_budget = {
+            'view': '%s.%s' % (view.__module__, view.__name__),
+            'queries': getattr(view, 'query_budget', self.default_budget),
+            'time': getattr(view, 'query_time_budget', None),
+            'marks': marks,
+        }
+        return None
+
+    def process_response(self, request, response):
+        """Stop measuring and compare with budget of the view."""
+        state = getattr(request, '_query_budget', None)
+        if state is None:
+            return response
+        del request._query_budget
+
+        count = 0
+        duration = 0.0
+        for conn in connections.all():
+            if conn.alias not in state['marks']:
+                continue
+            forced, start = state['marks'][conn.alias]
+            conn.force_debug_cursor = forced
+            executed = list(conn.queries_log)[start:]
+            count += len(executed)
+            duration += sum(float(each['time']) for each in executed)
+
+        over = []
+        if state['queries'] is not None and count > state['queries']:
+            over.append('%d queries (budget %d)' % (count, state['queries']))
+        if state['time'] is not None and duration > state['time']:
+            over.append('%.3fs db time (budget %.3fs)' % (duration, state['time']))
+
+        if over:
+            message = '%s %s: %s' % (state['view'], request.path, ', '.join(over))
+            if self.raise_exceeded:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        else:
+            logger.debug('%s %s: %d queries, %.3fs', state['view'], request.path, count, duration)
+
+        return response
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Route reads of views with ``use_replica = True`` to the replica.
+
+    Only GET and HEAD requests are routed. Once a request of a session
+    writes through ReplicaRouter, the session reads from default for
+    REPLICA_STICKY_SECONDS (None: rest of the session), so staff always
+    see their own writes despite replication lag. Must come after
+    SessionMiddleware.
+    """
+
+    session_key = '_db_primary_since'
+
+    def __init__(self, get_response=None):
+        """Drop out when no replica is configured."""
+        if not db_routers.replica_enabled():
+            raise MiddlewareNotUsed
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', None)
+        super(ReplicaRoutingMiddleware, self).__init__(get_response)
+
+    def process_request(self, request):
+        """Start every request on default."""
+        db_routers.reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Switch to replica for opted in read-only views."""
+        view = getattr(view_func, 'view_class', view_func)
+        if not getattr(view, 'use_replica', False):
+            return None
+        if request.method not in ('GET', 'HEAD') or self.is_sticky(request):
+            return None
+        db_routers.read_from_replica()
+        return None
+
+    def process_response(self, request, response):
+        """Make session sticky after a write, go back to default."""
+        if db_routers.wrote_primary() and hasattr(request, 'session'):
+            request.session[self.session_key] = time.time()
+        db_routers.reset()
+        return response
+
+    def is_sticky(self, request):
+        """Did this session write recently enough to read from default."""
+        since = getattr(request, 'session', {}).get(self.session_key)
+        if since is None:
+            return False
+        return self.sticky_seconds is None or time.time() - since < self.sticky_seconds
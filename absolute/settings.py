@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'django_filters',
     # Custom apps
@@ -54,10 +55,15 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'absolute.middleware.QueryBudgetMiddleware',
+    'absolute.middleware.ReplicaRoutingMiddleware',
 ]
 
-# if DEBUG:
-#     MIDDLEWARE = MIDDLEWARE.append('absolute.QueryCountDebugMiddleware')
+# Per view SQL query budget, see absolute.middleware.QueryBudgetMiddleware.
+QUERY_BUDGET_ENABLED = True
+QUERY_BUDGET_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+QUERY_BUDGET_RAISE = DEBUG
+QUERY_BUDGET_DEFAULT = None
 
 ROOT_URLCONF = 'absolute.urls'
 
@@ -106,9 +112,58 @@ DATABASES = {
         'PASSWORD': 'postgres',
         'HOST': 'localhost',
         'PORT': '',
-    }
+    },
+    # Read-only copy of default used by views with use_replica = True, see
+    # absolute.db_routers. Without a streaming replica it points at default
+    # and routing stays off; to try routing locally create a second
+    # database, e.g. `createdb -T absolute absolute_replica`, and set
+    # REPLICA_DB_NAME.
+    'replica': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': os.environ.get('REPLICA_DB_NAME', 'absolute'),
+        'USER': os.environ.get('REPLICA_DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('REPLICA_DB_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('REPLICA_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('REPLICA_DB_PORT', ''),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['absolute.db_routers.ReplicaRouter']
+
+# Seconds a session keeps reading from default after it wrote, None for
+# the rest of the session.
+REPLICA_STICKY_SECONDS = None
+
+# Seconds between measurements of replication lag per process. Pages read
+# from the replica get ETags and cached rows only once it has replayed
+# their last change.
+REPLICA_LAG_CHECK_SECONDS = 1
+
+# Course choices, P&L reports, row fragments and model versions of ETags
+# are cached until a01.signals bump or drop them, so every web and
+# run_jobs process must share the cache: set CACHE_LOCATION to memcached
+# servers, e.g. `127.0.0.1:11211` (needs python-memcached). Local memory
+# is only fit for a single process without run_jobs, e.g. runserver;
+# `manage.py check --deploy` warns about it (a01.W001).
+if os.environ.get('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['CACHE_LOCATION'].split(','),
+            'KEY_PREFIX': 'absolute',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'absolute',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
@@ -157,3 +212,7 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(PROJECT_ROOT, 'templates/static').replace('\\', '/'),
 ]
+
+# Uploads and files written by background jobs (a01.jobs), served through
+# a01 views only, never as static files.
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')